@@ -28,6 +28,7 @@ from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import TimeoutError
 from juicer.runner import configuration
 from juicer.runner import protocol as juicer_protocol
+from juicer.runner import telemetry
 
 from juicer.runner.minion_base import Minion
 from juicer.util import dataframe_util, listener_util
@@ -157,6 +158,7 @@ class ScriptMinion(Minion):
         """
         Starts consuming jobs that must be processed by this minion.
         """
+        self.start_telemetry()
         while q.empty():
             try:
                 self._process_message_nb()
@@ -530,6 +532,11 @@ class ScriptMinion(Minion):
         return success
 
 
+    def get_platform_telemetry(self):
+        if getattr(self, 'spark_session', None) is None:
+            return {}
+        return telemetry.get_spark_telemetry(self.spark_session)
+
     # noinspection PyUnusedLocal
     def cancel_job(self, job_id):
         if self.job_future:
@@ -100,6 +100,7 @@ class MetaMinion(Minion):
         """
         Starts consuming jobs that must be processed by this minion.
         """
+        self.start_telemetry()
         while q.empty():
             try:
                 self._process_message_nb()
@@ -234,6 +235,7 @@ class MetaMinion(Minion):
                 self.redis_conn, self.workflow_id,
                 self.app_id, self.config, self.current_lang)
 
+        self._hand_over_time_to_first_task()
         self.target_minion.perform_execute(job_id, workflow, app_configs, code)
 
     def _execute_target_workflow(self, job_id, workflow, app_configs):
@@ -264,10 +266,30 @@ class MetaMinion(Minion):
         # print('*' * 20)
         # print(self.target_minion._state)
         # print('*' * 20)
+        self._hand_over_time_to_first_task()
         return self.target_minion.perform_execute(
             job_id, target_workflow, app_configs)
 
 
+    def _hand_over_time_to_first_task(self):
+        """ Target minion reports the metric on behalf of this minion """
+        if self.requested_at is not None:
+            self.target_minion.requested_at = self.requested_at
+            self.target_minion.platform = self.platform
+            self.target_minion.warm = self.warm
+            self.requested_at = None
+
+    def get_state(self):
+        # Results are kept by the target minion
+        if self.target_minion is None:
+            return self._state
+        return self.target_minion.get_state()
+
+    def get_platform_telemetry(self):
+        if self.target_minion is None:
+            return {}
+        return self.target_minion.get_platform_telemetry()
+
     # noinspection PyUnusedLocal
     def cancel_job(self, job_id):
         if self.job_future:
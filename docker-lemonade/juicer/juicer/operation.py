@@ -136,6 +136,27 @@ class Operation(object):
         """ Operation is a data source and must be audited? """
         return False
 
+    @property
+    def task_hash(self):
+        """
+        Hash of the task and of its lineage (parents), computed by the
+        transpiler. It changes only if the task or one of its ancestors change.
+        """
+        return self.parameters.get('hash')
+
+    @property
+    def supports_persistent_cache(self):
+        """ Results can be stored in the durable result cache? """
+        return self.supports_cache
+
+    # noinspection PyMethodMayBeStatic
+    def get_data_source_version(self):
+        """
+        Version of the data read by the operation (only for data sources). It
+        is used to invalidate cached results that depend on the data.
+        """
+        return None
+
     @property
     def is_stream_consumer(self):
         return False
@@ -144,6 +165,58 @@ class Operation(object):
     def supports_pipeline(self):
         return False
 
+    @property
+    def supports_chunks(self):
+        """
+        Operation is row-local (the output of each row depends only on it),
+        so it can be applied chunk by chunk to a streamed data frame
+        (scikit-learn). Others receive the materialized data.
+        """
+        return False
+
+    @property
+    def cpu_bound(self):
+        """
+        Operation code spends most of its time computing (e.g. training a
+        model), so it may be executed by a worker process (scikit-learn),
+        instead of a thread.
+        """
+        return False
+
+    # noinspection PyMethodMayBeStatic
+    def get_warnings(self):
+        """
+        Messages about the code returned by generate_code() (e.g. an
+        optimization not applied), reported to the user in the task log.
+        """
+        return []
+
+    @property
+    def iterative(self):
+        """
+        Operation reads its input data many times (e.g. iterative training
+        algorithms), so the input should be persisted (Spark).
+        """
+        return False
+
+    # noinspection PyMethodMayBeStatic,PyUnusedLocal
+    def get_required_columns(self, output_columns):
+        """
+        Columns (attributes) of the input required to produce the given
+        columns of the output (None means all of them). Used by the
+        transpiler to push projections down to data sources. By default, all
+        input columns are required.
+        """
+        return None
+
+    def is_dead_input(self, port='input data'):
+        """
+        Data received in the port is not used after this task (by other
+        tasks or by next jobs), so it can be changed in place instead of
+        copied. Informed by the transpiler (liveness analysis), if supported.
+        """
+        return port in self.parameters.get('dead_inputs', ())
+
     @property
     def get_inputs_names(self):
         return ', '.join(list(self.named_inputs.values()))
@@ -0,0 +1,105 @@
+# coding=utf-8
+"""
+Cache of compiled code generated by the transpiler.
+
+Minions used to write the generated code to a temporary file for every job,
+import and reload it. Generated modules were never removed from sys.modules
+and files were never removed from disk. The CodeCache compiles the source
+code once (the key is a hash of the source), keeps a limited number of code
+objects (LRU) and loads modules directly from memory.
+"""
+import hashlib
+import importlib.abc
+import importlib.util
+import linecache
+import logging
+import sys
+from collections import OrderedDict
+
+log = logging.getLogger('juicer.runner.code_cache')
+
+
+class GeneratedCodeLoader(importlib.abc.Loader):
+    """ Loads a module from an already compiled code object """
+
+    def __init__(self, code, source=None):
+        self.code = code
+        self.source = source
+
+    def create_module(self, spec):
+        return None  # Default module creation
+
+    def get_source(self, fullname):
+        # Used to load the module in other processes (juicer.scikit_learn
+        # processes)
+        return self.source
+
+    def exec_module(self, module):
+        exec(self.code, module.__dict__)
+
+
+class CodeCache:
+    """
+    LRU cache of compiled generated code. Each module name (one per app) has
+    a single module in sys.modules, replaced when a new job is loaded.
+    """
+
+    def __init__(self, max_size=8):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _get_key(source):
+        return hashlib.sha1(source.encode('utf8')).hexdigest()
+
+    def _compile(self, key, source):
+        filename = '<juicer_generated_{}>'.format(key)
+        code = compile(source, filename, 'exec')
+        # Allows tracebacks to show the generated code
+        linecache.cache[filename] = (len(source), None,
+                                     source.splitlines(True), filename)
+        self._entries[key] = code
+        while len(self._entries) > self.max_size:
+            old_key, old_code = self._entries.popitem(last=False)
+            linecache.cache.pop(old_code.co_filename, None)
+        return code
+
+    def get_code(self, source):
+        """ Returns the compiled code, compiling it only if required """
+        key = self._get_key(source)
+        code = self._entries.get(key)
+        if code is None:
+            self.misses += 1
+            code = self._compile(key, source)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            log.info(_('Reusing compiled code for unchanged workflow (%s)'),
+                     key)
+        return code
+
+    def load(self, module_name, source):
+        """
+        Returns a new module, executing the (cached) compiled code. The
+        module replaces any previous module with the same name.
+        """
+        code = self.get_code(source)
+        spec = importlib.util.spec_from_loader(
+            module_name, GeneratedCodeLoader(code, source),
+            origin=code.co_filename)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+        return module
+
+    def unload(self, module_name):
+        sys.modules.pop(module_name, None)
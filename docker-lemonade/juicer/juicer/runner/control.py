@@ -1,4 +1,19 @@
 # coding=utf-8
+import copy
+import logging
+import os
+import socket
+from contextlib import contextmanager
+
+from redis.exceptions import ResponseError
+
+log = logging.getLogger(__name__)
+
+
+def _to_str(value):
+    return value.decode('utf8') if isinstance(value, bytes) else value
+
+
 class StateControlRedis:
     """
     Controls state of Workflows, Minions and Jobs in Lemonade.
@@ -11,6 +26,7 @@ class StateControlRedis:
     """
     START_QUEUE_NAME = 'queue_start'
     SCRIPT_QUEUE_NAME = 'queue_script'
+    ADMISSION_QUEUE_NAME = 'queue_admission'
 
     QUEUE_APP = 'queue_app_{}'
 
@@ -37,12 +53,30 @@ class StateControlRedis:
         if ttl > 0:
             self.redis_conn.expire(queue, ttl)
 
+    @contextmanager
+    def batch(self):
+        """
+        Commands issued using the returned state control are sent to Redis
+        in a single round trip (pipeline), when the block ends.
+        """
+        pipeline = self.redis_conn.pipeline(transaction=False)
+        batch = copy.copy(self)
+        batch.redis_conn = pipeline
+        yield batch
+        pipeline.execute()
+
     def pop_start_queue(self, block=True):
         return self.pop_queue(self.START_QUEUE_NAME, block)
 
     def push_start_queue(self, data):
         self.push_queue(self.START_QUEUE_NAME, data)
 
+    def pop_admission_queue(self):
+        return self.pop_queue(self.ADMISSION_QUEUE_NAME, block=False)
+
+    def push_admission_queue(self, data):
+        self.push_queue(self.ADMISSION_QUEUE_NAME, data)
+
     def pop_app_queue(self, app_id, block=True, timeout=0):
         return self.pop_queue(self.QUEUE_APP.format(app_id), block, timeout)
 
@@ -53,6 +87,18 @@ class StateControlRedis:
         key = self.QUEUE_APP.format(app_id)
         return self.redis_conn.llen(key)
 
+    def get_pending_app_messages(self):
+        """
+        Returns a list of (app_id, message) with the first message waiting
+        in each app queue. Used to restart minions after a server crash.
+        """
+        result = []
+        for key in self.redis_conn.keys(self.QUEUE_APP.format('*')):
+            msg = self.redis_conn.lindex(key, 0)
+            if msg is not None:
+                result.append((_to_str(key).split('_')[-1], _to_str(msg)))
+        return result
+
     def get_workflow_status(self, workflow_id):
         key = 'record_workflow_{}'.format(workflow_id)
         result = self.redis_conn.hget(key, 'status')
@@ -133,3 +179,205 @@ class StateControlRedis:
     def shutdown(self):
         self.redis_conn.close()
 
+
+
+class StateControlRedisStreams(StateControlRedis):
+    """
+    App queues are Redis Streams, read by minions in a consumer group.
+    A message read by a minion is acknowledged (and removed from the stream)
+    only when the minion reads the next message or finishes (unsets its
+    status). If the minion dies while processing it, the message remains
+    pending and is claimed by the next minion of the app (at-least-once
+    delivery), after being idle for claim_min_idle milliseconds. Messages
+    delivered max_deliveries times (e.g. they kill the minion) are moved to a
+    dead letter stream. Like app queues (lists), streams expire after ttl
+    seconds without new messages and are trimmed to about max_length
+    messages. App output queues (minion to user interface) are streams too,
+    but a message is acknowledged as soon as it is read. Start and admission
+    queues, read only by the server, are still lists.
+    """
+    STREAM_APP = 'stream_app_{}'
+    STREAM_OUTPUT_APP = 'stream_output_app_{}'
+    DEAD_LETTER_APP = 'dead_letter_app_{}'
+    GROUP = 'juicer'
+    FIELD = 'data'
+
+    def __init__(self, redis_conn, consumer=None, claim_min_idle=60000,
+                 max_deliveries=3, ttl=3600, max_length=1000):
+        super().__init__(redis_conn)
+        self.consumer = consumer or '{}_{}'.format(socket.gethostname(),
+                                                   os.getpid())
+        # Milliseconds a pending message must be idle to be claimed. Greater
+        # than the TTL of minion status, so the minion processing it is dead.
+        self.claim_min_idle = claim_min_idle
+        self.max_deliveries = max_deliveries
+        self.ttl = ttl
+        self.max_length = max_length
+        self._groups = set()
+        self._unacked = {}
+
+    def _ensure_group(self, stream):
+        if stream not in self._groups:
+            try:
+                self.redis_conn.xgroup_create(stream, self.GROUP, id='0',
+                                              mkstream=True)
+            except ResponseError as re:
+                if 'BUSYGROUP' not in str(re):
+                    raise
+            self._groups.add(stream)
+
+    def _push_stream(self, stream, data):
+        self.redis_conn.xadd(stream, {self.FIELD: data},
+                             maxlen=self.max_length, approximate=True)
+        self.redis_conn.expire(stream, self.ttl)
+
+    def _read_stream(self, stream, block, timeout):
+        """ Reads the next new message (entry) from stream, or None """
+        self._ensure_group(stream)
+        try:
+            result = self.redis_conn.xreadgroup(
+                self.GROUP, self.consumer, {stream: '>'}, count=1,
+                block=int(timeout * 1000) if block else None)
+        except ResponseError as re:
+            # Stream (and its group) expired
+            if 'NOGROUP' not in str(re):
+                raise
+            self._groups.discard(stream)
+            return None
+        if not result or not result[0][1]:
+            return None
+        return result[0][1][0]
+
+    def _get_value(self, fields):
+        return _to_str(fields.get(self.FIELD,
+                                  fields.get(self.FIELD.encode('utf8'))))
+
+    def _claim_pending(self, stream, app_id):
+        """ Claims a message left pending by a (dead) consumer """
+        pending = self.redis_conn.xpending_range(stream, self.GROUP,
+                                                 '-', '+', 10)
+        for info in pending:
+            if info['time_since_delivered'] < self.claim_min_idle:
+                continue
+            # Other consumer may claim it concurrently
+            claimed = self.redis_conn.xclaim(
+                stream, self.GROUP, self.consumer, self.claim_min_idle,
+                [info['message_id']])
+            if not claimed:
+                continue
+            if info['times_delivered'] >= self.max_deliveries:
+                self._move_to_dead_letter(stream, app_id, claimed[0],
+                                          info['times_delivered'])
+                continue
+            return claimed[0]
+        return None
+
+    def _move_to_dead_letter(self, stream, app_id, entry, deliveries):
+        msg_id, fields = entry
+        log.warning(_('Message %s of app %s was delivered %s times, moving it '
+                      'to dead letter stream'), msg_id, app_id, deliveries)
+        dead_letter = self.DEAD_LETTER_APP.format(app_id)
+        pipeline = self.redis_conn.pipeline(transaction=False)
+        pipeline.xadd(dead_letter, {self.FIELD: self._get_value(fields),
+                                    'deliveries': deliveries},
+                      maxlen=self.max_length, approximate=True)
+        pipeline.expire(dead_letter, self.ttl)
+        pipeline.xack(stream, self.GROUP, msg_id)
+        pipeline.xdel(stream, msg_id)
+        pipeline.execute()
+
+    def pop_app_queue(self, app_id, block=True, timeout=0):
+        stream = self.STREAM_APP.format(app_id)
+        self._ensure_group(stream)
+        self.ack_app_queue(app_id)
+
+        try:
+            entry = self._claim_pending(stream, app_id)
+        except ResponseError as re:
+            # Stream (and its group) expired
+            if 'NOGROUP' not in str(re):
+                raise
+            self._groups.discard(stream)
+            return None
+        if entry is None:
+            entry = self._read_stream(stream, block, timeout)
+            if entry is None:
+                return None
+
+        msg_id, fields = entry
+        self._unacked[stream] = msg_id
+        return self._get_value(fields)
+
+    def ack_app_queue(self, app_id):
+        """ Acknowledges the last message read from the app queue """
+        stream = self.STREAM_APP.format(app_id)
+        msg_id = self._unacked.pop(stream, None)
+        if msg_id is not None:
+            pipeline = self.redis_conn.pipeline(transaction=False)
+            pipeline.xack(stream, self.GROUP, msg_id)
+            pipeline.xdel(stream, msg_id)
+            pipeline.execute()
+
+    def push_app_queue(self, app_id, data):
+        self._push_stream(self.STREAM_APP.format(app_id), data)
+
+    def get_app_queue_size(self, app_id):
+        # Acknowledged messages are removed, so the size includes messages
+        # being processed.
+        return self.redis_conn.xlen(self.STREAM_APP.format(app_id))
+
+    def get_pending_app_messages(self):
+        result = []
+        for key in self.redis_conn.keys(self.STREAM_APP.format('*')):
+            entries = self.redis_conn.xrange(key, count=1)
+            if entries:
+                result.append((_to_str(key).split('_')[-1],
+                               self._get_value(entries[0][1])))
+        return result
+
+    def unset_minion_status(self, app_id):
+        # Minion is finishing, its last message was processed
+        self.ack_app_queue(app_id)
+        return super().unset_minion_status(app_id)
+
+    def pop_app_output_queue(self, app_id, block=True):
+        stream = self.STREAM_OUTPUT_APP.format(app_id)
+        entry = self._read_stream(stream, block, 0)
+        if entry is None:
+            return None
+        msg_id, fields = entry
+        pipeline = self.redis_conn.pipeline(transaction=False)
+        pipeline.xack(stream, self.GROUP, msg_id)
+        pipeline.xdel(stream, msg_id)
+        pipeline.execute()
+        return self._get_value(fields)
+
+    def push_app_output_queue(self, app_id, data):
+        self._push_stream(self.STREAM_OUTPUT_APP.format(app_id), data)
+
+    def get_app_output_queue_size(self, app_id):
+        return self.redis_conn.xlen(self.STREAM_OUTPUT_APP.format(app_id))
+
+
+def create_state_control(redis_conn, config=None):
+    """
+    Returns the state control for the backend configured in
+    juicer.state_control (list, the default, or streams):
+
+        state_control:
+            backend: streams
+            claim_min_idle: 60000   # milliseconds
+            max_deliveries: 3       # then, moved to the dead letter stream
+            ttl: 3600               # seconds
+            max_length: 1000        # messages (approximately)
+    """
+    state_config = (config or {}).get('juicer', {}).get(
+        'state_control') or {}
+    if state_config.get('backend', 'list') == 'streams':
+        return StateControlRedisStreams(
+            redis_conn,
+            claim_min_idle=int(state_config.get('claim_min_idle', 60000)),
+            max_deliveries=int(state_config.get('max_deliveries', 3)),
+            ttl=int(state_config.get('ttl', 3600)),
+            max_length=int(state_config.get('max_length', 1000)))
+    return StateControlRedis(redis_conn)
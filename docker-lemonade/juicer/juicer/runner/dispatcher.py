@@ -0,0 +1,281 @@
+# coding=utf-8
+"""
+Event-driven dispatch of start requests.
+
+The JuicerServer reads the start queue and forwards each message to the
+minion of the app (starting it, if required). Forwarding one message at a
+time makes the server the bottleneck when there are many concurrent apps.
+The AsyncDispatcher consumes the start queue using asyncio and dispatches
+messages of different apps concurrently, keeping the order of messages of
+the same app. The MinionIndex keeps, in process, which minions are active,
+updated by Redis keyspace notifications, instead of reading the whole
+active_minions hash for every event.
+
+Redis client (redis-py 3) is synchronous, so blocking commands run in a
+thread pool managed by the event loop.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from juicer.runner.control import StateControlRedis, create_state_control
+
+log = logging.getLogger('juicer.runner.dispatcher')
+
+
+def _to_str(value):
+    if isinstance(value, bytes):
+        return value.decode('utf8')
+    return value if value is not None else ''
+
+
+class MinionIndex:
+    """
+    In process index of active minions (app_id -> pid), synchronized with
+    Redis using keyspace notifications on key_minion_app_* keys.
+    """
+    ACTIVE_MINIONS = 'active_minions'
+    NOTIFICATION_PATTERN = '__keyspace*__:key_minion_app_*'
+    JOINED = 'joined'
+    FINISHED = 'finished'
+
+    def __init__(self, redis_conn, update_active_minions=False):
+        """
+        :param redis_conn: Redis connection
+        :param update_active_minions: index also maintains the active_minions
+            hash in Redis (only one process should do it).
+        """
+        self.redis_conn = redis_conn
+        self.update_active_minions = update_active_minions
+        self._minions = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, app_id):
+        return str(app_id) in self._minions
+
+    def __len__(self):
+        return len(self._minions)
+
+    def get(self, app_id):
+        return self._minions.get(str(app_id))
+
+    def load(self):
+        """ Loads the index from Redis (once, when starting) """
+        active = self.redis_conn.hgetall(self.ACTIVE_MINIONS)
+        with self._lock:
+            self._minions = dict(
+                (_to_str(k), _to_str(v)) for k, v in active.items())
+
+    def handle_event(self, channel, event):
+        """
+        Updates the index with a keyspace notification. Returns a tuple
+        (app_id, JOINED or FINISHED) if the state of a minion changed,
+        otherwise None.
+        """
+        app_id = _to_str(channel).split('_')[-1]
+        if not app_id.isdigit():
+            return None
+        event = _to_str(event)
+        if event in ('del', 'expired'):
+            with self._lock:
+                pid = self._minions.pop(app_id, None)
+            if pid is None:
+                return None
+            if self.update_active_minions:
+                self.redis_conn.hdel(self.ACTIVE_MINIONS, app_id)
+            return app_id, self.FINISHED
+        elif event == 'set' and app_id not in self._minions:
+            # Minion refreshes its status periodically, so read it only once
+            info = self.redis_conn.get('key_minion_app_{}'.format(app_id))
+            if info is None:
+                return None
+            pid = str(json.loads(_to_str(info)).get('pid'))
+            with self._lock:
+                self._minions[app_id] = pid
+            if self.update_active_minions:
+                self.redis_conn.hset(self.ACTIVE_MINIONS, app_id, pid)
+            return app_id, self.JOINED
+        return None
+
+    def listen(self, callback=None):
+        """
+        Blocks processing keyspace notifications. Callback, if informed,
+        receives (app_id, state) when a minion joins or finishes.
+        """
+        self.load()
+        pub_sub = self.redis_conn.pubsub(ignore_subscribe_messages=True)
+        pub_sub.psubscribe(self.NOTIFICATION_PATTERN)
+        for msg in pub_sub.listen():
+            result = self.handle_event(msg.get('channel'), msg.get('data'))
+            if result is not None and callback is not None:
+                callback(*result)
+
+    def start(self, callback=None):
+        """ Listens for notifications in a background (daemon) thread """
+        thread = threading.Thread(target=self.listen, args=(callback,),
+                                  name='minion_index', daemon=True)
+        thread.start()
+        return thread
+
+
+class DispatcherMetrics:
+    """
+    Dispatch metrics, periodically written to a Redis hash:
+    queue_depth (size of the start queue), in_flight, dispatched,
+    latency_sum and last_latency_max (seconds between reading a message and
+    forwarding it to the minion).
+    """
+
+    def __init__(self, redis_conn, key):
+        self.redis_conn = redis_conn
+        self.key = key
+        self.in_flight = 0
+        self._dispatched = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+
+    def record(self, latency):
+        self._dispatched += 1
+        self._latency_sum += latency
+        self._latency_max = max(self._latency_max, latency)
+
+    def take(self):
+        """ Returns and resets the metrics accumulated since last call """
+        snapshot = {'in_flight': self.in_flight,
+                    'dispatched': self._dispatched,
+                    'latency_sum': self._latency_sum,
+                    'latency_max': self._latency_max}
+        self._dispatched, self._latency_sum, self._latency_max = 0, 0.0, 0.0
+        return snapshot
+
+    def write(self, snapshot):
+        try:
+            queue_depth = self.redis_conn.llen(
+                StateControlRedis.START_QUEUE_NAME)
+            pipeline = self.redis_conn.pipeline()
+            pipeline.hset(self.key, 'queue_depth', queue_depth)
+            pipeline.hset(self.key, 'in_flight', snapshot['in_flight'])
+            pipeline.hset(self.key, 'last_latency_max',
+                          snapshot['latency_max'])
+            pipeline.hincrby(self.key, 'dispatched', snapshot['dispatched'])
+            pipeline.hincrbyfloat(self.key, 'latency_sum',
+                                  snapshot['latency_sum'])
+            pipeline.execute()
+        except Exception:
+            log.exception(_('Unable to update dispatcher metrics'))
+
+
+class AsyncDispatcher:
+    """
+    Reads the start queue and dispatches messages concurrently.
+    Configuration (in juicer.dispatcher):
+
+        dispatcher:
+            enabled: true
+            concurrency: 8                 # Messages dispatched in parallel
+            metrics_key: dispatcher_metrics
+            metrics_interval: 5            # Seconds
+    """
+    POP_TIMEOUT = 1
+
+    def __init__(self, config, redis_conn, handler):
+        """
+        :param config: Juicer configuration
+        :param redis_conn: Redis connection
+        :param handler: blocking function that processes a message
+        """
+        dispatcher_config = config.get('juicer', {}).get('dispatcher') or {}
+        self.concurrency = max(1, int(
+            dispatcher_config.get('concurrency', 8)))
+        self.metrics_interval = float(
+            dispatcher_config.get('metrics_interval', 5))
+        self.redis_conn = redis_conn
+        self.state_control = create_state_control(redis_conn, config)
+        self.handler = handler
+        self.metrics = DispatcherMetrics(
+            redis_conn,
+            dispatcher_config.get('metrics_key', 'dispatcher_metrics'))
+
+        # One thread reads the queue, the others dispatch messages
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.concurrency + 1,
+            thread_name_prefix='dispatcher')
+        self.running = False
+        self._app_locks = {}
+        self._app_pending = {}
+
+    @staticmethod
+    def get_app_id(msg):
+        try:
+            return str(json.loads(msg).get('app_id'))
+        except (ValueError, AttributeError):
+            return None
+
+    def stop(self):
+        self.running = False
+
+    async def run(self, max_messages=None):
+        """
+        Dispatches messages until stopped (or max_messages, used in tests).
+        """
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        metrics_task = loop.create_task(self._report_metrics())
+
+        self.running = True
+        total = 0
+        while self.running:
+            msg = await loop.run_in_executor(
+                self.executor, self.state_control.pop_queue,
+                StateControlRedis.START_QUEUE_NAME, True, self.POP_TIMEOUT)
+            if msg is None:
+                continue
+            read_at = time.time()
+            await semaphore.acquire()
+            task = loop.create_task(self._dispatch(msg, read_at, semaphore))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+            total += 1
+            if max_messages is not None and total >= max_messages:
+                self.running = False
+
+        if pending:
+            await asyncio.wait(pending)
+        metrics_task.cancel()
+        self.metrics.write(self.metrics.take())
+
+    async def _dispatch(self, msg, read_at, semaphore):
+        loop = asyncio.get_event_loop()
+        app_id = self.get_app_id(msg)
+
+        # Tasks acquire the lock in creation order (asyncio.Lock is fair),
+        # so messages of the same app keep their order.
+        lock = self._app_locks.setdefault(app_id, asyncio.Lock())
+        self._app_pending[app_id] = self._app_pending.get(app_id, 0) + 1
+        self.metrics.in_flight += 1
+        try:
+            async with lock:
+                await loop.run_in_executor(self.executor, self.handler, msg)
+        except Exception:
+            log.exception(_('Unable to dispatch message for app %s'), app_id)
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.record(time.time() - read_at)
+            self._app_pending[app_id] -= 1
+            if self._app_pending[app_id] == 0:
+                del self._app_pending[app_id]
+                del self._app_locks[app_id]
+            semaphore.release()
+
+    async def _report_metrics(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            # Snapshot is taken in the loop thread, that updates the metrics
+            await loop.run_in_executor(self.executor, self.metrics.write,
+                                       self.metrics.take())
@@ -3,8 +3,10 @@
 
 import argparse
 import gettext
+import importlib
 import logging.config
 import os
+import sys
 
 import matplotlib
 import redis
@@ -17,6 +19,7 @@ from juicer.jobs.script_minion import ScriptMinion
 from juicer.spark.spark_minion import SparkMinion
 from juicer.plugin.plugin_minion import PluginMinion
 from juicer.meta.meta_minion import MetaMinion
+from juicer.runner.pool import wait_for_assignment
 
 # Important!
 # See https://stackoverflow.com/a/29172195/1646932
@@ -29,12 +32,94 @@ log = logging.getLogger(__name__)
 # locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
 locales_path = os.path.join(os.path.dirname(__file__), '..', 'i18n', 'locales')
 
+# Modules imported in advance by a minion in standby mode (warm minion)
+WARM_UP_MODULES = {
+    'spark': ['pyspark', 'pyspark.sql', 'pyspark.ml', 'pandas'],
+    'scikit-learn': ['numpy', 'pandas', 'sklearn'],
+    'meta': ['numpy', 'pandas', 'sklearn', 'pyspark', 'pyspark.sql'],
+}
+
+
+def warm_up(platform):
+    """
+    Imports the libraries required by the platform, so the minion does not
+    pay for them when the first task arrives.
+    """
+    spark_home = os.environ.get('SPARK_HOME')
+    if spark_home:
+        sys.path.append(os.path.join(spark_home, 'python'))
+    for module_name in WARM_UP_MODULES.get(platform, []):
+        try:
+            importlib.import_module(module_name)
+        except ImportError as ie:
+            log.warn(_('Unable to warm up module %s: %s'), module_name, ie)
+
+
+def create_minion(platform, redis_conn, workflow_id, app_id, config, lang,
+                  jars=None):
+    if platform == 'spark':
+        # log.info('Starting Juicer Spark Minion')
+        minion = SparkMinion(redis_conn,
+                             workflow_id,
+                             app_id,
+                             config,
+                             lang, jars)
+    elif platform == 'compss':
+        # log.info('Starting COMPSs Minion')
+        minion = COMPSsMinion(redis_conn,
+                              workflow_id,
+                              app_id,
+                              config,
+                              lang)
+    elif platform == 'scikit-learn':
+        # log.info('Starting Scikit-learn Minion')
+        minion = ScikitLearnMinion(redis_conn,
+                                   workflow_id,
+                                   app_id,
+                                   config,
+                                   lang)
+    elif platform == 'keras':
+        log.info('Starting Keras Minion')
+        minion = KerasMinion(redis_conn,
+                             workflow_id,
+                             app_id,
+                             config,
+                             lang)
+    elif platform == 'script':
+        log.info('Starting Script Minion')
+        minion = ScriptMinion(redis_conn,
+                              workflow_id=0,
+                              app_id=0,
+                              config=config,
+                              lang=lang)
+    elif platform == 'plugin':
+        log.info('Starting Plugin Minion')
+        minion = PluginMinion(redis_conn,
+                             workflow_id,
+                             app_id,
+                             config,
+                             lang)
+    elif platform == 'meta':
+        log.info('Starting Meta Minion')
+        minion = MetaMinion(redis_conn,
+                             workflow_id,
+                             app_id,
+                             config,
+                             lang)
+
+    else:
+        raise ValueError(
+            _("{type} is not supported (yet!)").format(type=platform))
+    minion.platform = platform
+    return minion
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
 
     parser.add_argument("-c", "--config", help="Config file.", required=True)
     parser.add_argument("-w", "--workflow_id", help="Workflow id.", type=str,
-                        required=True)
+                        required=False)
     parser.add_argument("-a", "--app_id", help="Job id", type=str,
                         required=False)
     parser.add_argument("-t", "--type", help="Execution engine.",
@@ -46,10 +131,15 @@ if __name__ == '__main__':
 
     parser.add_argument("--freeze", help="Always execute the generated code from infomed file", 
         required=False)
+    parser.add_argument("--standby", action="store_true",
+                        help="Warm minion: wait for an app assignment in "
+                             "the standard input.")
     args = parser.parse_args()
     t = gettext.translation('messages', locales_path, [args.lang],
                             fallback=True)
     t.install()
+    if not args.standby and not args.workflow_id:
+        parser.error(_('Workflow id is required'))
 
     log.info(_("Starting minion"))
     log.debug(_('(c) Lemonade - DCC UFMG'))
@@ -65,59 +155,31 @@ if __name__ == '__main__':
                                        decode_responses=True)
         if args.freeze != '':
             juicer_config['juicer']['freeze'] = args.freeze
-        if args.type == 'spark':
-            # log.info('Starting Juicer Spark Minion')
-            minion = SparkMinion(redis_conn,
-                                 args.workflow_id,
-                                 args.app_id or args.workflow_id,
-                                 juicer_config,
-                                 args.lang, args.jars)
-        elif args.type == 'compss':
-            # log.info('Starting COMPSs Minion')
-            minion = COMPSsMinion(redis_conn,
-                                  args.workflow_id,
-                                  args.app_id or args.workflow_id,
-                                  juicer_config,
-                                  args.lang)
-        elif args.type == 'scikit-learn':
-            # log.info('Starting Scikit-learn Minion')
-            minion = ScikitLearnMinion(redis_conn,
-                                       args.workflow_id,
-                                       args.app_id or args.workflow_id,
-                                       juicer_config,
-                                       args.lang)
-        elif args.type == 'keras':
-            log.info('Starting Keras Minion')
-            minion = KerasMinion(redis_conn,
-                                 args.workflow_id,
-                                 args.app_id or args.workflow_id,
-                                 juicer_config,
-                                 args.lang)
-        elif args.type == 'script':
-            log.info('Starting Script Minion')
-            minion = ScriptMinion(redis_conn,
-                                  workflow_id=0,
-                                  app_id=0,
-                                  config=juicer_config,
-                                  lang=args.lang)
-        elif args.type == 'plugin':
-            log.info('Starting Plugin Minion')
-            minion = PluginMinion(redis_conn,
-                                 args.workflow_id,
-                                 args.app_id or args.workflow_id,
-                                 juicer_config,
-                                 args.lang)
-        elif args.type == 'meta':
-            log.info('Starting Meta Minion')
-            minion = MetaMinion(redis_conn,
-                                 args.workflow_id,
-                                 args.app_id or args.workflow_id,
-                                 juicer_config,
-                                 args.lang)
-
-        else:
-            raise ValueError(
-                _("{type} is not supported (yet!)").format(type=args.type))
+        assigned_at = None
+        if args.standby:
+            warm_up(args.type)
+            log.info(_('Minion is ready (standby), waiting for assignment'))
+            port_lease = os.environ.get('JUICER_PORT_LEASE')
+            lease_ttl = int(os.environ.get('JUICER_PORT_LEASE_TTL', 30))
+            assignment = wait_for_assignment(
+                renew_lease=lambda: redis_conn.expire(port_lease, lease_ttl)
+                if port_lease else None, interval=lease_ttl / 3.0)
+            if assignment is None:
+                log.info(_('Minion pool closed, finishing standby minion'))
+                sys.exit(0)
+            args.workflow_id = assignment['workflow_id']
+            args.app_id = assignment['app_id']
+            assigned_at = assignment.get('assigned_at')
+
+        minion = create_minion(args.type, redis_conn, args.workflow_id,
+                               args.app_id or args.workflow_id, juicer_config,
+                               args.lang, args.jars)
+        minion.requested_at = assigned_at or os.environ.get(
+            'JUICER_MINION_REQUESTED_AT')
+        minion.warm = args.standby
+        minion.port_lease = os.environ.get('JUICER_PORT_LEASE')
+        minion.port_lease_ttl = int(
+            os.environ.get('JUICER_PORT_LEASE_TTL', 30))
         minion.process()
     except Exception as ex:
         log.exception(_("Error running minion"), exc_info=ex)
@@ -4,13 +4,18 @@
 import importlib
 import json
 import logging.config
+import threading
 import time
 
 import datetime
 
 import os
 import pyinotify
-from juicer.runner.control import StateControlRedis
+from juicer.runner.code_cache import CodeCache
+from juicer.runner import telemetry
+from juicer.runner.control import create_state_control
+from juicer.service import metadata_cache
+from juicer.util import result_cache
 
 # noinspection PyUnresolvedReferences
 from six.moves import reload_module
@@ -54,7 +59,7 @@ class Minion:
 
     def __init__(self, redis_conn, workflow_id, app_id, config):
         self.redis_conn = redis_conn
-        self.state_control = StateControlRedis(self.redis_conn)
+        self.state_control = create_state_control(self.redis_conn, config)
         self.workflow_id = workflow_id
         self.app_id = app_id
         self.config = config
@@ -85,6 +90,23 @@ class Minion:
         ]
         self.pid = os.getpid()
 
+        # Used to measure the time to first task (see JuicerServer and
+        # MinionPool). Timestamp when the minion was requested/assigned.
+        self.platform = None
+        self.requested_at = None
+        self.warm = False
+
+        # Lease of the ports used by the minion (see PortAllocator)
+        self.port_lease = None
+        self.port_lease_ttl = 30
+
+        # Compiled generated code, reused if the workflow does not change
+        self.code_cache = CodeCache((config or {}).get('juicer', {}).get(
+            'minion', {}).get('code_cache_size', 8))
+
+        # Metadata of operations and data sources, reused between jobs
+        metadata_cache.configure(config or {})
+
     def get_state(self):
         return self._state
 
@@ -103,12 +125,107 @@ class Minion:
         m = json.dumps(obj)
         self.state_control.push_app_output_queue(self.app_id, m)
 
+    def _report_time_to_first_task(self, job_id):
+        """
+        Records, only for the first job of the minion, the time spent between
+        the request for a minion and the beginning of the job execution.
+        """
+        if self.requested_at is None:
+            return
+        elapsed = time.time() - float(self.requested_at)
+        self.requested_at = None
+        log.info(_('Time to first task (app_id=%s, job_id=%s, warm=%s): '
+                   '%.2fs'), self.app_id, job_id, self.warm, elapsed)
+
+        pool_config = self.config['juicer'].get('minion', {}).get(
+            'pool') or {}
+        metrics_key = pool_config.get('metrics_key', 'pool_metrics')
+        prefix = '{}_{}'.format(self.platform, 'warm' if self.warm else 'cold')
+        try:
+            self.redis_conn.hincrbyfloat(
+                metrics_key, prefix + '_time_to_first_task_sum', elapsed)
+            self.redis_conn.hincrby(
+                metrics_key, prefix + '_time_to_first_task_count', 1)
+        except Exception:
+            log.exception(_('Unable to update minion metrics'))
+
+    def _load_generated_module(self, source, job_id):
+        """
+        Loads the code generated for a job from memory. There is one module
+        for each app, replaced in every job.
+        """
+        module_name = 'juicer_app_{}_{}'.format(self.workflow_id, self.app_id)
+        module = self.code_cache.load(module_name, source)
+        log.debug('Code cache for job %s: %s hit(s), %s miss(es)', job_id,
+                  self.code_cache.hits, self.code_cache.misses)
+        return module
+
+    def _report_result_cache_statistics(self, platform, job_id):
+        """ Reports how many results were read from (or stored in) the
+        durable result cache during the job """
+        stats = result_cache.pop_statistics(platform, job_id)
+        if stats:
+            message = _('Result cache: {hits} hit(s), {misses} miss(es), '
+                        '{stored} stored, {evicted} evicted').format(**stats)
+            log.info('%s (job_id=%s)', message, job_id)
+            self._generate_output(message)
+
+    def get_platform_telemetry(self):
+        """ Telemetry specific to the platform (e.g. Spark jobs) """
+        return {}
+
+    def get_telemetry(self):
+        """ Health and resource usage of the minion """
+        result = {
+            'app_id': self.app_id, 'workflow_id': self.workflow_id,
+            'platform': self.platform, 'pid': os.getpid(),
+            'timestamp': time.time(), 'rss_bytes': telemetry.get_rss(),
+            'code_cache_size': len(self.code_cache),
+            'queue_backlog': self.state_control.get_app_queue_size(
+                self.app_id),
+        }
+        result.update(telemetry.get_gc_telemetry())
+        result.update(telemetry.get_state_telemetry(self.get_state()))
+        result.update(self.get_platform_telemetry())
+        return result
+
+    def publish_telemetry(self):
+        telemetry_config = telemetry.get_telemetry_config(self.config)
+        try:
+            self.redis_conn.hset(
+                telemetry_config.get('key', telemetry.TELEMETRY_KEY),
+                self.app_id, json.dumps(self.get_telemetry()))
+        except Exception:
+            log.exception(_('Unable to publish minion telemetry'))
+
+    def start_telemetry(self):
+        """
+        Publishes telemetry periodically. It must be called by the process
+        executing jobs, the one that holds the state.
+        """
+        telemetry_config = telemetry.get_telemetry_config(self.config)
+        if not telemetry_config.get('enabled', True):
+            return None
+        interval = float(telemetry_config.get('interval', 5))
+
+        def report():
+            while True:
+                self.publish_telemetry()
+                time.sleep(interval)
+
+        thread = threading.Thread(target=report, name='telemetry',
+                                  daemon=True)
+        thread.start()
+        return thread
+
     def _perform_ping(self):
         status = {
             'status': 'READY', 'pid': self.pid,
         }
         self.state_control.set_minion_status(
             self.app_id, json.dumps(status), ex=10, nx=False)
+        if self.port_lease:
+            self.redis_conn.expire(self.port_lease, self.port_lease_ttl)
 
     @staticmethod
     def reload_code(q):
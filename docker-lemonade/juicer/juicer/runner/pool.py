@@ -0,0 +1,242 @@
+# coding=utf-8
+"""
+Pool of pre-forked (warm) minions.
+
+Starting a minion requires a new Python interpreter that imports heavy
+libraries (pyspark, pandas, scikit-learn) before it is able to process the
+first task of an app. A warm minion is a process started in advance, in
+standby mode, that has already paid for those imports and waits for an
+assignment (workflow_id, app_id) sent through its standard input. Warm
+minions use slots (ports) of the host, so they are evicted when the host is
+full and an app can not be assigned to one of them.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger('juicer.runner.pool')
+
+
+class WarmMinion:
+    """ A minion process running in standby mode """
+
+    def __init__(self, platform, proc, port):
+        self.platform = platform
+        self.proc = proc
+        self.port = port
+        self.created = time.time()
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def is_alive(self):
+        return self.proc.poll() is None
+
+    def assign(self, workflow_id, app_id, job_id):
+        """
+        Sends the assignment to the minion. After this, the minion stops being
+        a standby process and starts consuming the app queue.
+        """
+        assignment = {'workflow_id': str(workflow_id), 'app_id': str(app_id),
+                      'job_id': job_id, 'assigned_at': time.time()}
+        self.proc.stdin.write(
+            (json.dumps(assignment) + '\n').encode('utf8'))
+        self.proc.stdin.flush()
+        self.proc.stdin.close()
+
+    def terminate(self):
+        if self.is_alive():
+            self.proc.terminate()
+
+
+class MinionPool:
+    """
+    Keeps, for each configured platform, a number of idle minions ready to be
+    assigned to a new app. Configuration (in juicer.minion.pool):
+
+        pool:
+            metrics_key: pool_metrics      # Redis hash with hit/miss counters
+            refill: eager                  # eager (after each assignment) or
+                                           # lazy (only when the pool is empty)
+            platforms:
+                spark: 2                   # Number of idle minions
+                scikit-learn: 1
+                meta: 1
+    """
+    EAGER = 'eager'
+    LAZY = 'lazy'
+    SUPPORTED_PLATFORMS = ('spark', 'scikit-learn', 'meta')
+
+    def __init__(self, config, redis_conn, build_command, build_env,
+                 log_dir='/tmp', release_port=None):
+        pool_config = config.get('juicer', {}).get('minion', {}).get(
+            'pool') or {}
+        self.sizes = {}
+        for platform, size in (pool_config.get('platforms') or {}).items():
+            if platform not in self.SUPPORTED_PLATFORMS:
+                log.warn(_('Minion pool does not support platform %s'),
+                         platform)
+            elif int(size) > 0:
+                self.sizes[platform] = int(size)
+
+        self.refill_policy = pool_config.get('refill', self.EAGER)
+        self.metrics_key = pool_config.get('metrics_key', 'pool_metrics')
+        self.redis_conn = redis_conn
+        self.build_command = build_command
+        self.build_env = build_env
+        self.release_port = release_port
+        self.log_dir = log_dir
+        self.idle = dict((platform, deque()) for platform in self.sizes)
+
+    @property
+    def enabled(self):
+        return len(self.sizes) > 0
+
+    def supports(self, platform):
+        return platform in self.sizes
+
+    def idle_count(self, platform):
+        self._discard_dead(platform)
+        return len(self.idle.get(platform, []))
+
+    def fill(self, platform=None):
+        """ Starts standby minions until the pool reaches its size """
+        platforms = [platform] if platform else list(self.sizes.keys())
+        for p in platforms:
+            if p not in self.sizes:
+                continue
+            self._discard_dead(p)
+            while len(self.idle[p]) < self.sizes[p]:
+                try:
+                    self.idle[p].append(self._fork(p))
+                except Exception as ex:
+                    # E.g., there is no port available in the host
+                    log.warn(_('Unable to fork warm minion (platform=%s): '
+                               '%s'), p, ex)
+                    break
+
+    def acquire(self, platform, workflow_id, app_id, job_id):
+        """
+        Assigns an idle minion to the app. Returns the assigned process or
+        None if there is not a minion available (the caller must start a new
+        one, i.e., a cold start).
+        """
+        if not self.supports(platform):
+            return None
+        self._discard_dead(platform)
+        idle = self.idle[platform]
+        warm_minion = idle.popleft() if idle else None
+        if warm_minion is not None:
+            try:
+                warm_minion.assign(workflow_id, app_id, job_id)
+            except (IOError, OSError, ValueError):
+                log.exception(_('Unable to assign app %s to warm minion %s'),
+                              app_id, warm_minion.pid)
+                self._release(warm_minion)
+                warm_minion = None
+
+        self._update_metrics(platform, warm_minion is not None)
+
+        if self.refill_policy == self.EAGER or not idle:
+            self.fill(platform)
+
+        if warm_minion is not None:
+            log.info(_('App %s assigned to warm minion (pid=%s, platform=%s)'),
+                     app_id, warm_minion.pid, platform)
+        return warm_minion
+
+    def evict(self):
+        """
+        Terminates an idle minion of the platform with more idle minions,
+        freeing its port for an app that can not use the pool (host is
+        full). Returns True if a minion was evicted.
+        """
+        for platform in self.idle:
+            self._discard_dead(platform)
+        platform = max(self.idle, key=lambda p: len(self.idle[p]),
+                       default=None)
+        if platform is None or not self.idle[platform]:
+            return False
+        warm_minion = self.idle[platform].pop()
+        log.info(_('Evicting warm minion (pid=%s, platform=%s)'),
+                 warm_minion.pid, platform)
+        self._release(warm_minion)
+        return True
+
+    def shutdown(self):
+        for idle in self.idle.values():
+            while idle:
+                self._release(idle.popleft())
+
+    def _discard_dead(self, platform):
+        idle = self.idle.get(platform)
+        if idle:
+            alive = [m for m in idle if m.is_alive()]
+            if len(alive) != len(idle):
+                log.warn(_('Discarding %s dead warm minion(s) (platform=%s)'),
+                         len(idle) - len(alive), platform)
+                for warm_minion in idle:
+                    if not warm_minion.is_alive():
+                        self._release(warm_minion)
+                idle.clear()
+                idle.extend(alive)
+
+    def _release(self, warm_minion):
+        warm_minion.terminate()
+        if self.release_port is not None:
+            self.release_port(warm_minion.port)
+
+    def _update_metrics(self, platform, hit):
+        try:
+            self.redis_conn.hincrby(
+                self.metrics_key,
+                '{}_{}'.format(platform, 'hit' if hit else 'miss'), 1)
+        except Exception:
+            log.exception(_('Unable to update minion pool metrics'))
+
+    def _fork(self, platform):
+        minion_cmd, port = self.build_command(platform)
+        minion_id = 'minion_warm_{}'.format(platform)
+        stdout_log = os.path.join(self.log_dir, minion_id + '_out.log')
+        stderr_log = os.path.join(self.log_dir, minion_id + '_err.log')
+
+        log.info(_('Forking warm minion (platform=%s).'), platform)
+        proc = subprocess.Popen(minion_cmd + ['--standby'],
+                                stdin=subprocess.PIPE,
+                                stdout=open(stdout_log, 'a'),
+                                stderr=open(stderr_log, 'a'),
+                                env=self.build_env(port))
+        return WarmMinion(platform, proc, port)
+
+
+def wait_for_assignment(stream=None, renew_lease=None, interval=10):
+    """
+    Used by a minion in standby mode. Blocks until an assignment is received.
+    While waiting, renew_lease (if informed) is called every interval
+    seconds, so the port lease of the minion expires only if it dies.
+    """
+    stream = stream or sys.stdin
+    assigned = threading.Event()
+
+    def renew():
+        while not assigned.wait(interval):
+            try:
+                renew_lease()
+            except Exception:
+                log.exception(_('Unable to renew port lease'))
+
+    if renew_lease is not None:
+        threading.Thread(target=renew, daemon=True).start()
+    try:
+        line = stream.readline()
+    finally:
+        assigned.set()
+    if not line:
+        return None
+    return json.loads(line)
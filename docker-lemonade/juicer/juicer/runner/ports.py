@@ -0,0 +1,114 @@
+# coding=utf-8
+"""
+Allocation of network ports (slots) for minions running in a host.
+
+Each minion requires a port for libprocess and, derived from it (using the
+port offset), ports for the Spark driver and its block manager. Ports are
+leased in Redis (one key per port, with a TTL renewed by the minion ping),
+so concurrent minions in the same host do not collide and ports of minions
+that died are recovered when their leases expire (warm minions renew their
+leases while waiting for an app, see pool.wait_for_assignment). The number
+of minions per host is limited by its capacity: when the host is full, no
+port is leased and the server must wait (admission control).
+"""
+import logging
+import os
+import socket
+
+log = logging.getLogger('juicer.runner.ports')
+
+
+def _to_str(value):
+    return value.decode('utf8') if isinstance(value, bytes) else value
+
+
+class PortAllocator:
+    """
+    Configuration (in juicer.minion):
+
+        libprocess_port_range: [36000, 36100]
+        port_offset: 100              # Greater than the range size, in order
+                                      # to avoid collisions of derived ports
+        max_minions_per_host: 20      # Default: size of the port range
+        port_lease_ttl: 30            # Seconds (renewed by minion ping)
+        host: juicer-1                # Default: host name
+        server_id: juicer-1-a         # Default: host name and process id
+
+    Ports of warm minions are leased to the standby owner of the server
+    (standby:<server id>), so a server only releases its own warm minions.
+    """
+    LEASE_KEY = 'minion_port_lease_{}_{}'
+    STANDBY = 'standby:{}'
+
+    def __init__(self, config, redis_conn):
+        minion_config = config.get('juicer', {}).get('minion', {}) or {}
+        self.redis_conn = redis_conn
+        self.port_range = list(range(*(minion_config.get(
+            'libprocess_port_range', [36000, 36500]))))
+        self.capacity = int(minion_config.get(
+            'max_minions_per_host', len(self.port_range)))
+        self.ttl = int(minion_config.get('port_lease_ttl', 30))
+        self.host = minion_config.get('host') or socket.gethostname()
+        self.server_id = minion_config.get('server_id') or '{}_{}'.format(
+            self.host, os.getpid())
+        self.standby_owner = self.STANDBY.format(self.server_id)
+
+    def lease_key(self, port):
+        return self.LEASE_KEY.format(self.host, port)
+
+    def _get_leases(self):
+        """ Returns a dict with the leased ports and their owners """
+        owners = self.redis_conn.mget(
+            [self.lease_key(port) for port in self.port_range])
+        return dict((port, _to_str(owner)) for port, owner in zip(
+            self.port_range, owners) if owner is not None)
+
+    def used(self):
+        return len(self._get_leases())
+
+    def is_full(self):
+        return self.used() >= self.capacity
+
+    def acquire(self, owner):
+        """
+        Leases a port to the owner (an app id or standby_owner, for warm
+        minions).
+        Returns None if the host is full.
+        """
+        leases = self._get_leases()
+        if len(leases) >= self.capacity:
+            return None
+        for port in self.port_range:
+            if port in leases:
+                continue
+            # Other server may lease the same port concurrently
+            if self.redis_conn.set(self.lease_key(port), str(owner),
+                                   ex=self.ttl, nx=True):
+                return port
+        return None
+
+    def assign(self, port, owner):
+        """ Transfers the lease of a warm minion to an app """
+        self.redis_conn.set(self.lease_key(port), str(owner), ex=self.ttl)
+
+    def renew(self, port):
+        return self.redis_conn.expire(self.lease_key(port), self.ttl)
+
+    def release(self, port, owner=None):
+        """ Releases a port, if it is leased to the owner (when informed) """
+        key = self.lease_key(port)
+        current = self.redis_conn.get(key)
+        if current is not None and (
+                owner is None or _to_str(current) == str(owner)):
+            self.redis_conn.delete(key)
+            return True
+        return False
+
+    def release_owner(self, owner):
+        """ Releases the ports leased to the owner (an app id or standby) """
+        released = [port for port, current in self._get_leases().items()
+                    if current == str(owner) and self.release(port, owner)]
+        if released:
+            log.info(_('Released port(s) %s leased to app %s'), released,
+                     owner)
+        return released
@@ -34,6 +34,20 @@ SCRIPT = 'script'
 # }
 TERMINATE = 'terminate'
 
+# MORE_DATA messages request a page of the sample of a task output (Spark).
+# Samples are kept in memory by the minion, so pages are not computed again.
+# The page is pushed to the output queue (CSV rows in 'sample' and 'more'
+# indicating if there are more rows).
+# {
+#   'workflow_id': <workflow identifier>
+#   'app_id': <app identifier, representing an workflow instance>
+#   'type': 'more data'
+#   'task_id': <task identifier>
+#   'port': <name of the output port>
+#   'output': <name of the queue used to send the page>
+#   ['offset': <first row, default 0>]
+#   ['size': <number of rows, default 100>]
+# }
 MORE_DATA = 'more data'
 
 EXPORT = 'export'
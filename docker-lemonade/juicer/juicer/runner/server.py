@@ -2,6 +2,7 @@
 
 
 import argparse
+import asyncio
 import gettext
 import json
 import logging.config
@@ -10,6 +11,7 @@ import os
 import signal
 import subprocess
 import sys
+import threading
 import time
 
 import redis
@@ -20,7 +22,12 @@ from juicer.exceptions import JuicerException
 from juicer.kb8s import delete_kb8s_job
 from juicer.runner import configuration
 from juicer.runner import protocol as juicer_protocol
-from juicer.runner.control import StateControlRedis
+from juicer.runner.control import create_state_control
+from juicer.runner.dispatcher import AsyncDispatcher, MinionIndex
+from juicer.runner.pool import MinionPool
+from juicer.runner.ports import PortAllocator
+from juicer.runner.telemetry import TelemetryAggregator, \
+    get_telemetry_config
 from redis.exceptions import ConnectionError
 
 locales_path = os.path.join(os.path.dirname(__file__), '..', 'i18n', 'locales')
@@ -73,8 +80,6 @@ class JuicerServer:
         # Ignore signal in order to avoid defunct processes
         signal.signal(signal.SIGCHLD, signal.SIG_IGN)
 
-        self.port_range = list(range(*(config['juicer'].get('minion', {}).get(
-            'libprocess_port_range', [36000, 36500]))))
         self.advertise_ip = config['juicer'].get('minion', {}).get(
             'libprocess_advertise_ip')
 
@@ -101,6 +106,27 @@ class JuicerServer:
         # Used to kill minions
         self.sub_processes = {}
 
+        # Ports (and number of minions) in this host, leased in Redis
+        self.port_allocator = PortAllocator(self.config, self.redis_conn)
+
+        # Warm (pre-forked) minions, managed by the master process
+        self.minion_pool = MinionPool(
+            self.config, self.redis_conn,
+            build_command=lambda platform: self._build_minion_command(
+                platform),
+            build_env=self._build_minion_env, log_dir=self.log_dir,
+            release_port=self.port_allocator.release)
+
+        # Asynchronous dispatcher (see juicer.runner.dispatcher)
+        self.dispatcher_config = self.config['juicer'].get(
+            'dispatcher') or {}
+        # Minions are started by a single thread at a time
+        self._start_lock = threading.Lock()
+
+        # Health and resource usage reported by minions
+        self.telemetry_config = get_telemetry_config(self.config)
+        self.telemetry = TelemetryAggregator(self.config, self.redis_conn)
+
     def _emit_event(self, room, name, namespace, message, status, identifier,
                     **kwargs):
         data = {'message': message, 'status': status, 'id': identifier}
@@ -115,41 +141,74 @@ class JuicerServer:
         log.info(_('Starting master process. Reading "start" queue'))
 
         redis_conn = self.redis_conn 
-        # Start pending minions
-        apps = [q.split('_')[-1] for q in redis_conn.keys('queue_app_*')]
-        self.state_control = StateControlRedis(redis_conn)
-
-        for app_id in apps:
-            pending_list = redis_conn.lrange('queue_app_{}'.format(app_id), 0, 0)
-            if pending_list:
-                for pending in pending_list:
-                    pending = json.loads(pending)
-                    if pending.get('type') != 'terminate' and pending:
-                        try:
-                            msg = json.loads(pending[0])
-                            log.warn(_('Starting pending app_id {}').format(app_id))
-                            # FIXME: cluster
-                            platform = msg['workflow']['platform']['slug']
-                            job_id = msg['job_id']
-        
-                            self._start_minion(app_id, app_id, job_id, self.state_control,
-                                           platform)
-                        except Exception as e:
-                            print(pending, e)
-            else:
-                log.warn(_("Pending queue is empty"))
+        self.state_control = create_state_control(redis_conn, self.config)
+
+        # Start minions for apps with pending messages (including messages
+        # not acknowledged by a minion that died, if using streams)
+        pending_messages = self.state_control.get_pending_app_messages()
+        if not pending_messages:
+            log.warn(_("Pending queue is empty"))
+        for app_id, pending in pending_messages:
+            try:
+                msg = json.loads(pending)
+                if msg.get('type') != juicer_protocol.TERMINATE:
+                    log.warn(_('Starting pending app_id {}').format(app_id))
+                    # FIXME: cluster
+                    platform = msg['workflow']['platform']['slug']
+                    job_id = msg['job_id']
+
+                    self._start_minion(app_id, app_id, job_id,
+                                       self.state_control, platform)
+            except Exception as e:
+                log.exception(_('Unable to start pending app %s: %s'),
+                              app_id, e)
+
+        if self.minion_pool.enabled:
+            # Leases of warm minions started by a previous instance of this
+            # server (other servers in the host keep theirs)
+            self.port_allocator.release_owner(
+                self.port_allocator.standby_owner)
+            log.info(_('Starting warm minions pool'))
+            self.minion_pool.fill()
 
-        while True:
-            self.read_start_queue(redis_conn)
+        try:
+            if self.dispatcher_config.get('enabled', False):
+                self._run_dispatcher()
+            else:
+                while True:
+                    self.read_start_queue(redis_conn)
+        finally:
+            # Also when terminated (SIGTERM, see _terminate_minions)
+            log.info(_('Terminating warm minions'))
+            self.minion_pool.shutdown()
+
+    def _run_dispatcher(self):
+        log.info(_('Starting asynchronous dispatcher.'))
+        dispatcher = AsyncDispatcher(self.config, self.redis_conn,
+                                     self.handle_start_message)
+        asyncio.run(dispatcher.run())
 
     # noinspection PyMethodMayBeStatic
     def read_start_queue(self, redis_conn):
-        app_id = None
         try:
-            self.state_control = StateControlRedis(redis_conn)
+            if self.state_control is None:
+                self.state_control = create_state_control(redis_conn,
+                                                          self.config)
             # Process next message
             log.info(_('Reading "start" queue.'))
             msg = self.state_control.pop_start_queue()
+        except ConnectionError as cx:
+            log.exception(cx)
+            time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        else:
+            self.handle_start_message(msg)
+
+    def handle_start_message(self, msg):
+        """ Processes a message read from the start queue """
+        app_id = None
+        try:
             log.info(_('Forwarding message to minion.'))
             msg_info = json.loads(msg)
 
@@ -211,28 +270,65 @@ class JuicerServer:
             log.info(_('Minion (workflow_id=%s,app_id=%s) is running on %s.'),
                      workflow_id, app_id, platform)
         else:
-            # This is a special case when the minion timed out.
-            # In this case we kill it before starting a new one
-            active_minions = self.redis_conn.hgetall('active_minions')
-            if (workflow_id, app_id) in active_minions:
-                self._terminate_minion(workflow_id)
-
-            minion_process = self._start_minion(
-                workflow_id, app_id, job_id, self.state_control, platform,
-                cluster=cluster)
+            with self._start_lock:
+                minion_process = None
+                is_local = cluster is None or cluster.get(
+                    'type') != 'KUBERNETES'
+                if is_local:
+                    minion_process = self._assign_warm_minion(
+                        workflow_id, app_id, job_id, self.state_control,
+                        platform)
+                    # Idle warm minions must not block other apps
+                    if minion_process is None and \
+                            self.port_allocator.is_full() and \
+                            not self.minion_pool.evict():
+                        self._wait_for_admission(app_id, msg)
+                        return
+                if minion_process is None:
+                    minion_process = self._start_minion(
+                        workflow_id, app_id, job_id, self.state_control,
+                        platform, cluster=cluster)
 
         # Forward the message to the minion, which can be an execute or a
         # deliver command
-        self.state_control.push_app_queue(app_id, msg)
-        self.state_control.set_workflow_status(workflow_id, self.STARTED)
+        with self.state_control.batch() as batch:
+            batch.push_app_queue(app_id, msg)
+            batch.set_workflow_status(workflow_id, self.STARTED)
+            batch.push_app_output_queue(app_id, json.dumps(
+                {'code': 0,
+                 'message': 'Minion is processing message %s' % msg_type}))
 
         log.info(_('Message %s forwarded to minion (workflow_id=%s,app_id=%s)'),
                  msg_type, workflow_id, app_id)
         # log.info(_('Message content (workflow_id=%s,app_id=%s): %s'),
         #          workflow_id, app_id, msg)
+
+    def _wait_for_admission(self, app_id, msg):
+        """
+        Host is full (all ports are leased). Message waits in the admission
+        queue until a minion finishes (see _handle_minion_event).
+        """
+        log.warn(_('Host %s is full (%s minions), app %s is waiting.'),
+                 self.port_allocator.host, self.port_allocator.capacity,
+                 app_id)
+        self.state_control.push_admission_queue(msg)
         self.state_control.push_app_output_queue(app_id, json.dumps(
             {'code': 0,
-             'message': 'Minion is processing message %s' % msg_type}))
+             'message': 'Waiting for available resources to start minion'}))
+
+    def _admit_waiting_apps(self):
+        """
+        Moves the oldest waiting messages back to the start queue, one for
+        each free slot in the host.
+        """
+        state_control = create_state_control(self.redis_conn, self.config)
+        free = self.port_allocator.capacity - self.port_allocator.used()
+        for _i in range(free):
+            msg = state_control.pop_admission_queue()
+            if msg is None:
+                break
+            log.info(_('Resources available, admitting waiting message.'))
+            state_control.push_start_queue(msg)
 
     def _start_minion(self, workflow_id, app_id, job_id, state_control,
                       platform,
@@ -283,6 +379,57 @@ class JuicerServer:
             nx=False)
         return {}
 
+    def _assign_warm_minion(self, workflow_id, app_id, job_id,
+                            state_control, platform):
+        """
+        Hands the app to an idle minion from the pool, if there is one.
+        """
+        warm_minion = self.minion_pool.acquire(platform, workflow_id, app_id,
+                                               job_id)
+        if warm_minion is None:
+            return None
+        # Lease of the port starts to expire and is renewed by the minion
+        self.port_allocator.assign(warm_minion.port, app_id)
+        proc_id = int(warm_minion.pid)
+        state_control.set_minion_status(
+            app_id, json.dumps({'pid': proc_id, 'port': warm_minion.port}),
+            ex=30, nx=False)
+        self.sub_processes[workflow_id] = warm_minion.proc
+        return warm_minion.proc
+
+    def _build_minion_command(self, platform, workflow_id=None, app_id=None):
+        """
+        Returns the command used to launch a minion and the port allocated
+        to it. If workflow_id is not informed, the minion is launched in
+        standby mode and receives its app later (see MinionPool).
+        """
+        port = self._get_next_available_port(app_id)
+        python_cmd = self.config['juicer'].get('minion', {}).get(
+                'python') or sys.executable
+        minion_cmd = ['nohup', python_cmd, self.minion_executable]
+        if workflow_id is not None:
+            minion_cmd.extend(['-w', str(workflow_id), '-a', str(app_id)])
+        minion_cmd.extend(['-t', platform, '-c', self.config_file_path])
+        return minion_cmd, port
+
+    def _build_minion_env(self, port):
+        # Mesos / libprocess configuration. See:
+        # http://mesos.apache.org/documentation/latest/configuration/libprocess/
+        cloned_env = os.environ.copy()
+        cloned_env['LIBPROCESS_PORT'] = str(port)
+        cloned_env['SPARK_DRIVER_PORT'] = str(port + self.port_offset)
+        cloned_env['SPARK_DRIVER_BLOCKMANAGER_PORT'] = str(
+            port + 2 * self.port_offset)
+        # Lease renewed by the minion ping (see PortAllocator)
+        cloned_env['JUICER_PORT_LEASE'] = self.port_allocator.lease_key(port)
+        cloned_env['JUICER_PORT_LEASE_TTL'] = str(self.port_allocator.ttl)
+        # Used by the minion to report the time to first task
+        cloned_env['JUICER_MINION_REQUESTED_AT'] = str(time.time())
+
+        if self.advertise_ip is not None:
+            cloned_env['LIBPROCESS_ADVERTISE_IP'] = self.advertise_ip
+        return cloned_env
+
     def _start_subprocess_minion(self, workflow_id, app_id, job_id,
                                  state_control, platform, restart=False,
                                  cluster=None):
@@ -293,36 +440,18 @@ class JuicerServer:
         stderr_log = os.path.join(self.log_dir, minion_id + '_err.log')
         log.info(_('Forking minion %s.'), minion_id)
 
-        port = self._get_next_available_port()
-
         # Setup command and launch the minion script. We return the subprocess
         # created as part of an active minion.
         # spark.driver.port and spark.driver.blockManager.port are required
         # when running the driver inside a docker container.
-
-        python_cmd = self.config['juicer'].get('minion', {}).get(
-                'python') or sys.executable
-        minion_cmd = ['nohup', python_cmd, self.minion_executable,
-                      '-w', str(workflow_id), '-a', str(app_id), '-t', platform,
-                      '-c',
-                      self.config_file_path, ]
+        minion_cmd, port = self._build_minion_command(platform, workflow_id,
+                                                      app_id)
         log.info(_('Minion command: %s'), json.dumps(minion_cmd))
 
-        # Mesos / libprocess configuration. See:
-        # http://mesos.apache.org/documentation/latest/configuration/libprocess/
-        cloned_env = os.environ.copy()
-        cloned_env['LIBPROCESS_PORT'] = str(port)
-        cloned_env['SPARK_DRIVER_PORT'] = str(port + self.port_offset)
-        cloned_env['SPARK_DRIVER_BLOCKMANAGER_PORT'] = str(
-            port + 2 * self.port_offset)
-
-        if self.advertise_ip is not None:
-            cloned_env['LIBPROCESS_ADVERTISE_IP'] = self.advertise_ip
-
         proc = subprocess.Popen(minion_cmd,
                                 stdout=open(stdout_log, 'a'),
                                 stderr=open(stderr_log, 'a'),
-                                env=cloned_env)
+                                env=self._build_minion_env(port))
         # Expires in 30 seconds and sets only if it doesn't exist
         proc_id = int(proc.pid)
         state_control.set_minion_status(
@@ -376,19 +505,47 @@ class JuicerServer:
         #         if cluster is not None and cluster.get('type') == 'KUBERNETES'
         #             eval_and_kill_pending_jobs(cluster)
         #     time.sleep(10)
-        pass
 
+        # Leases of minions that died without notice expire, so waiting apps
+        # are also admitted periodically.
+        interval = self.config['juicer'].get('minion', {}).get(
+            'admission_interval', 10)
+        metrics_port = self.telemetry_config.get('metrics_port')
+        if metrics_port and self.telemetry_config.get('enabled', True):
+            self.telemetry.serve(metrics_port)
+        try:
+            while True:
+                time.sleep(interval)
+                try:
+                    self._admit_waiting_apps()
+                    self._summarize_telemetry()
+                except ConnectionError as cx:
+                    log.exception(cx)
+        except KeyboardInterrupt:
+            pass
+
+    def _summarize_telemetry(self):
+        """ Keeps the totals of the minions telemetry in Redis """
+        if not self.telemetry_config.get('enabled', True):
+            return
+        summary = self.telemetry.summarize(self.telemetry.read())
+        self.redis_conn.set('{}_summary'.format(self.telemetry.key),
+                            json.dumps(summary))
+        log.debug(_('Minions telemetry: %s'), summary)
 
-    def _get_next_available_port(self):
-        return self.port_range[0]
-        # FIXME
-        used_ports = set(
-            [minion['port'] for minion in list(self.active_minions.values())])
-        for i in self.port_range:
-            if i not in used_ports:
-                return i
-        raise ValueError(_('Unable to launch minion: there is not available '
-                           'port for libprocess.'))
+
+    def _get_next_available_port(self, app_id=None):
+        """
+        Leases a port to the app. Minions without app are warm minions (see
+        MinionPool) and renew their lease while they are idle.
+        """
+        port = self.port_allocator.acquire(
+            self.port_allocator.standby_owner if app_id is None else app_id)
+        if port is None:
+            raise JuicerException(_('Unable to launch minion: there is not '
+                                    'available port for libprocess.'),
+                                  code=503)
+        return port
 
     def watch_new_minion(self):
         try:
@@ -397,66 +554,28 @@ class JuicerServer:
             parsed_url = urlparse(
                 self.config['juicer']['servers']['redis_url'])
             redis_conn = redis.StrictRedis(host=parsed_url.hostname,
-                                           port=parsed_url.port)
+                                           port=parsed_url.port,
+                                           decode_responses=True)
             redis_conn.config_set('notify-keyspace-events', 'KE$gx')
-            pub_sub = redis_conn.pubsub()
-            pub_sub.psubscribe('__keyspace*__:key_minion_app*')
-            for msg in pub_sub.listen():
-                # print('|{}|'.format(msg.get('channel')))
-                app_id = msg.get('channel', '').decode('utf8').split('_')[-1]
-                if app_id.isdigit():
-                    app_id = int(app_id)
-                    key = (app_id, app_id)
-                    data = msg.get('data', '')
-                    active_minions = self.redis_conn.hgetall('active_minions')
-                    if str(key[0]) in active_minions:
-                        if data == b'del' or data == b'expired':
-                            self.redis_conn.hdel('active_minions', key[0])
-                            log.info(_('Minion {} finished.').format(app_id))
-
-                            if app_id in self.sub_processes:
-                                del self.sub_processes[app_id]
-
-                            pendings = redis_conn.lrange('queue_app_{}'.format(
-                                app_id), 0, 0)
-                            # FIXME
-                            if pendings and False:
-                                for pending in pendings: 
-                                    if pending.get('type') != 'terminate':
-                                        log.warn(
-                                            _('There are messages to process in app {} '
-                                              'queue, starting minion.').format(app_id))
-                                        if self.state_control is None:
-                                            self.state_control = StateControlRedis(
-                                                redis_conn)
-                                        pending_msg = json.loads(pending[0])
-                                        platform = pending_msg['workflow']['platform'][
-                                            'slug']
-                                        print(pending_msg.keys())
-                                        job_id = pending_msg['workflow']['job_id']
-                                        self._start_minion(
-                                            app_id, app_id, job_id, self.state_control,
-                                            platform)
-        
-                    elif data == b'set':
-                        # Externally launched minion
-                        minion_info = json.loads(redis_conn.get(
-                            'key_minion_app_{}'.format(app_id)).decode('utf8'))
-                        port = self._get_next_available_port()
-                        self.redis_conn.hset('active_minions', key[0], 
-                                minion_info.get('pid'))
-
-                        #self.active_minions[key] = {
-                        #    'pid': minion_info.get('pid'), 'port': port}
-                        log.info(
-                            _('Minion {} joined (pid: {}, port: {}).').format(
-                                app_id, minion_info.get('pid'), port))
+            # This process is the one that maintains active_minions
+            minion_index = MinionIndex(redis_conn, update_active_minions=True)
+            minion_index.listen(self._handle_minion_event)
         except KeyboardInterrupt:
             pass
         except ConnectionError as cx:
             log.exception(cx)
             time.sleep(1)
 
+    def _handle_minion_event(self, app_id, state):
+        if state == MinionIndex.FINISHED:
+            log.info(_('Minion {} finished.').format(app_id))
+            self.telemetry.remove(app_id)
+            if self.port_allocator.release_owner(app_id):
+                self._admit_waiting_apps()
+        else:
+            # Also externally launched minions
+            log.info(_('Minion {} joined.').format(app_id))
+
     def process(self):
         log.info(_('Juicer server started (pid=%s)'), os.getpid())
         self.start_process = multiprocessing.Process(
@@ -0,0 +1,215 @@
+# coding=utf-8
+"""
+Health and resource telemetry of minions.
+
+Each minion periodically publishes its telemetry (memory, garbage collector,
+cached states, Spark jobs and storage, backlog of its queue) as a JSON
+document in a Redis hash (field is the app id). It is published by a thread
+of the process executing jobs, because it is the one holding the state.
+JuicerServer aggregates the telemetry of all minions, removes entries of
+minions that are gone and, optionally, exposes it as a Prometheus-style text
+endpoint (/metrics).
+"""
+import gc
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+log = logging.getLogger('juicer.runner.telemetry')
+
+TELEMETRY_KEY = 'minion_telemetry'
+
+# Numeric telemetry exported as Prometheus metrics (name, help)
+METRICS = [
+    ('rss_bytes', 'Resident memory of the minion'),
+    ('cached_states', 'Number of task results kept by the minion'),
+    ('cached_state_bytes', 'Estimated size of the task results in memory'),
+    ('queue_backlog', 'Messages waiting in the app queue'),
+    ('spark_active_jobs', 'Spark jobs running'),
+    ('spark_active_stages', 'Spark stages running'),
+    ('spark_cached_rdds', 'Spark RDDs (and data frames) persisted'),
+    ('spark_cached_memory_bytes', 'Spark persisted data in memory'),
+    ('spark_cached_disk_bytes', 'Spark persisted data in disk'),
+]
+
+
+def _to_str(value):
+    return value.decode('utf8') if isinstance(value, bytes) else value
+
+
+def get_telemetry_config(config):
+    return (config or {}).get('juicer', {}).get('telemetry') or {}
+
+
+def get_rss():
+    """ Current resident memory (bytes) of the process """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (IOError, IndexError, ValueError):
+        # Not Linux, use the peak instead (KB in Linux, bytes in macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_gc_telemetry():
+    return {'gc_counts': list(gc.get_count()),
+            'gc_collections': [s['collections'] for s in gc.get_stats()]}
+
+
+def estimate_size(value, max_depth=4):
+    """
+    Estimates the memory used by data frames and arrays in a (nested) value.
+    Spark data frames are not local, see get_spark_telemetry().
+    """
+    if max_depth < 0:
+        return 0
+    if hasattr(value, 'memory_usage') and hasattr(value, 'columns'):
+        # Pandas data frame (deep estimation is too expensive)
+        try:
+            return int(value.memory_usage(index=True).sum())
+        except Exception:
+            return 0
+    if hasattr(value, 'nbytes') and isinstance(
+            getattr(value, 'nbytes'), int):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_size(v, max_depth - 1)
+                   for v in list(value.values()))
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v, max_depth - 1) for v in list(value))
+    return 0
+
+
+def get_state_telemetry(state):
+    """ Number of task results in a minion state and their size """
+    # State also keeps the status and the message of the last job
+    results = [v for k, v in list(state.items())
+               if k not in ('status', 'message')]
+    return {'cached_states': len(results),
+            'cached_state_bytes': sum(estimate_size(r) for r in results)}
+
+
+# noinspection PyProtectedMember
+def get_spark_telemetry(spark_session):
+    """ Active jobs and stages (status tracker) and persisted data """
+    context = spark_session.sparkContext
+    tracker = context.statusTracker()
+    storage = context._jsc.sc().getRDDStorageInfo()
+    return {
+        'spark_active_jobs': len(tracker.getActiveJobsIds()),
+        'spark_active_stages': len(tracker.getActiveStageIds()),
+        'spark_cached_rdds': len(storage),
+        'spark_cached_memory_bytes': sum(s.memSize() for s in storage),
+        'spark_cached_disk_bytes': sum(s.diskSize() for s in storage),
+    }
+
+
+class TelemetryAggregator:
+    """
+    Aggregates the telemetry published by minions.
+    Configuration (in juicer.telemetry):
+
+        telemetry:
+            enabled: true
+            interval: 5           # Seconds between minion reports
+            key: minion_telemetry
+            stale_after: 30       # Seconds, entries of dead minions
+            metrics_port: 9150    # Prometheus endpoint (disabled if absent)
+    """
+
+    def __init__(self, config, redis_conn):
+        telemetry_config = get_telemetry_config(config)
+        self.redis_conn = redis_conn
+        self.key = telemetry_config.get('key', TELEMETRY_KEY)
+        self.stale_after = float(telemetry_config.get('stale_after', 30))
+
+    def read(self):
+        """ Returns the telemetry by app id, removing stale entries """
+        now = time.time()
+        result = {}
+        stale = []
+        for app_id, value in self.redis_conn.hgetall(self.key).items():
+            app_id = _to_str(app_id)
+            try:
+                telemetry = json.loads(_to_str(value))
+            except ValueError:
+                telemetry = {}
+            if now - telemetry.get('timestamp', 0) > self.stale_after:
+                stale.append(app_id)
+            else:
+                result[app_id] = telemetry
+        if stale:
+            self.redis_conn.hdel(self.key, *stale)
+        return result
+
+    def remove(self, app_id):
+        self.redis_conn.hdel(self.key, str(app_id))
+
+    @staticmethod
+    def summarize(minions):
+        """ Totals of all minions and the minion using more memory """
+        summary = {'minions': len(minions)}
+        for name, _ in METRICS:
+            summary[name] = sum(t.get(name) or 0 for t in minions.values())
+        if minions:
+            summary['largest_app_id'] = max(
+                minions, key=lambda app_id: (
+                    minions[app_id].get('cached_state_bytes', 0) +
+                    minions[app_id].get('spark_cached_memory_bytes', 0)))
+        return summary
+
+    @staticmethod
+    def to_prometheus(minions):
+        """ Telemetry in Prometheus text format """
+        lines = []
+        for name, description in METRICS:
+            metric = 'juicer_minion_{}'.format(name)
+            lines.append('# HELP {} {}'.format(metric, description))
+            lines.append('# TYPE {} gauge'.format(metric))
+            for app_id, telemetry in sorted(minions.items()):
+                if telemetry.get(name) is not None:
+                    lines.append(
+                        '{}{{app_id="{}",platform="{}",pid="{}"}} {}'.format(
+                            metric, app_id, telemetry.get('platform'),
+                            telemetry.get('pid'), telemetry[name]))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='0.0.0.0'):
+        """ Serves /metrics (Prometheus) and /minions (JSON) in a thread """
+        aggregator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # noinspection PyPep8Naming
+            def do_GET(self):
+                minions = aggregator.read()
+                if self.path.startswith('/metrics'):
+                    body = aggregator.to_prometheus(minions)
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path.startswith('/minions'):
+                    body = json.dumps({
+                        'summary': aggregator.summarize(minions),
+                        'minions': minions})
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                log.debug(fmt, *args)
+
+        server = HTTPServer((host, int(port)), Handler)
+        thread = threading.Thread(target=server.serve_forever,
+                                  name='telemetry', daemon=True)
+        thread.start()
+        log.info(_('Serving minion telemetry in port %s'), port)
+        return server
@@ -66,6 +66,10 @@ class DataReaderOperation(Operation):
         self.has_code = any(
             [len(self.named_outputs) > 0, self.contains_results()])
 
+        # Columns and conditions pushed down by the transpiler (push_down())
+        self.pushdown_columns = None
+        self.pushdown_filters = []
+
         self.header = False
         if self.has_code:
             if self.DATA_SOURCE_ID_PARAM in parameters:
@@ -90,6 +94,57 @@ class DataReaderOperation(Operation):
             self.output = named_outputs.get('output data',
                                             'out_task_{}'.format(self.order))
 
+    @property
+    def supports_persistent_cache(self):
+        # Reading from the source is as expensive as reading from cache
+        return False
+
+    def push_down(self, columns, filters=None):
+        """
+        Reads only the informed columns (None means all) and, for Parquet,
+        skips row groups without rows satisfying the filters (tuples
+        (attribute, operator, value), rows are still filtered by the
+        operations using them). Requires the attributes of the data source
+        (and, for CSV, using them as schema). Returns True if anything was
+        pushed down.
+        """
+        if not self.has_code:
+            return False
+        data_format = self.metadata.get('format')
+        attributes = [attr['name']
+                      for attr in self.metadata.get('attributes') or []]
+        if not attributes or not (
+                data_format == 'PARQUET' or (
+                    data_format == 'CSV' and
+                    self.infer_schema == self.INFER_FROM_LIMONERO)):
+            return False
+
+        selected = [name for name in attributes
+                    if columns is not None and name in columns]
+        if selected and len(selected) < len(attributes):
+            self.pushdown_columns = selected
+        protect = (self.parameters.get('export_notebook', False) or
+                   self.parameters.get('plain', False))
+        if data_format == 'PARQUET' and not protect:
+            self.pushdown_filters = [f for f in filters or []
+                                     if f[0] in attributes]
+        return bool(self.pushdown_columns or self.pushdown_filters)
+
+    def get_memory_config(self):
+        config = self.parameters.get('configuration') or {}
+        sklearn_config = config.get('juicer', {}).get('scikit_learn') or {}
+        return sklearn_config.get('memory_optimization') or {}
+
+    def get_streaming_config(self):
+        config = self.parameters.get('configuration') or {}
+        sklearn_config = config.get('juicer', {}).get('scikit_learn') or {}
+        return sklearn_config.get('streaming') or {}
+
+    def get_data_source_version(self):
+        if not self.has_code:
+            return None
+        return '{}:{}'.format(self.data_source_id, self.metadata.get('updated'))
+
     def _set_data_source_parameters(self, parameters):
 
         self.data_source_id = int(parameters[self.DATA_SOURCE_ID_PARAM])
@@ -174,6 +229,16 @@ class DataReaderOperation(Operation):
                    self.parameters.get('plain', False)) or self.plain
         data_format = self.metadata.get('format')
 
+        # Out-of-core reading, only for formats that can be read in chunks.
+        # Generated code for notebooks and plain scripts keeps using pandas.
+        streaming_config = self.get_streaming_config()
+        streaming = (streaming_config.get('enabled', False) and not protect
+                     and data_format in ('CSV', 'TEXT', 'PARQUET'))
+        # Data types are changed after reading the whole data
+        memory_config = self.get_memory_config()
+        memory_optimization = (memory_config.get('enabled', False) and
+                               not protect and not streaming)
+
         parsed = urlparse(self.metadata['url'])
 
         extra_params = {}
@@ -215,6 +280,10 @@ class DataReaderOperation(Operation):
 
         attributes, converters, parse_dates, names = self.analyse_attributes(
              self.metadata.get('attributes'))
+        columns = self.pushdown_columns
+        if columns and attributes:
+            attributes = [attr for attr in attributes if attr[0] in columns]
+            parse_dates = [name for name in parse_dates if name in columns]
 
         self.template = """
         {%- if infer_from_limonero %}
@@ -235,7 +304,18 @@ class DataReaderOperation(Operation):
         {%- endif %}
 
         # Open data source
-        {%- if protect %}
+        {%- if streaming %}
+        # Data is read in chunks, when it is consumed
+        def open_data_source():
+        {%-   if parsed.scheme == 'hdfs'  %}
+            fs = pa.hdfs.connect(host='{{parsed.hostname}}', 
+                port={{parsed.port}},
+                user='{{extra_params.get('user', parsed.username) or 'hadoop'}}')
+            return fs.open('{{parsed.path}}', 'rb')
+        {%-   elif parsed.scheme == 'file' %}
+            return open('{{parsed.path}}', 'rb')
+        {%-   endif %}
+        {%- elif protect %}
         f = open('{{parsed.path.split('/')[-1]}}', 'rb')
         {%- elif parsed.scheme == 'hdfs'  %}
         fs = pa.hdfs.connect(host='{{parsed.hostname}}', 
@@ -247,11 +327,19 @@ class DataReaderOperation(Operation):
         {%- endif %}
 
         {%- if format == 'CSV' %}
+        {%-   if streaming %}
+        {{output}} = streaming.read_csv(open_data_source, {{chunk_size}},
+                                 sep='{{sep}}',
+        {%-   else %}
         {{output}} = pd.read_csv(f, sep='{{sep}}',
+        {%-   endif %}
                                  encoding='{{encoding}}',
                                  header={{header}},
                                  {%- if infer_from_limonero %}
                                  names={{names}},
+                                 {%- if usecols %}
+                                 usecols={{usecols}},
+                                 {%- endif %}
                                  dtype=columns,
                                  parse_dates={{parse_dates}},
                                  converters={{converters}},
@@ -262,19 +350,37 @@ class DataReaderOperation(Operation):
                                  {%-   endif %}
                                  na_values={{na_values}},
                                  error_bad_lines={{mode_failfast}})
+        {%-   if not streaming %}
         f.close()
+        {%-   endif %}
         {%-   if header == 'infer' %}
         {{output}}.columns = ['attr{{i}}'.format(i=i) 
                         for i, _ in enumerate({output}.columns)]
         {%-   endif %}
+        {%- elif format == 'TEXT' and streaming %}
+        {{output}} = streaming.read_csv(open_data_source, {{chunk_size}},
+                                 sep='{{sep}}',
+                                 encoding='{{encoding}}',
+                                 names = ['value'],
+                                 error_bad_lines={{mode_failfast}})
         {%- elif format == 'TEXT' %}
         {{output}} = pd.read_csv(f, sep='{{sep}}',
                                  encoding='{{encoding}}',
                                  names = ['value'],
                                  error_bad_lines={{mode_failfast}})
         f.close()
+        {%- elif format == 'PARQUET' and streaming %}
+        {{output}} = streaming.read_parquet(open_data_source,
+                                            columns={{usecols}},
+                                            filters={{filters}})
+        {%- elif format == 'PARQUET' and filters %}
+        # Skips row groups without rows satisfying the filters
+        {{output}} = pd.DataFrame(streaming.read_row_groups(
+            f, columns={{usecols}}, filters={{filters}}))
+        f.close()
         {%- elif format == 'PARQUET' %}
-        {{output}} = pd.read_parquet(f, engine='pyarrow')
+        {{output}} = pd.read_parquet(f, engine='pyarrow'
+            {%- if usecols %}, columns={{usecols}}{% endif %})
         f.close()
         {%- elif format == 'JSON' %}
         {{output}} = pd.read_json(f, orient='records')
@@ -283,10 +389,29 @@ class DataReaderOperation(Operation):
         {{jdbc_code}}
         {%- endif %}
 
-        {%- if infer_from_data %}
+        {%- if infer_from_data and streaming %}
+        {{output}} = {{output}}.map_chunks(lambda df: df.infer_objects())
+        {%- elif infer_from_data %}
         {{output}} = {{output}}.infer_objects()
         {%- endif %}
 
+        {%- if memory_optimization %}
+        # Use smaller data types (only if no value changes)
+        {{output}}, memory_report = memory.optimize_dtypes(
+            {{output}}, {{memory_stats}},
+            max_category_ratio={{memory_config.get('max_category_ratio', 0.5)}},
+            sample_size={{memory_config.get('sample_size', 10000)}},
+            string_dtype={{memory_config.get('string_dtype')|pprint}},
+            downcast_integers={{memory_config.get('downcast_integers', False)}})
+        if memory_report:
+            emit_event(name='update task',
+                message=SimpleTableReport(
+                    'table table-striped table-bordered w-auto',
+                    {{memory_headers}}, memory.format_report(memory_report),
+                    title='{{memory_title}}').generate(),
+                type='HTML', status='RUNNING', identifier=task_id)
+        {%- endif %}
+
         """
         ctx = {
             'attributes': attributes,
@@ -300,6 +425,21 @@ class DataReaderOperation(Operation):
             'is_first_line_header': self.header,
 
             'protect': protect,  # Hide information about path
+            'streaming': streaming,
+            'usecols': columns,
+            'filters': self.pushdown_filters,
+            'memory_optimization': memory_optimization,
+            'memory_config': memory_config,
+            'memory_stats': [
+                {'name': attr['name'],
+                 'distinct_values': attr.get('distinct_values'),
+                 'enumeration': attr.get('enumeration', False)}
+                for attr in self.metadata.get('attributes') or []],
+            'memory_headers': [_('Attribute'), _('Original type'),
+                               _('New type'), _('Original size'),
+                               _('New size')],
+            'memory_title': _('Memory used by data'),
+            'chunk_size': streaming_config.get('chunk_size', 100000),
             'parsed': parsed,
             'extra_params': extra_params,
             'format': data_format,
@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 import itertools
+import logging
 import re
 from gettext import gettext
 from textwrap import dedent
 
 from juicer.operation import Operation
 from juicer.scikit_learn.expression import Expression, \
-        JAVA_2_PYTHON_DATE_FORMAT
+        JAVA_2_PYTHON_DATE_FORMAT, VectorizationError, compile_query, \
+        get_expression, get_identifiers, is_condition, split_conjunction, \
+        vectorization_enabled
+
+log = logging.getLogger(__name__)
 
 
 class AddColumnsOperation(Operation):
@@ -136,6 +141,16 @@ class AggregationOperation(Operation):
     def get_output_names(self, sep=", "):
         return self.output
 
+    def get_required_columns(self, output_columns):
+        if not self.has_code or not self.attributes:
+            return None
+        if self.pivot:
+            return set(self.attributes) | set(self.pivot) | set(
+                self.input_operations_pivot.keys())
+        return set(self.attributes) | {
+            f[self.FUNCTION_PARAM_ATTRIBUTE] for f in self.functions
+            if f[self.FUNCTION_PARAM_ATTRIBUTE] != '*'}
+
     def generate_code(self):
         if self.has_code:
             code = ''
@@ -154,7 +169,7 @@ class AggregationOperation(Operation):
                 code += dedent("""
                 aggfunc = {aggfunc}
                 {output} = pd.pivot_table(input_data, index={index},
-                    columns={pivot}, aggfunc=aggfunc)
+                    columns={pivot}, aggfunc=aggfunc, observed=True)
                 # rename columns and convert to DataFrame
                 {output}.reset_index(inplace=True)
                 new_idx = [n[0] if n[1] == ''
@@ -166,7 +181,8 @@ class AggregationOperation(Operation):
                            aggfunc=self.input_operations_pivot))
             else:
                 code += dedent("""
-                {output} = {input}.groupby({columns}).agg({operations}).reset_index()
+                {output} = {input}.groupby({columns}, observed=True).agg(
+                    {operations}).reset_index()
                 """.format(output=self.output,
                            input=self.named_inputs['input data'],
                            columns=self.attributes,
@@ -237,20 +253,19 @@ class CleanMissingOperation(Operation):
     def generate_code(self):
         if self.has_code:
             op = ""
-            copy_code = ".copy()" \
-                if self.parameters.get('multiplicity',
-                                       {}).get('input data', 1) > 1 else ""
+            # Removing rows or columns creates a new data frame. Filling
+            # values changes the input, unless it is not used anymore.
+            copy_code = "" if self.is_dead_input('input data') else ".copy()"
             if self.mode_CM == "REMOVE_ROW":
                 code = """
                     min_missing_ratio = {min_thresh}
                     max_missing_ratio = {max_thresh}
-                    {output} = {input}{copy_code}
                     ratio = {input}[{columns}].isnull().sum(axis=1) / len({columns})
                     ratio_mask = (ratio > min_missing_ratio) & (ratio <= max_missing_ratio)
-                    {output} = {output}[~ratio_mask]
+                    {output} = {input}[~ratio_mask]
                     """ \
                     .format(min_thresh=self.min_ratio, max_thresh=self.max_ratio,
-                            copy_code=copy_code, output=self.output,
+                            output=self.output,
                             input=self.named_inputs['input data'],
                             columns=self.attributes_CM, op=op)
 
@@ -259,7 +274,6 @@ class CleanMissingOperation(Operation):
                 code = """
                     min_missing_ratio = {min_thresh}
                     max_missing_ratio = {max_thresh}
-                    {output} = {input}{copy_code}
                     to_remove = []
                     for col in {columns}:
                         ratio = {input}[col].isnull().sum() / len({input})
@@ -267,10 +281,10 @@ class CleanMissingOperation(Operation):
                         if ratio_mask:
                             to_remove.append(col)
 
-                    {output}.drop(columns=to_remove, inplace=True)
+                    {output} = {input}.drop(columns=to_remove)
                     """ \
                     .format(min_thresh=self.min_ratio, max_thresh=self.max_ratio,
-                            output=self.output, copy_code=copy_code,
+                            output=self.output,
                             input=self.named_inputs['input data'],
                             columns=self.attributes_CM, op=op)
 
@@ -408,6 +422,16 @@ class DropOperation(Operation):
         self.output = self.named_outputs.get(
             'output data', 'output_data_{}'.format(self.order))
 
+    @property
+    def supports_chunks(self):
+        return True
+
+    def get_required_columns(self, output_columns):
+        # Dropped columns must exist
+        if output_columns is None:
+            return None
+        return set(output_columns) | set(self.attributes)
+
     def generate_code(self):
         if self.has_code:
             code = "{output} = {input}.drop(columns={columns})" \
@@ -623,12 +647,30 @@ class FilterOperation(Operation):
 
         self.advanced_filter = parameters.get(self.ADVANCED_FILTER_PARAM) or []
         self.filter = parameters.get(self.FILTER_PARAM) or []
+        # Conditions not compiled to a query (see _generate_mask_code())
+        self.not_compiled = []
 
         self.has_code = len(named_inputs) > 0 and any(
             [len(self.named_outputs) > 0, self.contains_results()])
         self.output = self.named_outputs.get('output data',
                                              'out_{}'.format(self.order))
 
+    @property
+    def supports_chunks(self):
+        return True
+
+    def get_required_columns(self, output_columns):
+        if output_columns is None:
+            return None
+        result = set(output_columns)
+        for f in self.filter:
+            # Value may be a literal or an attribute
+            result.update([f['attribute'],
+                           str(f.get('value', f.get('alias')))])
+        for expr in self.advanced_filter:
+            result.update(get_identifiers(expr['tree']))
+        return result
+
     def generate_code(self):
         if self.has_code:
             input_data = self.named_inputs['input data']
@@ -643,6 +685,10 @@ class FilterOperation(Operation):
             {out} = {input}""".format(out=self.output,
                                       input=self.named_inputs['input data'])
 
+            if vectorization_enabled(self.parameters):
+                return dedent(code + self._generate_mask_code(filters,
+                                                              params))
+
             expressions = []
             for i, expr in enumerate(self.advanced_filter):
                 expression = Expression(expr['tree'], params)
@@ -662,6 +708,73 @@ class FilterOperation(Operation):
 
             return dedent(code)
 
+    def get_warnings(self):
+        # Conditions not compiled are evaluated by slower code
+        result = []
+        for expression, reason in self.not_compiled:
+            if expression:
+                result.append(gettext(
+                    'Filter condition {} was not compiled to a query '
+                    '(unsupported {}).').format(expression, reason))
+            else:
+                result.append(gettext(
+                    'Filter condition was not compiled to a query '
+                    '(unsupported {}).').format(reason))
+        return result
+
+    def _generate_mask_code(self, filters, params):
+        """
+        All conditions are combined into a single mask, so the input is
+        sliced (copied) only once. Conditions (or parts of a conjunction)
+        using only arithmetic, comparison and logical operators are compiled
+        into a single DataFrame.eval()/query() expression. Others are
+        evaluated by vectorized or row-wise code.
+        """
+        query = list(filters)
+        masks = []
+        del self.not_compiled[:]
+        for expr in self.advanced_filter:
+            for condition in split_conjunction(expr['tree']):
+                try:
+                    if not is_condition(condition):
+                        raise VectorizationError(
+                            gettext('it is not a condition'))
+                    query.append(compile_query(condition))
+                except VectorizationError as ve:
+                    self.not_compiled.append(
+                        (expr.get('expression'), str(ve)))
+                    expression = get_expression(condition, params)
+                    if expression.vectorized:
+                        masks.append('{}.pipe({})'.format(
+                            self.output, expression.parsed_expression))
+                    else:
+                        masks.append('{}.apply({}, axis=1)'.format(
+                            self.output, expression.parsed_expression))
+        for expression, reason in self.not_compiled:
+            log.info(_('Filter condition %s was not compiled to a query '
+                       '(unsupported %s).'), expression, reason)
+
+        if not masks:
+            if not query:
+                return ''
+            return """
+            {out} = {out}.query({query})""".format(
+                out=self.output, query=repr(' and '.join(query)))
+        if not query and len(masks) == 1:
+            return """
+            {out} = {out}[{mask}]""".format(out=self.output, mask=masks[0])
+
+        code = ''
+        if query:
+            masks.insert(0, '{}.eval({})'.format(
+                self.output, repr(' and '.join(query))))
+        for i, mask in enumerate(masks):
+            code += """
+            mask {op} {mask}""".format(op='=' if i == 0 else '&=', mask=mask)
+        code += """
+            {out} = {out}[mask]""".format(out=self.output)
+        return code
+
 
 class IntersectionOperation(Operation):
     """
@@ -845,6 +958,15 @@ class ReplaceValuesOperation(Operation):
 
         return output
 
+    @property
+    def supports_chunks(self):
+        return True
+
+    def get_required_columns(self, output_columns):
+        if output_columns is None:
+            return None
+        return set(output_columns) | set(self.replaces.keys())
+
     def generate_code(self):
         if self.has_code:
             code = """
@@ -903,6 +1025,10 @@ class SampleOrPartitionOperation(Operation):
         self.has_code = len(self.named_inputs) == 1 and any(
             [len(self.named_outputs) >= 1, self.contains_results()])
 
+    def get_required_columns(self, output_columns):
+        # Sampled rows depend only on the number of rows
+        return output_columns
+
     def generate_code(self):
         if self.has_code:
             if self.type == self.TYPE_PERCENT:
@@ -979,6 +1105,19 @@ class SelectOperation(Operation):
         self.output = self.named_outputs.get(
             'output projected data', 'projection_data_{}'.format(self.order))
 
+    @property
+    def supports_chunks(self):
+        return True
+
+    def get_required_columns(self, output_columns):
+        if not self.has_code:
+            return None
+        if self.mode == 'include':
+            return {attr.get('attribute') for attr in self.attributes}
+        elif self.mode == 'exclude' and output_columns is not None:
+            return set(output_columns)
+        return None
+
     def generate_code(self):
         attributes = []
         aliases = []
@@ -1031,6 +1170,11 @@ class SortOperation(Operation):
         self.output = self.named_outputs.get(
             'output data', 'output_data_{}'.format(self.order))
 
+    def get_required_columns(self, output_columns):
+        if output_columns is None:
+            return None
+        return set(output_columns) | set(self.columns)
+
     def generate_code(self):
         if self.has_code:
             code = "{out} = {input}.sort_values(by={columns}, ascending={asc})" \
@@ -1117,25 +1261,41 @@ class TransformationOperation(Operation):
             self.output = self.named_outputs.get(
                 'output data', 'sampled_data_{}'.format(self.order))
 
+    @property
+    def supports_chunks(self):
+        return True
+
+    def get_required_columns(self, output_columns):
+        # Position of new columns depends on the existing ones
+        if output_columns is None or not self.has_code or any(
+                p != -1 for p in self.positions):
+            return None
+        result = set(output_columns) - {
+            expr['alias'] for expr in self.expressions}
+        for expr in self.expressions:
+            result.update(get_identifiers(expr['tree']))
+        return result
+
     def generate_code(self):
         # Builds the expression and identify the target column
         params = {'input': self.named_inputs['input data']}
         functions = ""
+        vectorize = vectorization_enabled(self.parameters)
         for expr in self.expressions:
             expression = expr['tree']
-            expression = Expression(expression, params)
+            # Vectorized expressions evaluate whole columns at once
+            expression = get_expression(expression, params, vectorize)
             f = expression.parsed_expression
-            functions += "['{}', {}],".format(expr['alias'], f)
+            functions += "['{}', {}, {}],".format(expr['alias'], f,
+                                                  expression.vectorized)
 
             self.imports.update(expression.imports)
             # row.append(expression.imports) #TODO: by operation itself
 
-        #copy_code = ".copy()" \
-        #    if self.parameters['multiplicity']['input data'] > 1 else ""
-        # Always copy. If the target name (alias) exists in df,
-        # the original df is changed and may impact the workflow
-        # processing.
-        copy_code = '.copy()'
+        # Copy, unless input is not used anymore. If the target name (alias)
+        # exists in df, the original df is changed and may impact the
+        # workflow processing (or cached results).
+        copy_code = '' if self.is_dead_input('input data') else '.copy()'
 
         import_clause = '\n'.join([(8 * ' ' + imp) for imp in
             expression.imports.split('\n')])
@@ -1144,11 +1304,15 @@ class TransformationOperation(Operation):
         {out} = {input}{copy_code}
         functions = [{expr}]
         positions = {positions}
-        for i, (col, function) in enumerate(functions):
+        for i, (col, function, vectorized) in enumerate(functions):
+            if vectorized:
+                values = function({out})
+            else:
+                values = {out}.apply(function, axis=1)
             if positions[i] == -1:
-                {out}[col] = {out}.apply(function, axis=1)
+                {out}[col] = values
             else:
-                {out}.insert(positions[i], col, {out}.apply(function, axis=1))
+                {out}.insert(positions[i], col, values)
 
         """.format(copy_code=copy_code,
                    out=self.output, input=self.named_inputs['input data'],
@@ -1374,6 +1538,16 @@ class CastOperation(Operation):
             for x in parts])
         return py_fmt
 
+    @property
+    def supports_chunks(self):
+        return True
+
+    def get_required_columns(self, output_columns):
+        if output_columns is None or not self.has_code:
+            return None
+        return set(output_columns) | {
+            attr['attribute'] for attr in self.attributes}
+
     def generate_code(self):
         errors = {
             'NaN_2_int': gettext(
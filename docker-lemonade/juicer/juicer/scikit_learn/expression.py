@@ -1,6 +1,7 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import copy
 import re
 import json
 from six import text_type
@@ -24,18 +25,164 @@ JAVA_2_PYTHON_DATE_FORMAT = {
     'Z': '%Z',
     "'": ''
 }
- 
+
+
+class VectorizationError(ValueError):
+    """ Expression has no column-wise (vectorized) equivalent """
+    pass
+
+
+def vectorization_enabled(parameters):
+    """ Vectorized code can be disabled in juicer.transpiler configuration """
+    config = parameters.get('configuration') or {}
+    transpiler_config = config.get('juicer', {}).get('transpiler') or {}
+    return transpiler_config.get('vectorize_expressions', True)
+
+
+def _has_identifier(tree):
+    """ Tests if the expression refers to an attribute (column) """
+    if isinstance(tree, dict):
+        if tree.get('type') == 'Identifier':
+            return True
+        return any(_has_identifier(v) for k, v in tree.items()
+                   if k != 'callee')
+    if isinstance(tree, list):
+        return any(_has_identifier(v) for v in tree)
+    return False
+
+
+def get_identifiers(tree):
+    """ Names of the attributes (columns) used by the expression """
+    if isinstance(tree, dict):
+        if tree.get('type') == 'Identifier':
+            return {tree['name']}
+        return set().union(*[get_identifiers(v) for k, v in tree.items()
+                             if k != 'callee'])
+    if isinstance(tree, list):
+        return set().union(*[get_identifiers(v) for v in tree])
+    return set()
+
+
+def get_expression(json_code, params, vectorize=True):
+    """
+    Returns a vectorized expression (a function evaluating whole columns of
+    a data frame), if every function used has a column-wise equivalent.
+    Otherwise, returns a row-wise expression (applied to each row).
+    Expressions not referring to any attribute are always row-wise.
+    """
+    if vectorize and _has_identifier(json_code):
+        try:
+            # Parsing may change the tree
+            return Expression(copy.deepcopy(json_code), params,
+                              vectorized=True)
+        except VectorizationError:
+            pass
+    return Expression(json_code, params)
+
+
+# Operators and functions supported by DataFrame.eval()/query()
+QUERY_BINARY_OPERATORS = {
+    '+': '+', '-': '-', '*': '*', '/': '/', '%': '%', '**': '**',
+    '==': '==', '===': '==', '!=': '!=', '!==': '!=',
+    '<': '<', '>': '>', '<=': '<=', '>=': '>=',
+}
+QUERY_CONDITION_OPERATORS = {'==', '===', '!=', '!==', '<', '>', '<=', '>='}
+QUERY_LOGICAL_OPERATORS = {'&&': '&', '||': '|'}
+QUERY_FUNCTIONS = {
+    'abs': 'abs', 'sin': 'sin', 'cos': 'cos', 'tan': 'tan',
+    'arcsin': 'arcsin', 'arccos': 'arccos', 'arctan': 'arctan',
+    'asin': 'arcsin', 'acos': 'arccos', 'atan': 'arctan',
+    'arctan2': 'arctan2', 'atan2': 'arctan2', 'sinh': 'sinh',
+    'cosh': 'cosh', 'tanh': 'tanh', 'arcsinh': 'arcsinh',
+    'arccosh': 'arccosh', 'arctanh': 'arctanh', 'exp': 'exp',
+    'expm1': 'expm1', 'log': 'log', 'log10': 'log10', 'log1p': 'log1p',
+    'sqrt': 'sqrt',
+}
+
+
+def split_conjunction(tree):
+    """ Splits a && b && c into [a, b, c] """
+    if tree.get('type') == 'LogicalExpression' and tree['operator'] == '&&':
+        return split_conjunction(tree['left']) + split_conjunction(
+            tree['right'])
+    return [tree]
+
+
+def is_condition(tree):
+    """ Tests if the expression (root) evaluates to a boolean """
+    return (tree.get('type') == 'LogicalExpression' or
+            (tree.get('type') == 'BinaryExpression' and
+             tree['operator'] in QUERY_CONDITION_OPERATORS) or
+            (tree.get('type') == 'UnaryExpression' and
+             tree['operator'] in ('!', 'not')))
+
+
+def compile_query(tree):
+    """
+    Compiles an arithmetic, comparison or logical expression into a string
+    evaluated by DataFrame.eval() or DataFrame.query(), using numexpr (if
+    installed). Raises VectorizationError, informing the first sub-expression
+    that is not supported.
+    """
+    node_type = tree.get('type')
+    if node_type == 'Identifier':
+        return '`{}`'.format(tree['name'].replace('`', ''))
+    elif node_type == 'Literal':
+        value = tree.get('value')
+        if isinstance(value, (bool, int, float, str, text_type)):
+            return repr(value)
+        raise VectorizationError(gettext('literal {}').format(
+            tree.get('raw', value)))
+    elif node_type == 'BinaryExpression':
+        if tree['operator'] not in QUERY_BINARY_OPERATORS:
+            raise VectorizationError(gettext('operator {}').format(
+                tree['operator']))
+        return '({} {} {})'.format(
+            compile_query(tree['left']),
+            QUERY_BINARY_OPERATORS[tree['operator']],
+            compile_query(tree['right']))
+    elif node_type == 'LogicalExpression':
+        if tree['operator'] not in QUERY_LOGICAL_OPERATORS:
+            raise VectorizationError(gettext('operator {}').format(
+                tree['operator']))
+        return '({} {} {})'.format(
+            compile_query(tree['left']),
+            QUERY_LOGICAL_OPERATORS[tree['operator']],
+            compile_query(tree['right']))
+    elif node_type == 'UnaryExpression':
+        operator = {'!': '~', 'not': '~', '-': '-', '+': '+'}.get(
+            tree['operator'])
+        if operator is None:
+            raise VectorizationError(gettext('operator {}').format(
+                tree['operator']))
+        return '({}{})'.format(operator, compile_query(tree['argument']))
+    elif node_type == 'CallExpression':
+        name = tree['callee']['name']
+        if name not in QUERY_FUNCTIONS:
+            raise VectorizationError(gettext('function {}()').format(name))
+        return '{}({})'.format(QUERY_FUNCTIONS[name], ', '.join(
+            compile_query(arg) for arg in tree['arguments']))
+    raise VectorizationError(gettext('expression {}').format(node_type))
+
 
 class Expression:
-    def __init__(self, json_code, params):
+    def __init__(self, json_code, params, vectorized=False):
         self.code = json_code
+        self.vectorized = vectorized
         self.functions = {}
         self.imports_functions = {}
         self.translate_functions = {}
         self.build_functions_dict()
+        if vectorized:
+            self.build_vectorized_functions_dict()
 
         self.imports = ""
-        self.parsed_expression = "lambda row: " + self.parse(json_code, params)
+        if vectorized:
+            self.parsed_expression = "lambda df: " + self.parse(json_code,
+                                                                params)
+        else:
+            self.parsed_expression = "lambda row: " + self.parse(json_code,
+                                                                 params)
 
     def parse(self, tree, params):
 
@@ -54,6 +201,9 @@ class Expression:
 
         # Expression parsing
         elif tree['type'] == 'CallExpression':
+            if self.vectorized and tree['callee']['name'] not in \
+                    self.functions:
+                raise VectorizationError(tree['callee']['name'])
             if tree['callee']['name'] not in self.functions:
                 raise ValueError(_('Function {f}() does not exists.').format(
                     f=tree['callee']['name']))
@@ -61,7 +211,11 @@ class Expression:
 
         # Identifier parsing
         elif tree['type'] == 'Identifier':
-            if 'input' in params:
+            if self.vectorized:
+                if 'input' not in params:
+                    raise VectorizationError(tree['name'])
+                result = "df['{}']".format(tree['name'])
+            elif 'input' in params:
                 result = "{}['{}']".format('row', tree[
                     'name'])  # params['input'], tree['name'])
             else:
@@ -69,7 +223,9 @@ class Expression:
 
         # Unary Expression parsing
         elif tree['type'] == 'UnaryExpression':
-            if tree['operator'] == '!':
+            if self.vectorized and tree['operator'] in ('!', 'not'):
+                tree['operator'] = '~'
+            elif tree['operator'] == '!':
                 tree['operator'] = 'not'
             result = "({} {})".format(tree['operator'],
                                       self.parse(tree['argument'], params))
@@ -77,7 +233,12 @@ class Expression:
         elif tree['type'] == 'LogicalExpression':
             operators = {"&&": "&", "||": "|", "!": "~"}
             operator = operators[tree['operator']]
-            result = "{} {} {}".format(self.parse(tree['left'], params),
+            if self.vectorized:
+                result = "({} {} {})".format(
+                    self.parse(tree['left'], params), operator,
+                    self.parse(tree['right'], params))
+            else:
+                result = "{} {} {}".format(self.parse(tree['left'], params),
                                            operator,
                                            self.parse(tree['right'], params))
 
@@ -117,6 +278,10 @@ class Expression:
         Map when() function call in Lemonade into np.select() call in Pandas.
         """
         arguments = [self.parse(x, params) for x in spec['arguments']]
+        if self.vectorized:
+            return "np.select([{}], [{}], default={})".format(
+                ', '.join(arguments[:-1:2]), ', '.join(arguments[1::2]),
+                arguments[-1])
         # print >> sys.stderr, group(arguments[:-1], 2)
         code = "np.select([{}], [{}], default=[{}])[0]".format(
             ', '.join(arguments[:-1:2]),
@@ -376,6 +541,181 @@ class Expression:
                 _('Incorrect number of arguments ({}) for function {}'.format
                   (len(args), 'next_day')))
 
+    def get_str_function_call(self, spec, params, alias=None):
+        """
+        Vectorized string function, using pandas .str accessor.
+
+        Example: lower(name) will be converted to df['name'].str.lower()
+        """
+        function = alias or spec['callee']['name']
+        args = [self.parse(x, params) for x in spec['arguments']]
+        return "{}.str.{}({})".format(args[0], function, ', '.join(args[1:]))
+
+    def get_dt_attribute_call(self, spec, params, alias=None):
+        """
+        Vectorized date attribute, using pandas .dt accessor.
+
+        Example: month(date) will be converted to df['date'].dt.month
+        """
+        function = alias or spec['callee']['name']
+        return "{}.dt.{}".format(self.parse(spec['arguments'][0], params),
+                                 function)
+
+    def get_vectorized_concat_call(self, spec, params):
+        args = spec['arguments'][:]
+        sep = ''
+        if spec['callee']['name'] == 'concat_ws':
+            if len(args) < 3 or args[0]['type'] == 'Identifier':
+                raise VectorizationError('concat_ws')
+            sep = args.pop(0)['value']
+        elif len(args) < 2:
+            raise VectorizationError('concat')
+        attributes = [
+            '{}.astype(str)'.format(self.parse(arg, params))
+            if arg['type'] == 'Identifier' else self.parse(arg, params)
+            for arg in args]
+        return '({})'.format(' + {} + '.format(repr(sep)).join(attributes)
+                             if sep else ' + '.join(attributes))
+
+    def get_vectorized_date_trunc_call(self, spec, params):
+        value = self.parse(spec['arguments'][0], params)
+        fmt = spec['arguments'][1]['value'].lower()
+        py_fmt = {
+            'hour': 'h', 'minute': 't', 'second': 's', 'day': 'd',
+        }.get(fmt)
+        if py_fmt:
+            return "{}.dt.floor('{}')".format(value, py_fmt)
+        elif fmt in ('year', 'month'):
+            return "{}.dt.to_period('{}').dt.to_timestamp()".format(
+                value, fmt[0].upper())
+        raise VectorizationError('date_trunc')
+
+    def get_vectorized_regexp_call(self, spec, params):
+        args = spec['arguments']
+        expr = (self.parse(args[1], params) if args[1]['type'] != 'Literal'
+                else "r'{}'".format(args[1]['value']))
+        value = self.parse(args[0], params)
+        if spec['callee']['name'] == 'regexp_extract':
+            return '{}.str.findall({})'.format(value, expr)
+        return '{}.str.replace({}, {}, regex=True)'.format(
+            value, expr, self.parse(args[2], params))
+
+    def get_vectorized_substring_call(self, spec, params):
+        args = [self.parse(x, params) for x in spec['arguments']]
+        if len(args) == 3:
+            return '{}.str[{}:{}]'.format(*args)
+        elif len(args) == 2:
+            return '{}.str[{}:]'.format(*args)
+        raise VectorizationError('substring')
+
+    def build_vectorized_functions_dict(self):
+        """
+        Functions with a column-wise equivalent in pandas/NumPy. Any other
+        function makes the expression row-wise (see get_expression()).
+        Vectorized functions must return the same results of row-wise ones.
+        """
+        # NumPy universal functions work with Series too
+        numpy_functions = [
+            'abs', 'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan', 'asin',
+            'acos', 'atan', 'hypot', 'arctan2', 'atan2', 'deg2rad', 'rad2deg',
+            'sinh', 'cosh', 'tanh', 'arccosh', 'arcsinh', 'arctanh',
+            'around', 'rint', 'fix', 'floor', 'ceil', 'exp', 'expm1',
+            'exp2', 'log', 'log10', 'log2', 'log1p', 'logaddexp',
+            'logaddexp2', 'add', 'reciprocal', 'negative', 'multiply',
+            'divide', 'power', 'subtract', 'true_divide', 'floor_divide',
+            'float_power', 'fmod', 'remainder', 'clip', 'sqrt', 'cbrt',
+            'square', 'fabs', 'sign', 'nan_to_num', 'logical_and',
+            'logical_or', 'logical_not', 'logical_xor', 'equal', 'not_equal',
+            'greater_equal', 'less_equal', 'greater', 'less', 'degrees',
+            'radians', 'isnan', 'pow', 'round', 'signum', 'shiftLeft',
+            'shiftRight',
+        ]
+        row_functions = self.functions
+        self.functions = {f: row_functions[f] for f in numpy_functions}
+
+        # Python str methods also available in pandas .str accessor
+        str_functions = [
+            'casefold', 'center', 'endswith', 'find', 'index', 'isalnum',
+            'isalpha', 'isdecimal', 'isdigit', 'islower', 'isnumeric',
+            'isspace', 'istitle', 'isupper', 'ljust', 'lstrip', 'rfind',
+            'rindex', 'rjust', 'rsplit', 'rstrip', 'startswith', 'strip',
+            'swapcase', 'zfill',
+        ]
+        self.functions.update({f: self.get_str_function_call
+                               for f in str_functions})
+
+        str_aliases = {
+            'capitalize': 'capitalize', 'initcap': 'title', 'instr': 'find',
+            'length': 'len', 'lower': 'lower', 'lpad': 'ljust',
+            'ltrim': 'rstrip', 'rpad': 'rjust', 'rtrim': 'rstrip',
+            'size': 'len', 'title': 'title', 'trim': 'strip',
+            'upper': 'upper',
+        }
+        self.functions.update({
+            f: (lambda a: lambda s, p: self.get_str_function_call(s, p, a))(
+                alias) for f, alias in str_aliases.items()})
+
+        dt_attributes = {
+            'dayofmonth': 'day', 'dayofweek': 'weekday',
+            'dayofyear': 'dayofyear', 'hour': 'hour', 'minute': 'minute',
+            'month': 'month', 'quarter': 'quarter', 'second': 'second',
+            'weekday': 'weekday', 'year': 'year',
+        }
+        self.functions.update({
+            f: (lambda a: lambda s, p: self.get_dt_attribute_call(s, p, a))(
+                alias) for f, alias in dt_attributes.items()})
+
+        self.functions.update({
+            'concat': self.get_vectorized_concat_call,
+            'concat_ws': self.get_vectorized_concat_call,
+            'current_date': row_functions['current_date'],
+            'current_timestamp': row_functions['current_timestamp'],
+            'date_format': lambda s, p: "{}.dt.strftime('{}')".format(
+                self.parse(s['arguments'][0], p),
+                self._get_python_date_format(s['arguments'][1]['value'])),
+            'date_trunc': self.get_vectorized_date_trunc_call,
+            'from_unixtime': row_functions['from_unixtime'],
+            'isnotnull': row_functions['isnotnull'],
+            'isnull': row_functions['isnull'],
+            'isoweekday': lambda s, p: '({}.dt.weekday + 1)'.format(
+                self.parse(s['arguments'][0], p)),
+            'lit': row_functions['lit'],
+            'regexp_extract': self.get_vectorized_regexp_call,
+            'regexp_replace': self.get_vectorized_regexp_call,
+            'repeat': lambda s, p: '{}.str.repeat({})'.format(
+                self.parse(s['arguments'][0], p),
+                self.parse(s['arguments'][1], p)),
+            'replace': lambda s, p:
+                '{}.str.replace({}, {}, regex=False)'.format(
+                    self.parse(s['arguments'][0], p),
+                    self.parse(s['arguments'][1], p),
+                    self.parse(s['arguments'][2], p)
+                    if len(s['arguments']) > 2 else "''"),
+            'reverse': lambda s, p: '{}.str[::-1]'.format(
+                self.parse(s['arguments'][0], p)),
+            'slice': lambda s, p:
+                '{val}.str[{start}-1:{start}+{length}-1]'.format(
+                    val=self.parse(s['arguments'][0], p),
+                    start=self.parse(s['arguments'][1], p),
+                    length=self.parse(s['arguments'][2], p)),
+            'str': lambda s, p: '{}.astype(str)'.format(
+                self.parse(s['arguments'][0], p)),
+            'substring': self.get_vectorized_substring_call,
+            'to_date': lambda s, p: "pd.to_datetime({}, format='{}')".format(
+                self.parse(s['arguments'][0], p),
+                self._get_python_date_format(s['arguments'][1]['value'])),
+            'to_timestamp': lambda s, p:
+                "pd.to_datetime({}, format='{}')".format(
+                    self.parse(s['arguments'][0], p),
+                    self._get_python_date_format(s['arguments'][1]['value'])),
+            'to_utc_timestamp': lambda s, p: '{}.dt.tz_localize({})'.format(
+                self.parse(s['arguments'][0], p),
+                self.parse(s['arguments'][1], p)),
+            'total_seconds': lambda s, p: '{}.dt.total_seconds()'.format(
+                self.parse(s['arguments'][0], p)),
+            'when': self.get_when_function,
+        })
+
     def build_functions_dict(self):
 
         str_builtin_functions = ['split', 'capitalize', 'casefold', 'center',
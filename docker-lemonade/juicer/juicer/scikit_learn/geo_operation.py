@@ -3,6 +3,7 @@ from textwrap import dedent
 
 import re
 from juicer.operation import Operation
+from juicer.scikit_learn.processes import get_workers
 
 
 class ReadShapefileOperation(Operation):
@@ -97,14 +98,12 @@ class GeoWithinOperation(Operation):
 
             self.output = self.named_outputs.get(
                 'output data', 'output_data_{}'.format(self.order))
-            from juicer.scikit_learn.library.geo_within \
-                import GeoWithinOperation
-            self.transpiler_utils.add_custom_function("GeoWithinOperation",
-                                                      GeoWithinOperation)
 
     def generate_code(self):
         """Generate code."""
+        # Polygons of the shapefile are indexed once (see geo_within)
         code = """
+        from juicer.scikit_learn.library import geo_within
         lat_long = {lat_long}
         attributes = {att}
         alias = '{alias}'
@@ -112,15 +111,17 @@ class GeoWithinOperation(Operation):
         col_lat = "{LAT}"
         col_long = "{LON}"     
 
-        {out} = GeoWithinOperation({input}, {shape}, lat_long,
-                       attributes, alias, polygon_col, col_lat, col_long)    
+        {out} = geo_within.GeoWithinOperation({input}, {shape}, lat_long,
+                       attributes, alias, polygon_col, col_lat, col_long,
+                       workers={workers})
                                 
         """.format(shape=self.named_inputs['geo data'],
                    polygon=self.polygon_column[0],
                    att=self.attributes,  alias=self.alias,
                    input=self.named_inputs['input data'],
                    LAT=self.lat_column[0], LON=self.lon_column[0],
-                   out=self.output, lat_long=True)
+                   out=self.output, lat_long=True,
+                   workers=get_workers(self.parameters.get('configuration')))
         return dedent(code)
 
 
@@ -182,7 +183,8 @@ class STDBSCANOperation(Operation):
         {output} = {data_input}{copy_code}
             
         st_dbscan = STDBSCAN(spatial_threshold={spatial}, 
-            temporal_threshold={temporal}, min_neighbors={minPts})
+            temporal_threshold={temporal}, min_neighbors={minPts},
+            n_jobs={n_jobs})
                          
         {output} = st_dbscan.fit_transform({data_input}, 
                 col_lat='{col_latitude}', col_lon='{col_longitude}',
@@ -193,7 +195,9 @@ class STDBSCANOperation(Operation):
                    output=self.output, minPts=self.min_pts,
                    spatial=self.spatial_thr, temporal=self.temporal_thr,
                    col_latitude=self.lat_col, col_longitude=self.lon_col,
-                   col_datetime=self.datetime_col, alias=self.alias)
+                   col_datetime=self.datetime_col, alias=self.alias,
+                   n_jobs=get_workers(
+                       self.parameters.get('configuration')) or None)
 
         return dedent(code)
 
@@ -1,79 +1,152 @@
 # -*- coding: utf-8 -*-
+"""
+Point in polygon join (GeoWithin) used by code generated for scikit-learn.
+
+Paths and bounding boxes of the polygons of a shapefile (data frame read by
+ReadShapefile) are created once and cached while the data frame exists and
+its polygons do not change.
+Points are sorted by longitude, so the candidates of each polygon (points in
+its bounding box) are found by binary search and tested in batch
+(Path.contains_points). Large sets of points are split into chunks,
+processed in parallel by the worker processes of the minion.
+"""
+import hashlib
+import weakref
 
-import pyqtree
-import pandas as pd
-from matplotlib.path import Path
 import numpy as np
+from juicer.scikit_learn import processes
+from matplotlib.path import Path
+
+# Smaller sets of points are processed by the current process
+MIN_POINTS_PER_WORKER = 100000
+
+# Polygon indexes of shapefiles (data frames), by id
+_indexes = {}
+
+
+class PolygonIndex(object):
+    """ Polygons (vertices as latitude, longitude) and their bounding boxes """
+
+    def __init__(self, polygons):
+        self.positions = []
+        self.paths = []
+        bounds = []
+        for position, vertices in enumerate(polygons):
+            vertices = np.asarray(vertices, dtype='float64').reshape(-1, 2)
+            # Empty polygons contain no points
+            if len(vertices):
+                self.positions.append(position)
+                self.paths.append(Path(vertices))
+                bounds.append(np.concatenate([vertices.min(axis=0),
+                                              vertices.max(axis=0)]))
+        self.bounds = np.array(bounds).reshape(-1, 4)
+
+    def query(self, lats, lons):
+        """
+        Returns pairs (point, polygon) of positions, for each point inside a
+        polygon.
+        """
+        order = np.argsort(lons, kind='stable')
+        sorted_lons = lons[order]
+        starts = np.searchsorted(sorted_lons, self.bounds[:, 1], side='left')
+        ends = np.searchsorted(sorted_lons, self.bounds[:, 3], side='right')
+
+        points = []
+        polygons = []
+        for i in np.flatnonzero(ends > starts):
+            lat_min, _, lat_max, _ = self.bounds[i]
+            candidates = order[starts[i]:ends[i]]
+            candidates = candidates[(lats[candidates] >= lat_min) &
+                                    (lats[candidates] <= lat_max)]
+            if len(candidates):
+                inside = self.paths[i].contains_points(
+                    np.column_stack([lats[candidates], lons[candidates]]))
+                points.append(candidates[inside])
+                polygons.append(np.full(inside.sum(), self.positions[i]))
+
+        if not points:
+            return np.array([], dtype='int64'), np.array([], dtype='int64')
+        points = np.concatenate(points)
+        polygons = np.concatenate(polygons)
+        sort = np.lexsort((polygons, points))
+        return points[sort], polygons[sort]
+
+
+def _get_fingerprint(polygons):
+    """ Number of polygons and a hash of their vertices """
+    digest = hashlib.sha1()
+    for vertices in polygons:
+        digest.update(vertices.tobytes())
+        digest.update(np.int64(len(vertices)).tobytes())
+    return len(polygons), digest.hexdigest()
+
+
+def get_polygon_index(shp_object, polygon_col, lat_long):
+    """
+    Index of the polygons of a shapefile, reused while it exists. Data frames
+    are mutable, so the index is rebuilt if polygons change.
+    """
+    polygons = [np.asarray(vertices, dtype='float64').reshape(-1, 2)
+                for vertices in shp_object[polygon_col]]
+    fingerprint = _get_fingerprint(polygons)
+    key = (id(shp_object), polygon_col, lat_long)
+    cached = _indexes.get(key)
+    if cached is not None and cached[0]() is shp_object and \
+            cached[1] == fingerprint:
+        return cached[2]
+
+    # Vertices are (latitude, longitude) if lat_long, (x, y) otherwise
+    columns = [0, 1] if lat_long else [1, 0]
+    index = PolygonIndex(vertices[:, columns] for vertices in polygons)
+    if cached is None or cached[0]() is not shp_object:
+        weakref.finalize(shp_object, _indexes.pop, key, None)
+    _indexes[key] = (weakref.ref(shp_object), fingerprint, index)
+    return index
+
+
+def _query(args):
+    index, lats, lons, offset = args
+    points, polygons = index.query(lats, lons)
+    return points + offset, polygons
+
+
+def find_polygons(index, lats, lons, workers=0):
+    """
+    Pairs (point, polygon) of positions. Points are split into chunks,
+    processed in parallel, if there are enough points for more than one
+    worker.
+    """
+    total = len(lats)
+    workers = min(workers, total // MIN_POINTS_PER_WORKER)
+    if workers < 2 or processes.in_worker():
+        return index.query(lats, lons)
+
+    bounds = np.linspace(0, total, workers + 1).astype(int)
+    chunks = [(index, lats[start:end], lons[start:end], start)
+              for start, end in zip(bounds, bounds[1:])]
+    parts = list(processes.get_executor(workers).map(_query, chunks))
+    return (np.concatenate([points for points, _ in parts]),
+            np.concatenate([polygons for _, polygons in parts]))
 
 
 def GeoWithinOperation(data_input, shp_object, lat_long,
-                       attributes, alias, polygon_col, col_lat, col_long):
+                       attributes, alias, polygon_col, col_lat, col_long,
+                       workers=0):
 
     if len(attributes) == 0:
         attributes = shp_object.columns
 
-    if lat_long:
-        LAT_pos = 0
-        LON_pos = 1
-    else:
-        LAT_pos = 1
-        LON_pos = 0
-
-    xmin = float('+inf')
-    ymin = float('+inf')
-    xmax = float('-inf')
-    ymax = float('-inf')
-
-    for i, sector in shp_object.iterrows():
-        for point in sector[polygon_col]:
-            xmin = min(xmin, point[LON_pos])
-            ymin = min(ymin, point[LAT_pos])
-            xmax = max(xmax, point[LON_pos])
-            ymax = max(ymax, point[LAT_pos])
-
-    # create the main bound box
-    spindex = pyqtree.Index(bbox=[xmin, ymin, xmax, ymax])
-
-    # than, insert all sectors bbox
-    for inx, sector in shp_object.iterrows():
-        points = []
-        xmin = float('+inf')
-        ymin = float('+inf')
-        xmax = float('-inf')
-        ymax = float('-inf')
-        for point in sector[polygon_col]:
-            points.append((point[LON_pos], point[LAT_pos]))
-            xmin = min(xmin, point[LON_pos])
-            ymin = min(ymin, point[LAT_pos])
-            xmax = max(xmax, point[LON_pos])
-            ymax = max(ymax, point[LAT_pos])
-        spindex.insert(item=inx, bbox=[xmin, ymin, xmax, ymax])
-
-    sector_position = []
-    if len(data_input) > 0:
-        for i, point in data_input.iterrows():
-            y = float(point[col_lat])
-            x = float(point[col_long])
-
-            # (xmin,ymin,xmax,ymax)
-            matches = spindex.intersect([x, y, x, y])
-
-            for shp_inx in matches:
-                row = shp_object.loc[shp_inx]
-                polygon = Path(row[polygon_col])
-                if polygon.contains_point([y, x]):
-                    content = [i] + row[attributes].tolist()
-                    sector_position.append(content)
-
-    if len(sector_position) > 0:
-        attributes = ['index_geoWithin'] + list(attributes)
-        cols = ["%s%s" % (a, alias) for a in attributes]
-        tmp = pd.DataFrame(sector_position, columns=cols)
-
-        key = 'index_geoWithin' + alias
-        data_input = pd.merge(data_input, tmp,
-                              left_index=True, right_on=key)
-        data_input = data_input.drop([key], axis=1)
+    index = get_polygon_index(shp_object, polygon_col, lat_long)
+    lats = data_input[col_lat].to_numpy(dtype='float64')
+    lons = data_input[col_long].to_numpy(dtype='float64')
+    points, polygons = find_polygons(index, lats, lons, workers)
+
+    # Points are repeated for each polygon containing them
+    if len(points) > 0:
+        data_input = data_input.iloc[points].reset_index(drop=True)
+        for a in attributes:
+            data_input["%s%s" % (a, alias)] = \
+                shp_object[a].to_numpy()[polygons]
     else:
         for a in [a + alias for a in attributes]:
             data_input[a] = np.nan
@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import datetime
+import numpy as np
+
 
 class STDBSCAN(object):
 
     def __init__(self, spatial_threshold=500.0, temporal_threshold=60.0,
-                 min_neighbors=15):
+                 min_neighbors=15, n_jobs=None, chunk_size=10000):
         """
         Python ST-DBSCAN implementation.
         Because this algorithm needs to calculate multiple distances between
@@ -16,33 +17,88 @@ class STDBSCAN(object):
         UTM projects onto a cylinder, and a cylinder is essentially flat (zero
         Gaussian curvature) so the Euclidean formula would be accurate for
         points on the cylinder (same Zone).
+        Neighbors are retrieved using a spatial index (KD-tree) built for each
+        chunk of points sorted by time, containing only the points within the
+        temporal threshold of the chunk (time window).
         :param spatial_threshold: Maximum geographical coordinate (spatial)
              distance value (meters);
         :param temporal_threshold: Maximum non-spatial distance value (seconds);
         :param min_neighbors: Minimum number of points within Eps1 and Eps2
              distance;
+        :param n_jobs: Number of chunks queried in parallel (threads);
+        :param chunk_size: Number of points in each chunk;
         """
         self.spatial_threshold = spatial_threshold
         self.temporal_threshold = temporal_threshold
         self.min_neighbors = min_neighbors
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _to_seconds(values):
+        """ Time as seconds (float) since the first time """
+        import pandas
+
+        values = np.asarray(values)
+        if len(values) == 0:
+            return values.astype('float64')
+        if np.issubdtype(values.dtype, np.number):
+            return values.astype('float64') - values.min()
+        # Differences are computed before conversion, keeping the precision
+        nanoseconds = pandas.to_datetime(values, utc=True).tz_localize(
+            None).to_numpy(dtype='datetime64[ns]').astype('int64')
+        return (nanoseconds - nanoseconds.min()) / 1e9
+
+    def _query_chunk(self, start, end, coordinates, times):
+        """
+        Neighbors of points [start, end) (sorted by time), returned as pairs
+        (point, neighbor) of positions.
+        """
+        from sklearn.neighbors import KDTree
 
-    def _retrieve_neighbors(self, index_center, matrix):
+        # Time window with all candidates to be neighbors of the chunk
+        window_start = np.searchsorted(
+            times, times[start] - self.temporal_threshold, side='left')
+        window_end = np.searchsorted(
+            times, times[end - 1] + self.temporal_threshold, side='right')
 
-        center_point = matrix[index_center, :]
+        tree = KDTree(coordinates[window_start:window_end])
+        candidates = tree.query_radius(coordinates[start:end],
+                                       r=self.spatial_threshold)
+        lengths = [len(c) for c in candidates]
+        points = np.repeat(np.arange(start, end), lengths)
+        neighbors = np.concatenate(candidates) + window_start
 
-        # filter by time
-        min_time = center_point[2] - datetime.timedelta(seconds=self.temporal_threshold)
-        max_time = center_point[2] + datetime.timedelta(seconds=self.temporal_threshold)
-        matrix = matrix[(matrix[:, 2] >= min_time) &
-                        (matrix[:, 2] <= max_time), :]
-        # filter by distance
-        tmp = (matrix[:, 0]-center_point[0])*(matrix[:, 0]-center_point[0]) + \
-            (matrix[:, 1]-center_point[1])*(matrix[:, 1]-center_point[1])
-        neigborhood = matrix[tmp <= (
-            self.spatial_threshold*self.spatial_threshold), 4].tolist()
-        neigborhood.remove(index_center)
+        keep = (np.abs(times[points] - times[neighbors]) <=
+                self.temporal_threshold) & (points != neighbors)
+        return points[keep], neighbors[keep]
 
-        return neigborhood
+    def _retrieve_neighborhoods(self, coordinates, times):
+        """
+        Neighbors of each point (itself excluded), sorted by index, as
+        arrays (indptr, indices) in CSR format: neighbors of point i are
+        indices[indptr[i]:indptr[i + 1]].
+        """
+        from joblib import Parallel, delayed
+
+        total = len(times)
+        order = np.argsort(times, kind='stable')
+        sorted_coordinates = coordinates[order]
+        sorted_times = times[order]
+
+        bounds = list(range(0, total, self.chunk_size)) + [total]
+        # KD-tree queries release the GIL, so threads are used
+        parts = Parallel(n_jobs=self.n_jobs, prefer='threads')(
+            delayed(self._query_chunk)(start, end, sorted_coordinates,
+                                       sorted_times)
+            for start, end in zip(bounds, bounds[1:]))
+
+        points = order[np.concatenate([p for p, _ in parts])]
+        neighbors = order[np.concatenate([n for _, n in parts])]
+        sort = np.lexsort((neighbors, points))
+        indptr = np.zeros(total + 1, dtype='int64')
+        np.cumsum(np.bincount(points, minlength=total), out=indptr[1:])
+        return indptr, neighbors[sort]
 
     def fit_transform(self, df, col_lat, col_lon, col_time,
                       col_cluster='cluster'):
@@ -50,7 +106,7 @@ class STDBSCAN(object):
         :param df: DataFrame input
         :param col_lat: Latitude column name;
         :param col_lon:  Longitude column name;
-        :param col_time: Date time column name;
+        :param col_time: Date time (or epoch, in seconds) column name;
         :param col_cluster: Alias for predicted cluster (default, 'cluster');
         """
         cluster_label = 0
@@ -59,44 +115,44 @@ class STDBSCAN(object):
         stack = []
 
         # initial setup
-        df = df[[col_lon, col_lat, col_time]]
-        df[col_cluster] = unmarked
-        df['index'] = range(df.shape[0])
-        matrix = df.values
-        df.drop(['index'], inplace=True, axis=1)
+        df = df[[col_lon, col_lat, col_time]].copy()
+        coordinates = df[[col_lon, col_lat]].to_numpy(dtype='float64')
+        times = self._to_seconds(df[col_time].to_numpy())
+        labels = np.full(len(df), unmarked, dtype='int64')
+        if len(df):
+            indptr, indices = self._retrieve_neighborhoods(coordinates, times)
 
         # for each point in database
-        for index in range(matrix.shape[0]):
-            if matrix[index, 3] == unmarked:
-                neighborhood = self._retrieve_neighbors(index, matrix)
+        for index in range(len(labels)):
+            if labels[index] == unmarked:
+                neighborhood = indices[indptr[index]:indptr[index + 1]]
 
                 if len(neighborhood) < self.min_neighbors:
-                    matrix[index, 3] = noise
+                    labels[index] = noise
                 else:  # found a core point
                     cluster_label += 1
                     # assign a label to core point
-                    matrix[index, 3] = cluster_label
+                    labels[index] = cluster_label
 
                     # assign core's label to its neighborhood
-                    for neig_index in neighborhood:
-                        matrix[neig_index, 3] = cluster_label
-                        stack.append(neig_index)  # append neighbors to stack
+                    labels[neighborhood] = cluster_label
+                    stack.extend(neighborhood.tolist())
 
                     # find new neighbors from core point neighborhood
                     while len(stack) > 0:
                         current_point_index = stack.pop()
-                        new_neighborhood = \
-                            self._retrieve_neighbors(current_point_index,
-                                                     matrix)
+                        new_neighborhood = indices[
+                            indptr[current_point_index]:
+                            indptr[current_point_index + 1]]
 
                         # current_point is a new core
                         if len(new_neighborhood) >= self.min_neighbors:
-                            for neig_index in new_neighborhood:
-                                neig_cluster = matrix[neig_index, 3]
-                                if any([neig_cluster == noise,
-                                        neig_cluster == unmarked]):
-                                    matrix[neig_index, 3] = cluster_label
-                                    stack.append(neig_index)
-
-        df[col_cluster] = matrix[:, 3]
+                            neig_cluster = labels[new_neighborhood]
+                            new_points = new_neighborhood[
+                                (neig_cluster == noise) |
+                                (neig_cluster == unmarked)]
+                            labels[new_points] = cluster_label
+                            stack.extend(new_points.tolist())
+
+        df[col_cluster] = labels
         return df
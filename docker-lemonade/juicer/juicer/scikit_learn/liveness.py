@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Liveness analysis of data frames in scikit-learn workflows.
+
+By default, minions keep the results of all tasks in memory (state cache),
+in order to reuse them in the next jobs of the app. Thus, operations must
+not change their input data and many of them copy it, so a long pipeline
+holds many copies of the same data.
+
+If the state cache is disabled, the transpiler uses the workflow graph to
+find data not used after a task:
+
+ - an input is dead after the task if the output port producing it is not
+   connected to other tasks and if the parent output does not share data with
+   any other live data frame (i.e., all parent inputs are also dead). Such
+   inputs are changed in place (see Operation.is_dead_input());
+ - results of a task are released (generated code) when all tasks
+   consuming them have read them.
+"""
+import networkx as nx
+
+
+def state_cache_enabled(configuration):
+    """ State cache can be disabled in juicer.scikit_learn configuration """
+    config = configuration or {}
+    sklearn_config = config.get('juicer', {}).get('scikit_learn') or {}
+    return (sklearn_config.get('state_cache') or {}).get('enabled', True)
+
+
+def get_dead_inputs(graph, instances):
+    """
+    Input ports (names) of each task whose data is not used after the task,
+    assuming that results are not kept in the state cache.
+    """
+    dead_inputs = {}
+    # Output of the task does not share data with live data frames
+    exclusive = {}
+    for task_id in nx.topological_sort(graph):
+        if task_id not in instances:
+            exclusive[task_id] = False
+            continue
+        ports = set()
+        in_edges = list(graph.in_edges(task_id, data=True))
+        for source_id, _, data in in_edges:
+            flow = data.get('attr_dict') or {}
+            source_port = flow.get('source_port')
+            connections = sum(
+                1 for _, _, other in graph.out_edges(source_id, data=True)
+                if (other.get('attr_dict') or {}).get(
+                    'source_port') == source_port)
+            if connections == 1 and exclusive.get(source_id):
+                ports.add(flow.get('target_port_name'))
+        dead_inputs[task_id] = ports
+        exclusive[task_id] = len(ports) == len(in_edges)
+    return dead_inputs
+
+
+def get_consumers(graph, instances):
+    """ Number of executed tasks reading the results of each task """
+    consumers = {}
+    for task_id, instance in instances.items():
+        if instance.has_code and instance.enabled and \
+                instance.get_output_names(','):
+            consumers[task_id] = len({
+                target_id for target_id in graph.successors(task_id)
+                if target_id in instances and instances[
+                    target_id].has_code and instances[target_id].enabled})
+    return consumers
+
+
+def release_dead_data(graph, instances):
+    """
+    Informs operations about their dead inputs and about how many tasks read
+    their results (released after the last one).
+    """
+    dead_inputs = get_dead_inputs(graph, instances)
+    consumers = get_consumers(graph, instances)
+    for task_id, instance in instances.items():
+        instance.parameters['dead_inputs'] = dead_inputs.get(task_id, set())
+        instance.parameters['consumers'] = consumers.get(task_id, 0)
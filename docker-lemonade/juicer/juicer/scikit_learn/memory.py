@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Reduces the memory used by data frames read in scikit-learn workflows.
+
+Minions keep the results of many tasks in memory (cached state), so data
+read from data sources is converted to smaller data types when no value
+changes:
+
+ - 64-bit integers are converted to 32-bit ones, only if enabled
+   (downcast_integers). Arithmetic between integer columns silently
+   overflows, e.g. the sum or product of two int32 columns may not fit in
+   32 bits, so 64-bit integers are kept by default. Smaller types (8 or 16
+   bits) are never used;
+ - 64-bit floats are converted to 32-bit ones, only if it is lossless;
+ - text with few distinct values (according to Limonero statistics or to a
+   sample of the data) is converted to category;
+ - other text may be converted to a string data type (e.g. string[pyarrow]).
+
+Text columns with missing values are not converted: filling them with new
+values would fail (category) or their semantics would change (pd.NA).
+"""
+import numpy as np
+from pandas.api import types
+
+
+def optimize_dtypes(df, attributes=None, max_category_ratio=0.5,
+                    sample_size=10000, string_dtype=None,
+                    downcast_integers=False):
+    """
+    Converts the columns of df (in place) to smaller data types. Attributes
+    are the ones of the data source (Limonero), used for statistics.
+    Returns the data frame and a report with a tuple (name, original type,
+    new type, bytes before, bytes after) for each converted column.
+    """
+    stats = {attr['name']: attr for attr in attributes or []}
+    report = []
+    for name in df.columns:
+        column = df[name]
+        converted = _convert(column, stats.get(name) or {},
+                             max_category_ratio, sample_size, string_dtype,
+                             downcast_integers)
+        if converted is None:
+            continue
+        before = int(column.memory_usage(index=False, deep=True))
+        after = int(converted.memory_usage(index=False, deep=True))
+        if after < before:
+            df[name] = converted
+            report.append((name, str(column.dtype), str(converted.dtype),
+                           before, after))
+    return df, report
+
+
+def _convert(column, attribute, max_category_ratio, sample_size,
+             string_dtype, downcast_integers):
+    dtype = column.dtype
+    total = len(column)
+    if total == 0 or types.is_bool_dtype(dtype):
+        return None
+    if types.is_integer_dtype(dtype):
+        if not downcast_integers:
+            return None
+        info = np.iinfo(np.int32)
+        if dtype.itemsize > 4 and \
+                info.min <= column.min() and column.max() <= info.max:
+            return column.astype(
+                'Int32' if types.is_extension_array_dtype(dtype) else 'int32')
+    elif dtype == np.float64:
+        converted = column.astype('float32')
+        if ((converted == column) | column.isna()).all():
+            return converted
+    elif types.is_object_dtype(dtype) and not column.isna().any() and \
+            types.infer_dtype(column, skipna=False) == 'string':
+        if 0 < max_category_ratio:
+            if attribute.get('distinct_values') is not None:
+                ratio = float(attribute['distinct_values']) / total
+            else:
+                sample = column.sample(sample_size, random_state=0) \
+                    if total > sample_size else column
+                ratio = float(sample.nunique()) / len(sample)
+            if attribute.get('enumeration') or ratio <= max_category_ratio:
+                return column.astype('category')
+        if string_dtype:
+            return column.astype(string_dtype)
+    return None
+
+
+def format_report(report):
+    """ Rows (HTML table) of the report, with a total """
+    rows = [[name, before_type, after_type, _format_bytes(before),
+             _format_bytes(after)]
+            for name, before_type, after_type, before, after in report]
+    total_before = sum(r[3] for r in report)
+    total_after = sum(r[4] for r in report)
+    rows.append(['', '', '', _format_bytes(total_before),
+                 _format_bytes(total_after)])
+    return rows
+
+
+def _format_bytes(value):
+    for unit in ['B', 'KB', 'MB']:
+        if value < 1024:
+            return '{:.1f} {}'.format(value, unit)
+        value /= 1024.0
+    return '{:.1f} GB'.format(value)
@@ -34,6 +34,10 @@ class AlgorithmOperation(Operation):
         self.has_code = len(self.named_inputs) and any(
             [len(self.named_outputs) > 0, self.contains_results()])
 
+    @property
+    def cpu_bound(self):
+        return True
+
     def generate_code(self):
         if self.has_code:
             algorithm_code = self.algorithm.generate_code() or ''
@@ -305,7 +309,7 @@ class SaveModel(Operation):
                     "path":  model_path,
                     "type": "UNSPECIFIED",
                     "task_id": '{task_id}',
-                    "job_id": {job_id},
+                    "job_id": get_job_id(),
                     "workflow_id": {workflow_id},
                     "workflow_name": '{workflow_name}'
                 }}
@@ -338,7 +342,6 @@ class SaveModel(Operation):
                           'different metrics ({}).'),
                    msg2=_('Invalid criteria.'),
                    error_file_exists=_('Model already exists'),
-                   job_id=self.job_id,
                    task_id=self.parameters['task_id'],
                    workflow_id=self.workflow_id,
                    workflow_name=self.workflow_name,
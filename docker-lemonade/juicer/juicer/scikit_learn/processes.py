@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Execution of CPU-bound tasks of scikit-learn workflows in worker processes.
+
+Tasks of the generated code run in threads, so independent branches of a
+workflow (e.g. several models trained with the same data) compete for the
+GIL. When enabled (juicer.scikit_learn.processes), the code of CPU-bound
+operations (see Operation.cpu_bound) is executed by a pool of worker
+processes. Other operations, usually I/O-bound, still run in threads.
+
+Workers are long-lived and shared by all jobs of the minion and by functions
+processing data in parallel (e.g. text_processing.map_rows). They are not
+forked from the minion, whose threads may hold locks (e.g. logging) that
+would never be released in a forked child: they are started by a fork server
+(or spawned, where it is not available). Generated code is loaded by workers
+from its source (see juicer.runner.code_cache).
+
+Data frames are not pickled: they are written as Arrow IPC files to a
+memory-backed directory (/dev/shm, by default) and memory mapped by the
+process reading them. Other values (e.g. models) and data frames not
+supported by Arrow are pickled. Events emitted by the operation code in a
+worker are sent back and emitted when the task finishes.
+"""
+import gettext
+import importlib
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas
+import pyarrow as pa
+from juicer.runner.code_cache import CodeCache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SHARED_DIR = '/dev/shm'
+LOCALES_PATH = os.path.join(os.path.dirname(__file__), '..', 'i18n',
+                            'locales')
+
+# Shared pool of worker processes (see get_executor)
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+# State of a worker process
+_is_worker = False
+_code_cache = CodeCache()
+_generated_modules = {}
+
+
+def get_processes_config(configuration):
+    """ Configuration of worker processes (juicer.scikit_learn.processes) """
+    config = configuration or {}
+    sklearn_config = config.get('juicer', {}).get('scikit_learn') or {}
+    return sklearn_config.get('processes') or {}
+
+
+def get_workers(configuration):
+    """ Number of worker processes per minion (0 means only threads) """
+    return int(get_processes_config(configuration).get('workers', 0) or 0)
+
+
+class SharedFrame(object):
+    """ Data frame stored in an Arrow IPC file, read by another process """
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def create(df, directory=None):
+        table = pa.Table.from_pandas(df)
+        fd, path = tempfile.mkstemp(prefix='juicer-', suffix='.arrow',
+                                    dir=directory)
+        os.close(fd)
+        try:
+            with pa.OSFile(path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        except Exception:
+            os.remove(path)
+            raise
+        return SharedFrame(path)
+
+    def load(self):
+        source = pa.memory_map(self.path)
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+    def release(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def share(value, directory=None):
+    """ Data frames are shared using Arrow, if supported """
+    if isinstance(value, pandas.DataFrame):
+        try:
+            return SharedFrame.create(value, directory)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            log.debug('Data frame will be pickled: %s', e)
+    return value
+
+
+def _load(value):
+    if isinstance(value, SharedFrame):
+        try:
+            return value.load()
+        finally:
+            value.release()
+    return value
+
+
+def _init_worker(lang):
+    global _is_worker
+    _is_worker = True
+    # Messages of operations, installed by the minion in its process
+    gettext.translation('messages', LOCALES_PATH, [lang] if lang else None,
+                        fallback=True).install()
+
+
+def _get_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def get_executor(workers, lang=None):
+    """
+    Returns the pool of worker processes shared by the minion, with at least
+    the number of workers (it is recreated with more workers, if required).
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or workers > _executor_workers:
+            if _executor is not None:
+                # Running tasks are finished by the previous workers
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=_get_context(),
+                initializer=_init_worker, initargs=(lang,))
+            _executor_workers = workers
+        return _executor
+
+
+def start(workers, lang=None):
+    """
+    Starts the shared workers, used by the minion before it starts running
+    jobs. The minion executes jobs in a daemon process, which is not allowed
+    to have children, so the flag is cleared (workers finish with it).
+    """
+    if workers <= 0:
+        return None
+    multiprocessing.current_process().daemon = False
+    executor = get_executor(workers, lang)
+    executor.submit(int).result()
+    return executor
+
+
+def shutdown():
+    """ Stops the shared workers """
+    global _executor, _executor_workers
+    with _executor_lock:
+        executor, _executor, _executor_workers = _executor, None, 0
+    if executor is not None:
+        executor.shutdown()
+
+
+def in_worker():
+    """ Worker (or daemon) processes do not start other processes """
+    return _is_worker or multiprocessing.current_process().daemon
+
+
+def _get_reference(function):
+    """
+    Functions are sent to workers by reference (module and name). Source is
+    also sent for generated code, not importable by workers. Returns None if
+    the function cannot be sent.
+    """
+    module = sys.modules.get(function.__module__)
+    if getattr(module, function.__qualname__, None) is not function:
+        return None
+    source = None
+    if getattr(module, '__file__', None) is None:
+        get_source = getattr(module.__loader__, 'get_source', None)
+        source = get_source(module.__name__) if get_source else None
+        if source is None:
+            return None
+    return function.__module__, function.__qualname__, source
+
+
+def _resolve(reference):
+    """ Executed by a worker process, finds the referenced function """
+    module_name, qualname, source = reference
+    if source is None:
+        module = importlib.import_module(module_name)
+    else:
+        # Generated module is loaded once, unless its code changes
+        loaded = _generated_modules.get(module_name)
+        if loaded is None or loaded[0] != source:
+            loaded = (source, _code_cache.load(module_name, source))
+            _generated_modules[module_name] = loaded
+        module = loaded[1]
+    return getattr(module, qualname)
+
+
+def _execute(reference, args, directory):
+    """ Executed by a worker process """
+    events = []
+
+    def emit_event(*event_args, **event_kwargs):
+        events.append((event_args, event_kwargs))
+
+    function = _resolve(reference)
+    results = function(emit_event, *[_load(arg) for arg in args])
+    return tuple(share(result, directory) for result in results), events
+
+
+class ProcessPool(object):
+    """ Worker processes used by a job (shared by the minion) """
+
+    def __init__(self, workers, shared_dir=None):
+        if shared_dir is None and os.path.isdir(DEFAULT_SHARED_DIR):
+            shared_dir = DEFAULT_SHARED_DIR
+        self.shared_dir = shared_dir
+        self.executor = get_executor(workers)
+
+    def run(self, function, emit_event, *args):
+        """
+        Executes function(emit_event, *args) in a worker, returning its
+        results (a tuple).
+        """
+        reference = _get_reference(function)
+        shared = [share(arg, self.shared_dir) for arg in args]
+        try:
+            results, events = self.executor.submit(
+                _execute, reference, shared, self.shared_dir).result()
+        finally:
+            for arg in shared:
+                if isinstance(arg, SharedFrame):
+                    arg.release()
+        for event_args, event_kwargs in events:
+            emit_event(*event_args, **event_kwargs)
+        return tuple(_load(result) for result in results)
+
+    def shutdown(self):
+        """ Workers are kept for the next jobs (see shutdown()) """
+        self.executor = None
+
+
+def create_pool(workers, shared_dir=None):
+    return ProcessPool(workers, shared_dir) if workers > 0 else None
+
+
+def run(pool, function, emit_event, *args):
+    """
+    Executes the code of a task in the pool. Without a pool or if the
+    function cannot be sent to workers, it is executed by the current thread.
+    """
+    if pool is None or _get_reference(function) is None:
+        return function(emit_event, *args)
+    return pool.run(function, emit_event, *args)
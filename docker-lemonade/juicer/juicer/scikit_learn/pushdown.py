@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Projection and predicate pushdown for scikit-learn workflows.
+
+Data readers read every column of a data source, even if the workflow uses
+only a few of them. The transpiler walks the workflow graph backwards,
+computing the columns of each task output used downstream (see
+Operation.get_required_columns()) and data readers read only those columns.
+Simple conditions of a filter consuming a Parquet data source are also used
+to skip row groups, using the statistics stored in the file.
+
+Outputs of tasks that depend on the pushed down columns have fewer columns,
+so their hashes (used to reuse cached results) include them.
+"""
+import hashlib
+
+import networkx as nx
+from juicer.scikit_learn.data_operation import DataReaderOperation
+from juicer.scikit_learn.etl_operation import FilterOperation
+from juicer.scikit_learn.expression import split_conjunction
+
+# Comparison operators supported by Parquet statistics, and their inverse
+# (used when the literal is on the left side)
+PUSHDOWN_OPERATORS = {'==': '==', '===': '==', '<': '<', '<=': '<=',
+                      '>': '>', '>=': '>='}
+FLIPPED_OPERATORS = {'==': '==', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+def pushdown_enabled(configuration):
+    """ Pushdown can be disabled in juicer.transpiler configuration """
+    config = configuration or {}
+    transpiler_config = config.get('juicer', {}).get('transpiler') or {}
+    return transpiler_config.get('pushdown', True)
+
+
+def get_required_columns(graph, instances):
+    """
+    Columns of the output of each task used by the workflow (None means
+    all). Outputs displayed to the user (sample or schema) or not used by
+    other tasks, as well as outputs consumed by operations with many inputs,
+    require all columns.
+    """
+    required = {}
+    for task_id in reversed(list(nx.topological_sort(graph))):
+        instance = instances.get(task_id)
+        if instance is None or instance.contains_results() or \
+                graph.out_degree(task_id) == 0:
+            required[task_id] = None
+            continue
+        columns = set()
+        for _, target_id in graph.out_edges(task_id):
+            target = instances.get(target_id)
+            if target is None or len(target.named_inputs) != 1:
+                columns = None
+            else:
+                target_columns = target.get_required_columns(
+                    required.get(target_id))
+                columns = None if target_columns is None else \
+                    columns | set(target_columns)
+            if columns is None:
+                break
+        required[task_id] = columns
+    return required
+
+
+def get_filters(graph, instances, task_id):
+    """
+    Conditions (attribute, operator, literal) of the filter that is the only
+    consumer of the task output. Only conjunctions of comparisons between an
+    attribute and a literal are used.
+    """
+    targets = [target_id for _, target_id in graph.out_edges(task_id)]
+    if len(targets) != 1 or not isinstance(
+            instances.get(targets[0]), FilterOperation):
+        return []
+    result = []
+    for expr in instances[targets[0]].advanced_filter:
+        for condition in split_conjunction(expr['tree']):
+            if condition.get('type') != 'BinaryExpression' or \
+                    condition['operator'] not in PUSHDOWN_OPERATORS:
+                continue
+            operator = PUSHDOWN_OPERATORS[condition['operator']]
+            left, right = condition['left'], condition['right']
+            if left.get('type') == 'Literal':
+                left, right = right, left
+                operator = FLIPPED_OPERATORS[operator]
+            if left.get('type') == 'Identifier' and \
+                    right.get('type') == 'Literal' and \
+                    isinstance(right.get('value'), (int, float, str)) and \
+                    not isinstance(right.get('value'), bool):
+                result.append((left['name'], operator, right['value']))
+    return result
+
+
+def _update_hash(instance, value):
+    instance.parameters['hash'] = hashlib.sha1('{}:{}'.format(
+        instance.parameters.get('hash'), value).encode('utf8')).hexdigest()
+
+
+def push_down(graph, instances):
+    """
+    Pushes columns and conditions down to data readers. Returns the ids of
+    the tasks whose hashes were changed.
+    """
+    required = get_required_columns(graph, instances)
+    changed = []
+    for task_id, instance in instances.items():
+        if not isinstance(instance, DataReaderOperation) or \
+                not instance.push_down(required[task_id],
+                                       get_filters(graph, instances, task_id)):
+            continue
+        _update_hash(instance, (instance.pushdown_columns,
+                                instance.pushdown_filters))
+        changed.append(task_id)
+        if instance.pushdown_columns is None:
+            continue
+        for descendant_id in nx.descendants(graph, task_id):
+            if required.get(descendant_id) is not None and \
+                    descendant_id in instances and \
+                    descendant_id not in changed:
+                _update_hash(instances[descendant_id],
+                             sorted(required[descendant_id]))
+                changed.append(descendant_id)
+    return changed
@@ -1,7 +1,6 @@
 # coding=utf-8
 import gc
 import gettext
-import importlib
 import itertools
 import json
 import logging.config
@@ -14,11 +13,11 @@ import traceback
 # noinspection PyUnresolvedReferences
 import datetime
 
-import codecs
 import os
 
 import pandas
 import socketio
+from io import StringIO
 from timeit import default_timer as timer
 from concurrent.futures import ThreadPoolExecutor
 from juicer.runner import configuration
@@ -26,8 +25,10 @@ from juicer.runner import protocol as juicer_protocol
 
 from juicer.util.dataframe_util import CustomEncoder
 from juicer.runner.minion_base import Minion
+from juicer.scikit_learn import processes
+from juicer.scikit_learn.liveness import state_cache_enabled
 from juicer.scikit_learn.transpiler import ScikitLearnTranspiler
-from juicer.util import dataframe_util
+from juicer.util import dataframe_util, result_cache
 from juicer.workflow.workflow import Workflow
 
 logging.config.fileConfig('logging_config.ini')
@@ -95,6 +96,10 @@ class ScikitLearnMinion(Minion):
         """
         Starts consuming jobs that must be processed by this minion.
         """
+        # Worker processes are started before threads
+        processes.start(processes.get_workers(self.config),
+                        self.current_lang)
+        self.start_telemetry()
         while q.empty():
             try:
                 self._process_message_nb()
@@ -261,26 +266,14 @@ class ScikitLearnMinion(Minion):
                 name='update job', message=_('Running job'),
                 status='RUNNING', identifier=job_id)
 
-            module_name = 'juicer_app_{}_{}_{}'.format(
-                self.workflow_id,
-                self.app_id,
-                job_id)
+            out = StringIO()
+            self.transpiler.transpile(
+                loader.workflow, loader.graph, {}, out, job_id,
+                persist=app_configs.get('persist', True))
 
-            generated_code_path = os.path.join(
-                self.tmp_dir, '{}.py'.format(module_name))
-
-            with codecs.open(generated_code_path, 'w', 'utf8') as out:
-                self.transpiler.transpile(
-                    loader.workflow, loader.graph, {}, out, job_id, 
-                    persist=app_configs.get('persist', True))
-
-            # Get rid of .pyc file if it exists
-            if os.path.isfile('{}c'.format(generated_code_path)):
-                os.remove('{}c'.format(generated_code_path))
-
-            # Launch the scikit_learn
-            self.module = importlib.import_module(module_name)
-            self.module = importlib.reload(self.module)
+            # Launch the scikit_learn (compiled code is reused if the
+            # generated code did not change)
+            self.module = self._load_generated_module(out.getvalue(), job_id)
             if log.isEnabledFor(logging.DEBUG):
                 log.debug('Objects in memory after loading module: %s',
                           len(gc.get_objects()))
@@ -290,6 +283,8 @@ class ScikitLearnMinion(Minion):
             # current state (if any). We pass the current state to the execution
             # to avoid re-computing the same tasks over and over again, in case
             # of several partial workflow executions.
+            self._report_time_to_first_task(job_id)
+            result_cache.set_current_job('scikit-learn', job_id)
             new_state = self.module.main(
                 self.get_or_create_scikit_learn_session(
                     loader, app_configs, job_id),
@@ -297,6 +292,7 @@ class ScikitLearnMinion(Minion):
                 self._emit_event(room=job_id, namespace='/stand'))
 
             end = timer()
+            self._report_result_cache_statistics('scikit-learn', job_id)
             # Mark job as completed
             self._emit_event(room=job_id, namespace='/stand')(
                 name='update job',
@@ -304,8 +300,10 @@ class ScikitLearnMinion(Minion):
                 status='COMPLETED', identifier=job_id)
 
             # We update the state incrementally, i.e., new task results can be
-            # overwritten but never lost.
-            self._state.update(new_state)
+            # overwritten but never lost. If the state cache is disabled,
+            # generated code released results not used anymore.
+            if state_cache_enabled(self.config):
+                self._state.update(new_state)
 
         except UnicodeEncodeError as ude:
             message = self.MNN006[1].format(ude)
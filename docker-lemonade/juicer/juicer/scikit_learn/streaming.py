@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming (out-of-core) execution for scikit-learn platform.
+
+When enabled (juicer.scikit_learn.streaming), data readers do not load the
+whole data source into memory. Instead, they return a ChunkedDataFrame, a
+lazy data frame read in chunks (rows for CSV and text files, row groups for
+Parquet). Row-local operations (e.g. filter, transformation, projection,
+cast, replace) are not executed immediately: they are added to the chunk
+pipeline and applied, one after the other (fused), to each chunk when the
+data is consumed. Blocking operations (e.g. sort, aggregation, join) and
+any operation that does not support chunks materialize their input.
+
+Data is read again every time a ChunkedDataFrame is consumed, i.e., if it is
+used by more than one blocking operation.
+"""
+import pandas
+import pyarrow.parquet as pq
+
+
+class ChunkedDataFrame(object):
+    """
+    A data frame read in chunks. `reader` is a function returning an
+    iterator of (pandas) data frames, `operations` are functions applied to
+    each chunk.
+    """
+
+    def __init__(self, reader, operations=None):
+        self.reader = reader
+        self.operations = operations or []
+
+    def map_chunks(self, operation):
+        """
+        Returns a new ChunkedDataFrame, applying the operation to each chunk
+        after the current ones. Nothing is read until data is consumed.
+        """
+        return ChunkedDataFrame(self.reader, self.operations + [operation])
+
+    def chunks(self):
+        """
+        Reads the data, yielding chunks with operations applied. Row labels
+        are the same of the data frame read at once.
+        """
+        for chunk in self.reader():
+            for operation in self.operations:
+                chunk = operation(chunk)
+            yield chunk
+
+    def head(self, n=50):
+        """ First n rows, reading only the required chunks """
+        result = []
+        total = 0
+        for chunk in self.chunks():
+            result.append(chunk)
+            total += len(chunk)
+            if total >= n:
+                break
+        return _concat(result).head(n)
+
+    def materialize(self):
+        """ Reads all the data (with operations applied) into memory """
+        return _concat(list(self.chunks()))
+
+
+def _concat(chunks):
+    if not chunks:
+        return pandas.DataFrame()
+    elif len(chunks) == 1:
+        return chunks[0]
+    return pandas.concat(chunks, copy=False)
+
+
+def materialize(df, pd=pandas):
+    """
+    Input of operations that do not support chunks. Data frames are returned
+    as they are. `pd` is the pandas implementation used by generated code
+    (e.g. modin), chunks are always read with pandas.
+    """
+    if not isinstance(df, ChunkedDataFrame):
+        return df
+    result = df.materialize()
+    if not isinstance(result, pd.DataFrame):
+        result = pd.DataFrame(result)
+    return result
+
+
+def preview(df, size):
+    """ Data used to emit the sample of a (chunked) data frame """
+    if isinstance(df, ChunkedDataFrame):
+        return df.head(size)
+    return df
+
+
+def read_csv(open_file, chunk_size, **kwargs):
+    """
+    CSV (or text) file read in chunks of chunk_size rows. `open_file` is a
+    function returning a file object, it is called for each read.
+    """
+    def reader():
+        with open_file() as f:
+            for chunk in pandas.read_csv(f, chunksize=chunk_size, **kwargs):
+                yield chunk
+
+    return ChunkedDataFrame(reader)
+
+
+def read_parquet(open_file, columns=None, filters=None):
+    """
+    Parquet file read one row group at a time. Only the informed columns
+    are read and row groups without rows satisfying the filters (see
+    get_row_groups()) are skipped.
+    """
+    def reader():
+        with open_file() as f:
+            parquet_file = pq.ParquetFile(f)
+            row_groups = list(get_row_groups(parquet_file, filters))
+            for i, start in row_groups:
+                yield _read_row_group(parquet_file, i, start, columns)
+            if not row_groups:
+                yield _empty(parquet_file, columns)
+
+    return ChunkedDataFrame(reader)
+
+
+def read_row_groups(f, columns=None, filters=None):
+    """
+    Reads a Parquet file (all at once), skipping row groups without rows
+    satisfying the filters. Rows keep their position in the file as labels.
+    """
+    parquet_file = pq.ParquetFile(f)
+    return _concat([
+        _read_row_group(parquet_file, i, start, columns)
+        for i, start in get_row_groups(parquet_file, filters)
+    ] or [_empty(parquet_file, columns)])
+
+
+def _read_row_group(parquet_file, i, start, columns):
+    chunk = parquet_file.read_row_group(i, columns=columns).to_pandas()
+    chunk.index = pandas.RangeIndex(start, start + len(chunk))
+    return chunk
+
+
+def _empty(parquet_file, columns):
+    """ Data frame without rows, but with the columns of the file """
+    table = parquet_file.schema_arrow.empty_table()
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
+
+
+def get_row_groups(parquet_file, filters=None):
+    """
+    Row groups (index and position of its first row) that may have rows
+    satisfying all filters, according to the column statistics (min and
+    max) stored in the file. Filters are tuples (attribute, operator,
+    value), operator is one of ==, <, <=, > and >=. Rows are not filtered,
+    it must be done by the reader.
+    """
+    metadata = parquet_file.metadata
+    start = 0
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        if all(_may_satisfy(row_group, f) for f in filters or []):
+            yield i, start
+        start += row_group.num_rows
+
+
+def _may_satisfy(row_group, condition):
+    attribute, operator, value = condition
+    for j in range(row_group.num_columns):
+        column = row_group.column(j)
+        if column.path_in_schema == attribute:
+            statistics = column.statistics
+            if statistics is None or not statistics.has_min_max:
+                return True
+            try:
+                return {
+                    '==': lambda: statistics.min <= value <= statistics.max,
+                    '<': lambda: statistics.min < value,
+                    '<=': lambda: statistics.min <= value,
+                    '>': lambda: statistics.max > value,
+                    '>=': lambda: statistics.max >= value,
+                }[operator]()
+            except (KeyError, TypeError):
+                # Unsupported operator or incompatible types
+                return True
+    return True
@@ -4,6 +4,7 @@ import pprint
 import numpy as np
 from textwrap import dedent
 from juicer.operation import Operation
+from juicer.scikit_learn.processes import get_workers
 from itertools import zip_longest
 
 
@@ -68,40 +69,26 @@ class TokenizerOperation(Operation):
             copy_code = ".copy()" \
                 if self.parameters['multiplicity']['input data'] > 1 else ""
 
-            if self.min_token_lenght is not None:
-                self.min_token_lenght = \
-                    ' if len(word) >= {}'.format(self.min_token_lenght)
-
+            # Tokenizer (and its regular expression) is created once
             if self.type == self.TYPE_SIMPLE:
-                code = """
-                from nltk.tokenize import TweetTokenizer
-                {output} = {input}{copy_code}
-                result = []
-                toktok = TweetTokenizer()
-        
-                for row in {output}['{att}'].to_numpy():
-                    result.append([word 
-                    for word in toktok.tokenize(row){limit}])
-                {output}['{alias}'] = result
-                """.format(copy_code=copy_code, output=self.output,
-                           input=self.named_inputs['input data'],
-                           att=self.attributes[0], alias=self.alias[0],
-                           limit=self.min_token_lenght)
+                tokenizer = "'{}', None, {}".format(
+                    self.TYPE_SIMPLE, self.min_token_lenght)
             else:
-                code = """
-                from nltk.tokenize import regexp_tokenize
-                {output} = {input}{copy_code}
-                result = []
-    
-                for row in {output}['{att}'].to_numpy():
-                    result.append([word for word in 
-                                  regexp_tokenize(row, pattern=r'{exp}'){limit}])
-    
-                {output}['{alias}'] = result
-                """.format(copy_code=copy_code, output=self.output,
-                          input=self.named_inputs['input data'],
-                          att=self.attributes[0], alias=self.alias[0],
-                          exp=self.expression_param, limit=self.min_token_lenght)
+                tokenizer = "'{}', r'{}', {}".format(
+                    self.TYPE_REGEX, self.expression_param,
+                    self.min_token_lenght)
+            code = """
+            from juicer.scikit_learn import text_processing
+            {output} = {input}{copy_code}
+            tokenizer = text_processing.get_tokenizer({tokenizer})
+            {output}['{alias}'] = text_processing.map_rows(
+                tokenizer, {output}['{att}'].to_numpy(), workers={workers})
+            """.format(copy_code=copy_code, output=self.output,
+                       input=self.named_inputs['input data'],
+                       att=self.attributes[0], alias=self.alias[0],
+                       tokenizer=tokenizer,
+                       workers=get_workers(self.parameters.get(
+                           'configuration')))
 
             return dedent(code)
 
@@ -185,41 +172,18 @@ class RemoveStopWordsOperation(Operation):
             stop_words += {stop_word_list}
             """.format(stop_word_list=self.stop_word_list)
 
-            if self.sw_case_sensitive == "1":
-                code += """
-            word_tokens = {OUT}['{att}'].to_numpy()       
-            result = []
-            case_sensitive = True
-            for row in word_tokens:
-                itr = []
-                for w in row:
-                    if not w in stop_words:
-                        itr.append(w)
-                result.append(itr)
-            {OUT}['{alias}'] = result
-            """.format(att=self.attributes,
-                       att_stop=self.stop_word_attribute,
-                       alias=self.alias, case=self.sw_case_sensitive,
+            code += """
+            from juicer.scikit_learn import text_processing
+            word_tokens = {OUT}['{att}'].to_numpy()
+            stop_words_filter = text_processing.StopWordsFilter(
+                stop_words, case_sensitive={case})
+            {OUT}['{alias}'] = text_processing.map_rows(
+                stop_words_filter, word_tokens, workers={workers})
+            """.format(att=self.attributes, alias=self.alias,
+                       case=self.sw_case_sensitive == "1",
                        OUT=self.output,
-                       stoplist=self.stop_word_list, sw=self.stopwords_input)
-            else:
-                code += """
-            stop_words = [w.lower() for w in stop_words]
-            word_tokens = {OUT}['{att}'].to_numpy()       
-            result = []
-            case_sensitive = False
-            for row in word_tokens:
-                itr = []
-                for w in row:
-                    if not w.lower() in stop_words:
-                        itr.append(w)
-                result.append(itr)                
-            {OUT}['{alias}'] = result
-            """.format(att=self.attributes,
-                       att_stop=self.stop_word_attribute,
-                       alias=self.alias, case=self.sw_case_sensitive,
-                       OUT=self.output,
-                       stoplist=self.stop_word_list, sw=self.stopwords_input)
+                       workers=get_workers(self.parameters.get(
+                           'configuration')))
 
             return dedent(code)
 
@@ -271,17 +235,16 @@ class GenerateNGramsOperation(Operation):
                 if self.parameters['multiplicity']['input data'] > 1 else ""
 
             code = dedent("""
-                from nltk.util import ngrams
+                from juicer.scikit_learn import text_processing
                 {output} = {input}{copy_code}
-                        
-                grams = []
-                for row in {output}['{att}'].to_numpy():
-                    grams.append([" ".join(gram) for gram in ngrams(row, {n})])
-                    
-                {output}['{alias}'] = grams
+                {output}['{alias}'] = text_processing.map_rows(
+                    text_processing.NGrams({n}),
+                    {output}['{att}'].to_numpy(), workers={workers})
                 """).format(copy_code=copy_code,
                             att=self.attributes, alias=self.alias,
-                            n=self.n, input=input_data, output=self.output)
+                            n=self.n, input=input_data, output=self.output,
+                            workers=get_workers(self.parameters.get(
+                                'configuration')))
 
             return code
 
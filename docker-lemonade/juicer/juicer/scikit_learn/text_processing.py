@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Text processing used by code generated for scikit-learn text operations.
+
+Tokenizers, stop word filters and n-gram generators are created once (per
+process) and applied to each row of a column. Large columns are split into
+chunks, processed in parallel by the worker processes of the minion (the
+number of workers is the one configured in juicer.scikit_learn.processes).
+Functions applied to rows are picklable objects, sent to workers with their
+parameters only.
+"""
+import functools
+import itertools
+
+import numpy as np
+from juicer.scikit_learn import processes
+from nltk.tokenize import RegexpTokenizer, TweetTokenizer
+from nltk.util import ngrams
+
+# Smaller columns are processed by the current process
+MIN_ROWS_PER_WORKER = 10000
+
+
+class Tokenizer(object):
+    """ Splits text into tokens (simple or regular expression based) """
+
+    def __init__(self, kind, pattern=None, min_length=None):
+        self.kind = kind
+        self.pattern = pattern
+        self.min_length = min_length
+        self._tokenizer = None
+
+    def __getstate__(self):
+        return self.kind, self.pattern, self.min_length
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __call__(self, text):
+        if self._tokenizer is None:
+            # Regular expression is compiled only once
+            self._tokenizer = TweetTokenizer() if self.kind == 'simple' \
+                else RegexpTokenizer(self.pattern)
+        tokens = self._tokenizer.tokenize(text)
+        if self.min_length is not None:
+            tokens = [token for token in tokens
+                      if len(token) >= self.min_length]
+        return tokens
+
+
+class StopWordsFilter(object):
+    """ Removes stop words from lists of tokens """
+
+    def __init__(self, stop_words, case_sensitive=False):
+        self.case_sensitive = case_sensitive
+        self.stop_words = frozenset(
+            stop_words if case_sensitive else
+            [word.lower() for word in stop_words])
+
+    def __call__(self, tokens):
+        if self.case_sensitive:
+            return [token for token in tokens
+                    if token not in self.stop_words]
+        return [token for token in tokens
+                if token.lower() not in self.stop_words]
+
+
+class NGrams(object):
+    """ Sequences of n tokens, joined by spaces """
+
+    def __init__(self, n):
+        self.n = n
+
+    def __call__(self, tokens):
+        return [' '.join(gram) for gram in ngrams(tokens, self.n)]
+
+
+@functools.lru_cache(maxsize=32)
+def get_tokenizer(kind, pattern=None, min_length=None):
+    """ Tokenizers are reused by all tasks (and jobs) with same parameters """
+    return Tokenizer(kind, pattern, min_length)
+
+
+def _apply(args):
+    function, values = args
+    return [function(value) for value in values]
+
+
+def map_rows(function, values, workers=0):
+    """
+    Applies function to each value (e.g. the text of a row), returning a
+    list. Values are split into chunks, processed in parallel, if there
+    are enough rows for more than one worker.
+    """
+    total = len(values)
+    workers = min(workers, total // MIN_ROWS_PER_WORKER)
+    if workers < 2 or processes.in_worker():
+        return _apply((function, values))
+
+    bounds = np.linspace(0, total, workers + 1).astype(int)
+    chunks = [(function, values[start:end])
+              for start, end in zip(bounds, bounds[1:])]
+    parts = processes.get_executor(workers).map(_apply, chunks)
+    return list(itertools.chain.from_iterable(parts))
@@ -14,6 +14,10 @@ import juicer.scikit_learn.vis_operation as vis_operation
 import juicer.scikit_learn.outlier_detection as lof
 import os
 from juicer import operation
+from juicer.scikit_learn.liveness import release_dead_data, \
+    state_cache_enabled
+from juicer.scikit_learn.processes import get_processes_config, get_workers
+from juicer.scikit_learn.pushdown import push_down, pushdown_enabled
 from juicer.transpiler import Transpiler
 
 
@@ -41,7 +45,26 @@ class ScikitLearnTranspiler(Transpiler):
             'lemonade_task_afterbefore': _(
                 "Submitting parent task {} before {}")}
 
-        return {'dict_msgs': dict_msgs}
+        processes_config = get_processes_config(self.configuration)
+        return {'dict_msgs': dict_msgs,
+                'process_workers': get_workers(self.configuration),
+                'shared_dir': processes_config.get('shared_dir')}
+
+    def optimize(self, graph, instances):
+        if pushdown_enabled(self.configuration):
+            # Hashes changed, so do the keys of the durable result cache
+            for task_id in push_down(graph, instances):
+                parameters = instances[task_id].parameters
+                parameters['cache_key'] = self._get_cache_key(
+                    graph, task_id, instances, parameters['hash'])
+        if not state_cache_enabled(self.configuration):
+            # Results are not kept between jobs, so data not used anymore
+            # is changed in place and released as soon as possible
+            release_dead_data(graph, instances)
+        if get_workers(self.configuration) > 0:
+            # CPU-bound tasks run in worker processes, others in threads
+            for instance in instances.values():
+                instance.parameters['run_in_process'] = instance.cpu_bound
 
     def _assign_operations(self):
         etl_ops = {
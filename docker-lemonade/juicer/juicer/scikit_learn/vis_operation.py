@@ -68,6 +68,13 @@ def get_caipirinha_config(config, indentation=0):
         return result
 
 
+def _get_title_code(title):
+    # Default title is built when running, job id is not in the code
+    if title:
+        return "'{}'".format(title)
+    return "'Result for job ' + str(get_job_id())"
+
+
 class PublishVisualizationOperation(Operation):
     """
     This operation receives one dataframe as input and one or many
@@ -128,7 +135,7 @@ class PublishVisualizationOperation(Operation):
         for vis_model in visualizations:
             code_lines.append(dedent("""
             visualizations.append({{
-                'job_id': '{job_id}',
+                'job_id': str(get_job_id()),
                 'task_id': {vis_model}.task_id,
                 'title': {vis_model}.title ,
                 'type': {{
@@ -139,21 +146,19 @@ class PublishVisualizationOperation(Operation):
                     {vis_model}.get_data(), cls=enc, ignore_nan=True),
                 'model': {vis_model}
             }})
-            """).format(job_id=self.parameters['job_id'], vis_model=vis_model))
+            """).format(vis_model=vis_model))
 
         # Register this new dashboard with Caipirinha
         code_lines.append(get_caipirinha_config(self.config))
         code_lines.append(dedent("""
-            caipirinha_service.new_dashboard(config, '{title}', {user},
+            caipirinha_service.new_dashboard(config, {title}, {user},
                 {workflow_id}, u'{workflow_name}',
-                {job_id}, '{task_id}', visualizations, emit_event)
+                get_job_id(), '{task_id}', visualizations, emit_event)
             """.format(
-            title=self.title or 'Result for job ' + str(
-                self.parameters.get('job_id', '0')),
+            title=_get_title_code(self.title),
             user=self.parameters['user'],
             workflow_id=self.parameters['workflow_id'],
             workflow_name=self.parameters['workflow_name'],
-            job_id=self.parameters['job_id'],
             task_id=self.parameters['task']['id']
         )))
 
@@ -177,9 +182,7 @@ class VisualizationMethodOperation(Operation):
         Operation.__init__(self, parameters, named_inputs, named_outputs)
 
         # TODO: validate parameters
-        self.title = parameters.get(
-            self.TITLE_PARAM, 'Result for job ' + str(
-                self.parameters.get('job_id', '0')))
+        self.title = parameters.get(self.TITLE_PARAM)
         self.column_names = [c.strip() for c in
                              parameters.get(self.COLUMN_NAMES_PARAM, [])]
         self.orientation = parameters.get(self.ORIENTATION_PARAM, '')
@@ -230,7 +233,7 @@ class VisualizationMethodOperation(Operation):
             params = '{params}'
             {out} = {model}(
                 {input}, '{task}', '{op}',
-                '{op_slug}', '{title}',
+                '{op_slug}', {title},
                 {columns},
                 '{orientation}', {id_attr}, {value_attr},
                 params=json.loads(params))
@@ -240,7 +243,7 @@ class VisualizationMethodOperation(Operation):
                        task=self.parameters['task']['id'],
                        op=self.parameters['operation_id'],
                        op_slug=self.parameters['operation_slug'],
-                       title=self.title,
+                       title=_get_title_code(self.title),
                        columns=json.dumps(self.column_names),
                        orientation=self.orientation,
                        id_attr=self.id_attribute,
@@ -253,7 +256,7 @@ class VisualizationMethodOperation(Operation):
             code_lines.append(get_caipirinha_config(self.config))
             code_lines.append(dedent("""
             visualization = {{
-                'job_id': '{job_id}',
+                'job_id': str(get_job_id()),
                 'task_id': {out}.task_id,
                 'title': {out}.title ,
                 'type': {{
@@ -262,19 +265,17 @@ class VisualizationMethodOperation(Operation):
                 }},
                 'model': {out},
                 'data': json.dumps({out}.get_data(), cls=enc, ignore_nan=True),
-            }}""").format(job_id=self.parameters['job_id'],
-                          out=self.output))
+            }}""").format(out=self.output))
 
             code_lines.append(dedent("""
             caipirinha_service.new_visualization(
                 config,
                 {user},
-                {workflow_id}, {job_id}, '{task_id}',
+                {workflow_id}, get_job_id(), '{task_id}',
                 visualization, emit_event)
             """.format(
                 user=self.parameters['user'],
                 workflow_id=self.parameters['workflow_id'],
-                job_id=self.parameters['job_id'],
                 task_id=self.parameters['task']['id']
             )))
         return '\n'.join(code_lines)
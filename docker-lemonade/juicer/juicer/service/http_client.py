@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP client shared by the clients of Lemonade services (juicer.service).
+
+Requests use a session per process, keeping connections alive (pooled) for
+all services, with timeouts and retries (only idempotent methods, like GET,
+are retried).
+"""
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+# Connect and read timeouts (seconds)
+DEFAULT_TIMEOUT = (5, 60)
+MAX_RETRIES = 3
+POOL_SIZE = 20
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+
+
+def _create_session():
+    session = requests.Session()
+    retry = Retry(total=MAX_RETRIES, backoff_factor=0.3,
+                  status_forcelist=(502, 503, 504), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE,
+                          max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """ Returns the session of the current process (not shared by forks) """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = _create_session()
+                _session_pid = pid
+    return _session
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request('PATCH', url, **kwargs)
@@ -2,13 +2,17 @@
 
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 from gettext import gettext
+from juicer.service import http_client, metadata_cache
 
 log = logging.getLogger()
 log.setLevel(logging.DEBUG)
 
+# Data sources retrieved concurrently by get_data_sources_info()
+MAX_CONCURRENT_REQUESTS = 8
+
 def remove_initial_final_path_separator(path):
     if path.endswith('/'):
         path = path[:-1]
@@ -36,7 +40,7 @@ def query_limonero(base_url, item_path, token, item_id):
 
     # log.debug(gettext('Querying Limonero URL: %s'), url)
 
-    r = requests.get(url, headers=headers)
+    r = http_client.get(url, headers=headers)
     if r.status_code == 200:
         return json.loads(r.text)
     else:
@@ -56,11 +60,77 @@ def get_storage_info(base_url, token, storage_id):
     return storage['data'][0]
 
 
+def _get_data_source_key(base_url, data_source_id):
+    return ('datasources', remove_initial_final_path_separator(base_url),
+            str(data_source_id))
+
+
 def get_data_source_info(base_url, token, data_source_id):
+    cache = metadata_cache.get_cache()
+    key = _get_data_source_key(base_url, data_source_id)
+    if cache is not None:
+        info = cache.get(key)
+        if info is not None:
+            return info
     try:
-        return query_limonero(base_url, 'datasources', token, data_source_id)
+        info = query_limonero(base_url, 'datasources', token, data_source_id)
     except ValueError:
         raise ValueError(gettext('Data source not found'))
+    if cache is not None:
+        cache.put(key, info, info.get('updated'))
+    return info
+
+
+def _get_data_sources_updated(base_url, token, data_source_ids):
+    """ Returns the updated timestamps of data sources (one request) """
+    url = '{}/datasources'.format(
+        remove_initial_final_path_separator(base_url))
+    params = {'fields': 'id,updated', 'ids[]': data_source_ids,
+              'size': len(data_source_ids)}
+    r = http_client.get(url, params=params, headers={'X-Auth-Token': token})
+    if r.status_code != 200:
+        log.warning(gettext('Error querying Limonero URL: %s (%s: %s)'), url,
+                    r.status_code, r.text)
+        return {}
+    return dict((str(ds['id']), ds.get('updated'))
+                for ds in json.loads(r.text).get('data', []))
+
+
+def get_data_sources_info(base_url, token, data_source_ids,
+                          ignore_errors=False):
+    """
+    Bulk lookup of data sources. Returns a dict with the information of each
+    data source, by id. Data sources not cached are retrieved concurrently.
+    Cached data sources that expired are revalidated using a single request
+    (they are retrieved again only if they were updated). If ignore_errors,
+    data sources that could not be retrieved are not returned.
+    """
+    data_source_ids = list(dict.fromkeys(data_source_ids))
+    cache = metadata_cache.get_cache()
+    if cache is not None and data_source_ids:
+        keys = dict((_get_data_source_key(base_url, ds_id), ds_id)
+                    for ds_id in data_source_ids)
+        expired = cache.get_expired(keys)
+        if expired:
+            updated = _get_data_sources_updated(
+                base_url, token, [keys[key] for key in expired])
+            for key in expired:
+                cache.revalidate(key, updated.get(str(keys[key])))
+
+    def _get_info(ds_id):
+        try:
+            return get_data_source_info(base_url, token, ds_id)
+        except Exception:
+            if not ignore_errors:
+                raise
+            log.warning(gettext('Unable to retrieve data source %s'), ds_id)
+            return None
+
+    workers = max(1, min(MAX_CONCURRENT_REQUESTS, len(data_source_ids)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        infos = list(executor.map(_get_info, data_source_ids))
+    return dict((ds_id, info) for ds_id, info in zip(data_source_ids, infos)
+                if info is not None)
 
 def get_model_info(base_url, token, model_id):
     try:
@@ -77,7 +147,7 @@ def register_model(base_url, payload, token, overwrite=False):
         'cache-control': "no-cache"
     }
     payload['overwrite'] = overwrite
-    r = requests.request("POST", url, data=json.dumps(payload), headers=headers)
+    r = http_client.post(url, data=json.dumps(payload), headers=headers)
 
     if r.status_code == 200:
         return json.loads(r.text)
@@ -96,7 +166,7 @@ def register_datasource(base_url, payload, token, mode=''):
         'content-type': "application/json",
         'cache-control': "no-cache"
     }
-    r = requests.request("POST", url, data=json.dumps(payload), headers=headers)
+    r = http_client.post(url, data=json.dumps(payload), headers=headers)
 
     if r.status_code == 200:
         return json.loads(r.text)
@@ -113,7 +183,7 @@ def update_initialization_status(base_ur, payload, token):
         'content-type': "application/json",
         'cache-control': "no-cache"
     }
-    r = requests.request("POST", url, data=json.dumps(payload), headers=headers)
+    r = http_client.post(url, data=json.dumps(payload), headers=headers)
 
     if r.status_code == 200:
         return json.loads(r.text)
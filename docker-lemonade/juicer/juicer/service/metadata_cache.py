@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of metadata retrieved from Lemonade services (operations from Tahiti
+and data sources from Limonero).
+
+Minions transpile a workflow for every job and, without the cache, query the
+same metadata over and over again. Entries expire after a TTL. Expired
+entries are kept, so they can be revalidated using their `updated`
+timestamps, instead of being retrieved again (see
+limonero_service.get_data_sources_info()).
+
+The cache is created only by configure(), called by minions: other processes
+(e.g. the server) do not use it. Minions enable it unless it is disabled in
+configuration (juicer.metadata_cache.enabled).
+"""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+_cache = None
+
+
+class MetadataCache(object):
+    """
+    TTL cache (thread safe). Values are copied, so callers can change them.
+    Configuration (in juicer):
+
+        metadata_cache:
+            enabled: true
+            ttl: 300        # Seconds
+            max_size: 1000  # Entries, least recently used are evicted
+    """
+
+    def __init__(self, ttl=300, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires_at, updated, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Returns a copy of the value, or None if missing or expired """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry[2])
+
+    def get_expired(self, keys):
+        """ Returns a dict with the expired keys and their updated values """
+        now = time.time()
+        with self._lock:
+            return dict((key, self._entries[key][1]) for key in keys
+                        if key in self._entries and
+                        self._entries[key][0] < now)
+
+    def put(self, key, value, updated=None):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, updated,
+                                  copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def revalidate(self, key, updated):
+        """
+        Renews an (expired) entry if it was not updated since it was cached,
+        otherwise, removes it. Returns True if the entry was renewed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if updated is None or entry[1] != updated:
+                del self._entries[key]
+                return False
+            self._entries[key] = (time.time() + self.ttl, ) + entry[1:]
+            return True
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+def configure(config):
+    """ Enables (or disables) the cache, according to the configuration """
+    global _cache
+    cache_config = config.get('juicer', {}).get('metadata_cache') or {}
+    if cache_config.get('enabled', True):
+        _cache = MetadataCache(int(cache_config.get('ttl', 300)),
+                               int(cache_config.get('max_size', 1000)))
+    else:
+        _cache = None
+    return _cache
+
+
+def get_cache():
+    """ Returns the cache, or None, if it is not enabled """
+    return _cache
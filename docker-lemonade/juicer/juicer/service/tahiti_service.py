@@ -4,7 +4,7 @@
 import json
 import logging
 
-import requests
+from juicer.service import http_client, metadata_cache
 
 log = logging.getLogger()
 log.setLevel(logging.DEBUG)
@@ -26,7 +26,7 @@ def query_tahiti(base_url, item_path, token, item_id, qs=None):
         url += '?' + qs
     log.debug(_('Querying Tahiti URL: %s'), url)
 
-    r = requests.get(url, headers=headers)
+    r = http_client.get(url, headers=headers)
     if r.status_code == 200:
         return json.loads(r.text)
     else:
@@ -34,3 +34,32 @@ def query_tahiti(base_url, item_path, token, item_id, qs=None):
             "Error loading data from tahiti: id {}: HTTP {} - {}  ({})").format(
             item_id, r.status_code, r.text, url))
 
+
+def get_operations(base_url, token, operation_ids, lang='en'):
+    """
+    Returns the operations (list), querying only the ones not cached in a
+    single request.
+    """
+    cache = metadata_cache.get_cache()
+    operation_ids = list(dict.fromkeys(operation_ids))
+    result = []
+    missing = operation_ids
+    if cache is not None:
+        missing = []
+        for op_id in operation_ids:
+            operation = cache.get(('operations', base_url, lang, op_id))
+            if operation is None:
+                missing.append(op_id)
+            else:
+                result.append(operation)
+    if missing:
+        ids = '&'.join('ids[]={}'.format(op_id) for op_id in missing)
+        operations = query_tahiti(
+            base_url, 'operations', token, '',
+            qs='lang={}&{}'.format(lang, ids)).get('data')
+        if cache is not None:
+            for operation in operations:
+                cache.put(('operations', base_url, lang, operation['id']),
+                          operation)
+        result.extend(operations)
+    return result
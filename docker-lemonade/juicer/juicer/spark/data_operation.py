@@ -88,6 +88,16 @@ class DataReaderOperation(Operation):
         self.output = named_outputs.get('output data',
                                         'out_task_{}'.format(self.order))
 
+    @property
+    def supports_persistent_cache(self):
+        # Reading from the source is as expensive as reading from cache
+        return False
+
+    def get_data_source_version(self):
+        if not self.has_code:
+            return None
+        return '{}:{}'.format(self.data_source_id, self.metadata.get('updated'))
+
     def _set_data_source_parameters(self, parameters):
 
         self.data_source_id = int(parameters[self.DATA_SOURCE_ID_PARAM])
@@ -276,8 +286,6 @@ class DataReaderOperation(Operation):
                         '{url}')""".format(output=self.output,
                                            url=url))
                 code.append(code_json)
-                # FIXME: Evaluate if it is good idea to always use cache
-                code.append('{}.cache()'.format(self.output))
 
             elif self.metadata['format'] == 'LIB_SVM':
                 self._generate_code_for_lib_svm(code, infer_from_data)
@@ -289,7 +297,7 @@ class DataReaderOperation(Operation):
                 'privacy_restrictions', {}).get(self.data_source_id)
             code.extend(self._apply_privacy_constraints(restrictions))
 
-        code.append('{}.cache()'.format(self.output))
+        # Persistence is decided by the transpiler (see juicer.spark.storage)
         return '\n'.join(code)
 
     def _generate_code_for_jdbc(self, code):
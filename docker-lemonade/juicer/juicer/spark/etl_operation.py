@@ -978,28 +978,50 @@ class CleanMissingOperation(Operation):
         pre_code = []
         partial = []
         attrs_json = json.dumps(self.attributes)
+        statistics = (self.MEAN, self.MEDIAN, self.MODE)
 
         if any([self.min_missing_ratio, self.max_missing_ratio]):
             self.min_missing_ratio = float(self.min_missing_ratio)
             self.max_missing_ratio = float(self.max_missing_ratio)
 
-            # Based on http://stackoverflow.com/a/35674589/1646932
-            select_list = [
-                ("\n    (functions.avg(functions.col('{0}').isNull()."
-                 "cast('int'))).alias('{0}')").format(attr)
-                for attr in self.attributes]
+            if self.cleaning_mode in statistics:
+                # Ratios and replacement values of all attributes are
+                # computed together (at most 2 Spark jobs)
+                ratio = 'ratio_{0}[c]'.format(input_data)
+                pre_code.extend([
+                    "# Computes the ratio of missing values and the {0} of "
+                    "each attribute".format(self.cleaning_mode.lower()),
+                    "ratio_{0}, values_{0} = juicer_ext.get_missing_statistics("
+                    "\n    {0}, {1}, ratio=True, statistic='{2}')".format(
+                        input_data, attrs_json, self.cleaning_mode)])
+            else:
+                ratio = 'ratio_{0}[0][c]'.format(input_data)
+                # Based on http://stackoverflow.com/a/35674589/1646932
+                select_list = [
+                    ("\n    (functions.avg(functions.col('{0}').isNull()."
+                     "cast('int'))).alias('{0}')").format(attr)
+                    for attr in self.attributes]
+                pre_code.extend([
+                    "# Computes the ratio of missing values for each attribute",
+                    "ratio_{0} = {0}.select({1}).collect()".format(
+                        input_data, ', '.join(select_list))])
             pre_code.extend([
-                "# Computes the ratio of missing values for each attribute",
-                "ratio_{0} = {0}.select({1}).collect()".format(
-                    input_data, ', '.join(select_list)), "",
+                "",
                 "attributes_{0} = [c for c in {1} "
-                "\n                  if {2} <= ratio_{0}[0][c] <= {3}]".format(
-                    input_data, attrs_json, self.min_missing_ratio,
+                "\n                  if {2} <= {3} <= {4}]".format(
+                    input_data, attrs_json, self.min_missing_ratio, ratio,
                     self.max_missing_ratio)
             ])
         else:
             pre_code.append(
                 "attributes_{0} = {1}".format(input_data, attrs_json))
+            if self.cleaning_mode in statistics:
+                pre_code.extend([
+                    "# Computes the {0} of all attributes at once".format(
+                        self.cleaning_mode.lower()),
+                    "_, values_{0} = juicer_ext.get_missing_statistics("
+                    "\n    {0}, attributes_{0}, statistic='{1}')".format(
+                        input_data, self.cleaning_mode)])
 
         if self.cleaning_mode == self.REMOVE_ROW:
             partial.append("""
@@ -1020,49 +1042,12 @@ class CleanMissingOperation(Operation):
                 "[c for c in {1}.columns if c not in attributes_{1}])".format(
                     self.output, input_data))
 
-        elif self.cleaning_mode == self.MODE:
-            # Based on http://stackoverflow.com/a/36695251/1646932
-            # But null values cause exception, so it needs to remove them
-            partial.append("""
-                import decimal
-                md_replace_{1} = dict()
-                for md_attr_{1} in attributes_{1}:
-                    md_count_{1} = {1}.na.drop(subset=[md_attr_{1}]).groupBy(
-                        md_attr_{1}).count().orderBy(
-                            functions.desc('count')).limit(1)
-                    # Spark does not support BigDecimal!
-                    if isinstance(md_count_{1}.collect()[0][0],
-                        decimal.Decimal):
-                        replacement = float(md_count_{1}.collect()[0][0])
-                    else:
-                        replacement = md_count_{1}.collect()[0][0]
-                    md_replace_{1}[md_attr_{1}] = replacement
-                {0} = {1}.fillna(value=md_replace_{1})""".format(
-                self.output, input_data)
-            )
-
-        elif self.cleaning_mode == self.MEDIAN:
-            # See http://stackoverflow.com/a/31437177/1646932
-            # But null values cause exception, so it needs to remove them
-            partial.append("""
-                mdn_replace_{1} = dict()
-                for mdn_attr_{1} in attributes_{1}:
-                    # Computes median value for column with relat. error=10%
-                    mdn_{1} = {1}.na.drop(subset=[mdn_attr_{1}])\\
-                        .approxQuantile(str(mdn_attr_{1}), [.5], .1)
-                    mdn_replace_{1}[mdn_attr_{1}] = mdn_{1}[0]
-                {0} = {1}.fillna(value=mdn_replace_{1})""".format(
-                self.output, input_data))
-
-        elif self.cleaning_mode == self.MEAN:
+        elif self.cleaning_mode in statistics:
+            # Attributes without values (e.g. only nulls) are not changed
             partial.append("""
-                avg_{1} = {1}.select([functions.avg(c).alias(c)
-                                        for c in attributes_{1}]).collect()
-                # Convert to float because Spark complains about Decimal
-                values_{1} = dict([(c, float(avg_{1}[0][c]))
-                    for c in attributes_{1}])
-                {0} = {1}.na.fill(value=values_{1})""".format(self.output,
-                                                              input_data))
+                {0} = {1}.na.fill(value=dict(
+                    (c, values_{1}[c]) for c in attributes_{1}
+                    if c in values_{1}))""".format(self.output, input_data))
         else:
             raise ValueError(
                 _("Parameter '{}' has an incorrect value '{}' in {}").format(
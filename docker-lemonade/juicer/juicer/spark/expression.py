@@ -122,8 +122,9 @@ class Expression(object):
 
     def get_set_function(self, spec, params, data_type):
         """
-        Removes duplicates from a list or vector column using set collection in
-        Python.
+        Removes duplicates from a list or vector column (array_distinct in
+        Spark 2.4+, a Python set in older versions). The input data frame,
+        if any, is used to identify vector columns.
         """
         # Evaluates if column name is wrapped in a col() function call
         arguments = [self.parse(x, params) for x in spec['arguments']]
@@ -131,12 +132,11 @@ class Expression(object):
         if len(arguments) != 1:
             raise ValueError(_('Function set() expects exactly 1 argument.'))
 
-        get_set_function = dedent("""
-            functions.udf(lambda values: [v for v in set(values) if v != ''],
-                        types.ArrayType(types.{type}()))
-        """).format(type=data_type).strip()
-
-        return '{}({})'.format(get_set_function, arguments[0])
+        if 'input' in params:
+            return "juicer_ext.distinct_values({}, '{}', {})".format(
+                arguments[0], data_type, params['input'])
+        return "juicer_ext.distinct_values({}, '{}')".format(arguments[0],
+                                                            data_type)
 
     def get_when_function(self, spec, params):
         """
@@ -155,7 +155,7 @@ class Expression(object):
         """
         """
         arguments = [self.parse(x, params) for x in spec['arguments']]
-        f = 'juicer_ext.ith_function_udf'
+        f = 'juicer_ext.ith_function'
         result = '{}({}, functions.lit({}))'.format(f, arguments[0],
                                                     arguments[1])
         return result
@@ -172,7 +172,7 @@ class Expression(object):
         #     "if unicodedata.category(c) != 'Mn'), "
         #     "types.StringType())"
         # )
-        strip_accents = 'juicer_ext.strip_accents_udf'
+        strip_accents = 'juicer_ext.strip_accents'
 
         result = '{}({})'.format(strip_accents, arguments)
 
@@ -190,7 +190,7 @@ class Expression(object):
         #     "dict((ord(char), None) for char in string.punctuation)), "
         #     "types.StringType())"
         # )
-        strip_punctuation = 'juicer_ext.remove_punctuation_udf'
+        strip_punctuation = 'juicer_ext.remove_punctuation'
 
         result = '{}({})'.format(strip_punctuation, arguments)
 
@@ -257,7 +257,7 @@ class Expression(object):
         """
         """
         arguments = [self.parse(x, params) for x in spec['arguments']]
-        f = 'juicer_ext.translate_function_udf'
+        f = 'juicer_ext.translate_function'
         result = dedent('''{}(
                     {}, {}, {},
                     {})'''.format(f, arguments[0], arguments[1], arguments[2],
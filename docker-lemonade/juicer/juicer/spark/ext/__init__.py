@@ -1,6 +1,8 @@
 # coding=utf-8
 
+import functools
 import string
+import sys
 import unicodedata
 
 from pyspark.ml.util import JavaMLWritable, JavaMLReadable
@@ -11,6 +13,7 @@ from juicer.util import dataframe_util
 try:
     from pyspark import keyword_only
     from pyspark.ml import Transformer
+    from pyspark.ml.linalg import VectorUDT
     from pyspark.ml.param.shared import Param, HasOutputCol, HasFeaturesCol, \
         HasPredictionCol, Params, TypeConverters
     from pyspark.sql import functions, types
@@ -64,6 +67,170 @@ def translate_function_udf(v, missing='null', _type='string', pairs=None):
     return functions.udf(translate, t())(v)
 
 
+# Functions used in expressions. Native Spark SQL functions are used when
+# available in the running Spark version, avoiding Python UDFs, where every
+# row is serialized (pickled) and processed by a Python worker.
+
+def _get_spark_version():
+    """ Major and minor version of Spark, e.g. (2, 4) """
+    import pyspark
+    return tuple(int(v) for v in pyspark.__version__.split('.')[:2])
+
+
+def remove_punctuation(text):
+    # Characters without replacement are removed
+    return functions.translate(text, string.punctuation, '')
+
+
+@functools.lru_cache(maxsize=1)
+def _get_non_spacing_marks():
+    """ Translation table removing non-spacing marks (e.g. accents) """
+    return dict((code, None) for code in range(sys.maxunicode + 1)
+                if unicodedata.category(chr(code)) == 'Mn')
+
+
+def _strip_accents_series(texts):
+    return texts.str.normalize('NFD').str.translate(_get_non_spacing_marks())
+
+
+def strip_accents(text):
+    # Spark 2.x requires a legacy Arrow format with recent pyarrow versions
+    if _get_spark_version() >= (3, 0):
+        return functions.pandas_udf(_strip_accents_series,
+                                    types.StringType())(text)
+    return strip_accents_udf(text)
+
+
+def ith_function(v, i):
+    if _get_spark_version() >= (3, 0):
+        from pyspark.ml.functions import vector_to_array
+        return vector_to_array(v)[i].cast(types.FloatType())
+    return ith_function_udf(v, i)
+
+
+def translate_function(v, missing='null', _type='string', pairs=None):
+    """ Translates values using a lookup table (map) """
+    data_types = {'float': 'float', 'int': 'int', 'long': 'bigint',
+                  'timestamp': 'timestamp', 'string': 'string'}
+    if _type not in data_types:
+        raise ValueError('Invalid type: {}'.format(_type))
+
+    pairs = [pair for pair in pairs or [] if pair]
+    if pairs:
+        lookup = functions.create_map(
+            *[functions.lit(value) for pair in pairs for value in pair])
+        result = lookup[v]
+    else:
+        result = functions.lit(None)
+    if missing != 'null':
+        result = functions.coalesce(result, v)
+    return result.cast(data_types[_type])
+
+
+def distinct_values(values, data_type='StringType', df=None):
+    """
+    Distinct values of an array or vector column, except empty strings.
+    Vector columns are identified using the schema of df, if informed.
+    """
+    element_type = getattr(types, data_type)()
+    is_vector = df is not None and isinstance(
+        df.select(values).schema.fields[0].dataType, VectorUDT)
+    version = _get_spark_version()
+    if is_vector and version >= (3, 0):
+        from pyspark.ml.functions import vector_to_array
+        values = vector_to_array(values)
+    if version >= (3, 0) or (version >= (2, 4) and not is_vector):
+        values = values.cast(types.ArrayType(element_type))
+        if isinstance(element_type, types.StringType):
+            values = functions.array_remove(values, '')
+        return functions.array_distinct(values)
+    return functions.udf(lambda v: [x for x in set(v) if x != ''],
+                         types.ArrayType(element_type))(values)
+
+
+def _quote(attr):
+    return '`{}`'.format(attr.replace('`', '``'))
+
+
+def _from_string(value, data_type):
+    """ Converts a value cast to string back to a type supported by na.fill """
+    if isinstance(data_type, (types.ByteType, types.ShortType,
+                              types.IntegerType, types.LongType)):
+        return int(value)
+    elif isinstance(data_type, (types.FloatType, types.DoubleType,
+                                types.DecimalType)):
+        return float(value)
+    elif isinstance(data_type, types.BooleanType):
+        return value == 'true'
+    return value
+
+
+def _get_modes(df, attributes):
+    """
+    Mode of all attributes in a single job: values of all attributes are
+    stacked (as strings) and counted by a single group by.
+    """
+    from pyspark.sql import Window
+    stacked = df.select(functions.explode(functions.array(*[
+        functions.struct(functions.lit(i).alias('attr'),
+                         functions.col(_quote(attr)).cast(
+                             'string').alias('value'))
+        for i, attr in enumerate(attributes)])).alias('stacked'))
+    counts = stacked.select('stacked.attr', 'stacked.value').where(
+        functions.col('value').isNotNull()).groupBy('attr', 'value').count()
+    window = Window.partitionBy('attr').orderBy(
+        functions.desc('count'), 'value')
+    rows = counts.withColumn('rank', functions.row_number().over(
+        window)).where(functions.col('rank') == 1).collect()
+
+    data_types = dict((f.name, f.dataType) for f in df.schema.fields)
+    modes = {}
+    for row in rows:
+        attr = attributes[row['attr']]
+        modes[attr] = _from_string(row['value'], data_types[attr])
+    return modes
+
+
+def get_missing_statistics(df, attributes, ratio=False, statistic=None,
+                           relative_error=.1):
+    """
+    Ratio of missing values (if ratio is True) and value used to replace them
+    (statistic MEAN, MEDIAN or MODE) for each attribute. Ratios, means and
+    medians of all attributes are computed by a single aggregation and modes
+    by another one. Attributes without a value (e.g. only nulls) are not
+    included in the replacement values.
+    """
+    ratios = {}
+    values = {}
+    aggregations = []
+    for i, attr in enumerate(attributes):
+        column = functions.col(_quote(attr))
+        if ratio:
+            aggregations.append(functions.avg(
+                column.isNull().cast('int')).alias('ratio_{}'.format(i)))
+        if statistic == 'MEAN':
+            aggregations.append(functions.avg(column).alias(
+                'value_{}'.format(i)))
+        elif statistic == 'MEDIAN':
+            aggregations.append(functions.expr(
+                'percentile_approx({}, 0.5, {})'.format(
+                    _quote(attr), int(1 / relative_error))).alias(
+                'value_{}'.format(i)))
+
+    if aggregations:
+        row = df.select(aggregations).first()
+        for i, attr in enumerate(attributes):
+            if ratio:
+                ratios[attr] = row['ratio_{}'.format(i)]
+            value = row['value_{}'.format(i)] if statistic in (
+                'MEAN', 'MEDIAN') else None
+            if value is not None:
+                values[attr] = float(value)
+    if statistic == 'MODE' and attributes:
+        values.update(_get_modes(df, attributes))
+    return ratios, values
+
+
 # noinspection PyPep8Naming
 class CustomExpressionTransformer(Transformer, HasOutputCol):
     """
@@ -1093,6 +1093,10 @@ class CrossValidationOperation(Operation):
         'r2': ('evaluation.RegressionEvaluator', 'predictionCol'),
     }
 
+    @property
+    def iterative(self):
+        return True
+
     def __init__(self, parameters, named_inputs, named_outputs):
         Operation.__init__(self, parameters, named_inputs, named_outputs)
 
@@ -1247,6 +1251,10 @@ class ClassificationModelOperation(DeployModelMixin, Operation):
     PREDICTION_ATTRIBUTE_PARAM = 'prediction'
     WEIGHTS_PARAM = 'weights'
 
+    @property
+    def iterative(self):
+        return True
+
     def __init__(self, parameters, named_inputs,
                  named_outputs):
         Operation.__init__(self, parameters, named_inputs,
@@ -1979,6 +1987,10 @@ class ClusteringModelOperation(Operation):
     FEATURES_ATTRIBUTE_PARAM = 'features'
     PREDICTION_ATTRIBUTE_PARAM = 'prediction'
 
+    @property
+    def iterative(self):
+        return True
+
     def __init__(self, parameters, named_inputs, named_outputs):
         Operation.__init__(self, parameters, named_inputs,
                            named_outputs)
@@ -2493,6 +2505,10 @@ class RecommendationModel(Operation):
     # ITEM_COL_PARAM = 'item_col'
     # RATING_COL_PARAM = 'rating_col'
 
+    @property
+    def iterative(self):
+        return True
+
     def __init__(self, parameters, named_inputs,
                  named_outputs):
         Operation.__init__(self, parameters, named_inputs, named_outputs)
@@ -2718,6 +2734,10 @@ class RegressionModelOperation(DeployModelMixin, Operation):
     LABEL_PARAM = 'label'
     PREDICTION_COL_PARAM = 'prediction'
 
+    @property
+    def iterative(self):
+        return True
+
     def __init__(self, parameters, named_inputs, named_outputs):
         Operation.__init__(self, parameters, named_inputs, named_outputs)
 
@@ -3481,7 +3501,7 @@ class SaveModelOperation(Operation):
                     from mleap.pyspark.spark_support import SimpleSparkSerializer
                     parsed = urlparse(final_model_path)
 
-                    tmp_file = '/tmp/model_{job_id}.zip'
+                    tmp_file = '/tmp/model_{{}}.zip'.format(get_job_id())
                     model_to_save.serializeToBundle(
                         'jar:file:' + tmp_file, df)
                     if parsed.scheme == 'file':
@@ -3518,7 +3538,7 @@ class SaveModelOperation(Operation):
                     "path":  model_path,
                     "type": "MLEAP" if format == 'MLEAP' else "UNSPECIFIED" ,
                     "task_id": '{task_id}',
-                    "job_id": {job_id},
+                    "job_id": get_job_id(),
                     "workflow_id": {workflow_id},
                     "workflow_name": '{workflow_name}'
                 }}
@@ -3553,7 +3573,6 @@ class SaveModelOperation(Operation):
                           'and criteria is different from ALL'),
                    msg1=_('You cannot mix models built using with '
                           'different metrics ({}).'),
-                   job_id=self.job_id,
                    task_id=self.parameters['task_id'],
                    workflow_id=self.workflow_id,
                    workflow_name=self.workflow_name,
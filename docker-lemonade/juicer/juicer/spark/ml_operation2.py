@@ -41,6 +41,10 @@ class AlgorithmOperation(Operation):
         self.has_code = len(self.named_inputs) and any(
             [len(self.named_outputs) > 0, self.contains_results()])
 
+    @property
+    def iterative(self):
+        return True
+
     def generate_code(self):
         algorithm_code = self.algorithm.generate_code() or ''
         model_code = self.model.generate_code() or ''
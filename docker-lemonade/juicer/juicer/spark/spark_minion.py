@@ -19,9 +19,9 @@ import glob
 
 import itertools
 
-import codecs
 import os
 import socketio
+from io import StringIO
 from timeit import default_timer as timer
 # noinspection PyCompatibility
 from concurrent.futures import ThreadPoolExecutor
@@ -29,10 +29,11 @@ from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import TimeoutError
 from juicer.runner import configuration
 from juicer.runner import protocol as juicer_protocol
+from juicer.runner import telemetry
 
 from juicer.runner.minion_base import Minion
 from juicer.spark.transpiler import SparkTranspiler
-from juicer.util import dataframe_util, listener_util
+from juicer.util import dataframe_util, listener_util, result_cache
 from juicer.workflow.workflow import Workflow
 from juicer.util.template_util import strip_accents
 
@@ -50,6 +51,8 @@ class SparkMinion(Minion):
     # max idle time allowed in seconds until this minion self termination
     IDLENESS_TIMEOUT = 600
     TIMEOUT = 'timeout'
+    # rows delivered by page of task output
+    SAMPLE_PAGE_SIZE = 100
 
     def __init__(self, redis_conn, workflow_id, app_id, config, lang='en',
                  jars=None):
@@ -229,6 +232,7 @@ class SparkMinion(Minion):
         """
         Starts consuming jobs that must be processed by this minion.
         """
+        self.start_telemetry()
         while q.empty():
             try:
                 self._process_message_nb()
@@ -300,6 +304,7 @@ class SparkMinion(Minion):
                                   'Stopping previous cluster.'),
                         status='RUNNING', identifier=job_id)
                     # Requires finish Spark Context
+                    dataframe_util.sample_cache.shutdown()
                     self.spark_session.stop()
                     self._state = {}
                     self.spark_session = None
@@ -407,6 +412,14 @@ class SparkMinion(Minion):
                          self.app_id)
                 self.terminate()
 
+        elif msg_type == juicer_protocol.MORE_DATA:
+            # Pages are read from samples kept in memory, in their own
+            # background thread, so requests do not wait for samples being
+            # fetched. Pages not fetched yet still run a Spark job.
+            log.info(_('More data message received'))
+            dataframe_util.sample_cache.submit_page(self._perform_more_data,
+                                                    msg_info)
+
         elif msg_type == SparkMinion.MSG_PROCESSED:
             self.active_messages -= 1
 
@@ -459,31 +472,29 @@ class SparkMinion(Minion):
                     self.app_id,
                     job_id)
 
-            generated_code_path = os.path.join(
-                    self.tmp_dir, module_name + '.py')
-
             if not freeze and code is None:
-
-                with codecs.open(generated_code_path, 'w', 'utf8') as out:
-                    self.transpiler.transpile(
-                        loader.workflow, loader.graph, {}, out, job_id,
-                        self._state, persist=app_configs.get('persist', True))
-            elif code is not None:
-                # Code was generated somewhere else. For example, 
-                # in minion from Meta Platform
-                with codecs.open(generated_code_path, 'w', 'utf8') as out:
-                    print(code, file=out)
+                out = StringIO()
+                self.transpiler.transpile(
+                    loader.workflow, loader.graph, {}, out, job_id,
+                    self._state, persist=app_configs.get('persist', True))
+                code = out.getvalue()
+            # else: code was generated somewhere else. For example,
+            # in minion from Meta Platform
 
             # force the spark context creation
             self.get_or_create_spark_session(workflow_name, app_configs, job_id)
 
-            # Get rid of .pyc file if it exists
-            if os.path.isfile('{}c'.format(generated_code_path)):
-                os.remove('{}c'.format(generated_code_path))
+            if freeze:
+                generated_code_path = os.path.join(
+                    self.tmp_dir, module_name + '.py')
+                # Get rid of .pyc file if it exists
+                if os.path.isfile('{}c'.format(generated_code_path)):
+                    os.remove('{}c'.format(generated_code_path))
 
-            self.module = importlib.import_module(module_name)
-            # self.module = imp.reload(self.module)
-            self.module = importlib.reload(self.module)
+                self.module = importlib.import_module(module_name)
+                self.module = importlib.reload(self.module)
+            else:
+                self.module = self._load_generated_module(code, job_id)
             if log.isEnabledFor(logging.DEBUG):
                 log.debug('Objects in memory after loading module: %s',
                           len(gc.get_objects()))
@@ -493,6 +504,8 @@ class SparkMinion(Minion):
             # current state (if any). We pass the current state to the execution
             # to avoid re-computing the same tasks over and over again, in case
             # of several partial workflow executions.
+            self._report_time_to_first_task(job_id)
+            result_cache.set_current_job('spark', job_id)
             try:
                 new_state = self.module.main(
                     self.get_or_create_spark_session(workflow_name, app_configs,
@@ -505,6 +518,7 @@ class SparkMinion(Minion):
                 raise ex from None
 
             end = timer()
+            self._report_result_cache_statistics('spark', job_id)
             # Mark job as completed
             self._emit_event(room=job_id, namespace='/stand')(
                 name='update job',
@@ -570,6 +584,7 @@ class SparkMinion(Minion):
             log.warn(
                 _('Minion is configured to stop Spark after each execution'))
             self._state = {}
+            dataframe_util.sample_cache.shutdown()
             self.spark_session.stop()
             self.spark_session = None
 
@@ -585,6 +600,11 @@ class SparkMinion(Minion):
                 self.spark_session.sparkContext._jsc and
                 not self.spark_session.sparkContext._jsc.sc().isStopped())
 
+    def get_platform_telemetry(self):
+        if not self.is_spark_session_available():
+            return {}
+        return telemetry.get_spark_telemetry(self.spark_session)
+
     # noinspection PyUnresolvedReferences,PyProtectedMember
     def get_or_create_spark_session(self, workflow_name, app_configs, job_id):
         """
@@ -762,43 +782,77 @@ class SparkMinion(Minion):
 
         return success
 
-    def _read_dataframe_data(self, task_id, output, port):
-        success = True
-        data = []
-        # Last position in state is the execution time, so it should be ignored
-        if port in self._state[task_id]:
-            df = self._state[task_id][port]['output']
-            partial_result = self._state[task_id][port]['sample']
-
-            # In this case we already have partial data collected for the
-            # particular task
-            if partial_result:
-                status_data = {'status': 'SUCCESS', 'code': self.MNN002[0],
-                               'message': self.MNN002[1], 'output': output}
-                data = [dataframe_util.convert_to_csv(r) for r in
-                        partial_result]
-
-            # In this case we do not have partial data collected for the task
-            # Then we must obtain it if the 'take' operation applies
-            elif df is not None and hasattr(df, 'take'):
-                # Evaluating if df has method "take" allows unit testing
-                # instead of testing exact pyspark.sql.dataframe.Dataframe
-                # type check.
-                # FIXME define as a parameter?:
-                status_data = {'status': 'SUCCESS', 'code': self.MNN002[0],
-                               'message': self.MNN002[1], 'output': output}
-                data = df.rdd.map(dataframe_util.convert_to_csv).take(100)
-
-            # In this case, do not make sense to request data for this
-            # particular task output port
-            else:
-                status_data = {'status': 'ERROR', 'code': self.MNN001[0],
-                               'message': self.MNN001[1]}
-                success = False
+    def _perform_more_data(self, msg_info):
+        task_id = msg_info.get('task_id')
+        output = msg_info.get('output')
+        offset = int(msg_info.get('offset', 0))
+        size = int(msg_info.get('size', self.SAMPLE_PAGE_SIZE))
 
+        if task_id in self._state:
+            success, status_data, data = self._read_dataframe_data(
+                task_id, output, msg_info.get('port'), offset, size)
         else:
             status_data = {'status': 'ERROR', 'code': self.MNN004[0],
                            'message': self.MNN004[1]}
+            success, data = False, []
+
+        if output:
+            self._send_delivery(output, status_data, data)
+        else:
+            status_data['sample'] = '\n'.join(data)
+            self._send_to_output(status_data)
+        return success
+
+    def _get_task_output(self, task_id, port):
+        """
+        Output of a task in a port and its sample, if already collected.
+        Generated code keeps the results of each task and its hash in the
+        state (older versions kept the output and sample by port).
+        """
+        state = self._state[task_id]
+        if isinstance(state, (list, tuple)):
+            return state[0][port], None
+        return state[port]['output'], state[port].get('sample')
+
+    def _read_dataframe_data(self, task_id, output, port, offset=0,
+                             size=SAMPLE_PAGE_SIZE):
+        success = True
+        data = []
+        try:
+            df, partial_result = self._get_task_output(task_id, port)
+        except (KeyError, TypeError):
+            status_data = {'status': 'ERROR', 'code': self.MNN004[0],
+                           'message': self.MNN004[1]}
+            return False, status_data, data
+
+        # In this case we already have partial data collected for the
+        # particular task
+        if partial_result:
+            status_data = {'status': 'SUCCESS', 'code': self.MNN002[0],
+                           'message': self.MNN002[1], 'output': output}
+            data = [dataframe_util.convert_to_csv(r) for r in
+                    partial_result[offset:offset + size]]
+
+        # In this case we do not have partial data collected for the task
+        # Then we must obtain it if the 'take' operation applies
+        elif df is not None and hasattr(df, 'take'):
+            # Evaluating if df has method "take" allows unit testing
+            # instead of testing exact pyspark.sql.dataframe.Dataframe
+            # type check.
+            # Rows are kept in memory (sample_cache), so next pages and
+            # the sample emitted by the task are not computed again.
+            rows, more = dataframe_util.sample_cache.get_page(
+                task_id, port, df, offset, size)
+            status_data = {'status': 'SUCCESS', 'code': self.MNN002[0],
+                           'message': self.MNN002[1], 'output': output,
+                           'offset': offset, 'more': more}
+            data = [dataframe_util.convert_to_csv(r) for r in rows]
+
+        # In this case, do not make sense to request data for this
+        # particular task output port
+        else:
+            status_data = {'status': 'ERROR', 'code': self.MNN001[0],
+                           'message': self.MNN001[1]}
             success = False
 
         return success, status_data, data
@@ -862,7 +916,7 @@ class SparkMinion(Minion):
         if self.spark_session and multiprocessing.current_process().name == 'main':
             try:
                 sc = self.spark_session.sparkContext
-    
+                dataframe_util.sample_cache.shutdown()
                 self.spark_session.stop()
                 self.spark_session.sparkContext.stop()
                 self.spark_session = None
@@ -120,7 +120,7 @@ class KaplanMeierSurvivalOperation(Operation):
                 fig.tight_layout(rect=[0, 0.03, 1, 0.95])
                 fig.savefig(fig_file, format='png')
                 visualization = {{
-                    'job_id': '{job_id}',
+                    'job_id': str(get_job_id()),
                     'task_id': '{task_id}',
                     'title': '{title}',
                     'type': {{
@@ -145,7 +145,7 @@ class KaplanMeierSurvivalOperation(Operation):
                 # caipirinha_service.new_visualization(
                 #     config,
                 #     {user},
-                #     {workflow_id}, {job_id}, '{task_id}',
+                #     {workflow_id}, get_job_id(), '{task_id}',
                 #     visualization, emit_event)
         """.format(out=self.output,
                    input=self.input,
@@ -159,7 +159,6 @@ class KaplanMeierSurvivalOperation(Operation):
                    t=_('timeline'),
                    task_id=self.parameters['task_id'],
                    operation_id=self.parameters['operation_id'],
-                   job_id=self.parameters['job_id'],
                    user=self.parameters['user'],
                    workflow_id=self.parameters['workflow_id'],
                    display_image=display_image
@@ -249,7 +248,7 @@ class CoxProportionalHazardsOperation(Operation):
 
                 fig.savefig(fig_file, format='png')
                 visualization = {{
-                    'job_id': '{job_id}',
+                    'job_id': str(get_job_id()),
                     'task_id': '{task_id}',
                     'title': '{title}',
                     'type': {{
@@ -274,7 +273,7 @@ class CoxProportionalHazardsOperation(Operation):
                 # caipirinha_service.new_visualization(
                 #     config,
                 #     {user},
-                #     {workflow_id}, {job_id}, '{task_id}',
+                #     {workflow_id}, get_job_id(), '{task_id}',
                 #     visualization, emit_event)
 
 
@@ -284,7 +283,6 @@ class CoxProportionalHazardsOperation(Operation):
                        title=self.title,
                        task_id=self.parameters['task_id'],
                        operation_id=self.parameters['operation_id'],
-                       job_id=self.parameters['job_id'],
                        user=self.parameters['user'],
                        workflow_id=self.parameters['workflow_id'],
                        display_image=display_image,
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Storage planning (persistence) of data read by Spark workflows.
+
+Persisting a data source pins the whole data in executors and stops Catalyst
+from pushing projections and filters of the next tasks down to the scan.
+Thus, the transpiler uses the workflow graph to decide, for each data source:
+
+ - where to persist: after the projections, filters and drops applied
+   to the data before it is used by other tasks (less data is stored);
+ - whether to persist: only if the data is read by more than one task or by
+   an iterative algorithm (see Operation.iterative);
+ - the storage level: serialized in memory (spilling to disk) or, if the size
+   estimated by Limonero is larger than max_memory_size, only in disk.
+
+Persisted data is released (unpersist) when all tasks depending on it
+finish (generated code). If planning is disabled (juicer.transpiler.storage),
+all data sources are cached, as in previous versions.
+"""
+import networkx as nx
+from juicer.spark.data_operation import DataReaderOperation
+from juicer.spark.etl_operation import DropOperation, FilterOperation, \
+    SelectOperation
+
+MEMORY_AND_DISK = 'MEMORY_AND_DISK'
+MEMORY_AND_DISK_SER = 'MEMORY_AND_DISK_SER'
+DISK_ONLY = 'DISK_ONLY'
+
+# Code of each storage level (serialized levels are not defined in PySpark)
+STORAGE_LEVELS = {
+    MEMORY_AND_DISK: 'StorageLevel.MEMORY_AND_DISK',
+    MEMORY_AND_DISK_SER: 'StorageLevel(True, True, False, False)',
+    DISK_ONLY: 'StorageLevel.DISK_ONLY',
+}
+
+# Operations reducing the data, applied before persisting it
+REDUCING_OPERATIONS = (DropOperation, FilterOperation, SelectOperation)
+
+DEFAULT_MAX_MEMORY_SIZE = 2048  # MB
+
+
+def get_storage_config(configuration):
+    """ Storage planning configuration (juicer.transpiler.storage) """
+    config = configuration or {}
+    transpiler_config = config.get('juicer', {}).get('transpiler') or {}
+    return transpiler_config.get('storage') or {}
+
+
+def _is_executed(instance):
+    return instance.has_code and instance.enabled
+
+
+def _get_consumers(graph, instances, task_id):
+    """ Executed tasks reading the output of the task (one per flow) """
+    return [target_id for _, target_id in graph.out_edges(task_id)
+            if target_id in instances and _is_executed(instances[target_id])]
+
+
+def _get_storage_level(instance, max_memory_size):
+    size = instance.metadata.get('estimated_size_in_mega_bytes')
+    if size and float(size) > max_memory_size:
+        return DISK_ONLY
+    return MEMORY_AND_DISK_SER
+
+
+def plan_storage(graph, instances, configuration):
+    """
+    Informs the storage level of persisted data (storage_level), how many
+    tasks depend on it (storage_dependents) and, for each task, the
+    persisted data released after it (release_storage).
+    """
+    config = get_storage_config(configuration)
+    max_memory_size = float(
+        config.get('max_memory_size', DEFAULT_MAX_MEMORY_SIZE))
+
+    for task_id, instance in list(instances.items()):
+        if not isinstance(instance, DataReaderOperation) or \
+                not _is_executed(instance):
+            continue
+        if not config.get('planning', True):
+            instance.parameters['storage_level'] = MEMORY_AND_DISK
+            continue
+
+        persisted_id = task_id
+        consumers = _get_consumers(graph, instances, persisted_id)
+        while len(consumers) == 1 and isinstance(
+                instances[consumers[0]], REDUCING_OPERATIONS):
+            persisted_id = consumers[0]
+            consumers = _get_consumers(graph, instances, persisted_id)
+
+        iterative = any(instances[c].iterative for c in consumers)
+        if len(consumers) < 2 and not iterative:
+            continue
+
+        persisted = instances[persisted_id].parameters
+        persisted['storage_level'] = _get_storage_level(
+            instance, max_memory_size)
+        dependents = [d for d in nx.descendants(graph, persisted_id)
+                      if d in instances and _is_executed(instances[d])]
+        persisted['storage_dependents'] = len(dependents)
+        for dependent_id in dependents:
+            instances[dependent_id].parameters.setdefault(
+                'release_storage', []).append(persisted_id)
@@ -18,6 +18,7 @@ import juicer.spark.ws_operation as ws_operation
 import juicer.spark.validation_operation as validation
 import os
 from juicer import operation
+from juicer.spark.storage import STORAGE_LEVELS, plan_storage
 from juicer.transpiler import Transpiler
 
 
@@ -35,6 +36,13 @@ class SparkTranspiler(Transpiler):
         self.requires_hive_warehouse = False
         self.hive_metadata = None
 
+    def get_context(self):
+        return {'storage_levels': STORAGE_LEVELS}
+
+    def optimize(self, graph, instances):
+        # Data sources are persisted only if reused (see juicer.spark.storage)
+        plan_storage(graph, instances, self.configuration)
+
     def on(self, event, params):
         """ Manage events from Operations during code conversion """
         if event == 'requires-hive':
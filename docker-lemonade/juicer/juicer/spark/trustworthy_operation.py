@@ -138,7 +138,7 @@ class FairnessEvaluationOperation(Operation):
                 html = FairnessBiasReport({out},
                             '{sensitive}', baseline).generate()
                 visualization = {{
-                    'job_id': '{job_id}', 'task_id': '{task_id}',
+                    'job_id': str(get_job_id()), 'task_id': '{task_id}',
                     'title': '{title}',
                     'type': {{'id': 1, 'name': 'HTML'}},
                     'model': HtmlVisualizationModel(title='{title}'),
@@ -171,7 +171,7 @@ class FairnessEvaluationOperation(Operation):
                 # caipirinha_service.new_visualization(
                 #     config,
                 #     {user},
-                #     {workflow_id}, {job_id}, '{task_id}',
+                #     {workflow_id}, get_job_id(), '{task_id}',
                 #     visualization, emit_event)
         """.format(sensitive=self.sensitive[0], label=self.label,
                    baseline=self.baseline, tau=self.tau,
@@ -180,7 +180,6 @@ class FairnessEvaluationOperation(Operation):
                    display_text=display_text,
                    task_id=self.parameters['task_id'],
                    operation_id=self.parameters['operation_id'],
-                   job_id=self.parameters['job_id'],
                    user=self.parameters['user'],
                    workflow_id=self.parameters['workflow_id'],
                    config=get_caipirinha_config(self.config, indentation=16),
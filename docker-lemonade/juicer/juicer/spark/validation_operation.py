@@ -127,7 +127,7 @@ class ValidationReportOperation(Operation):
         document_model = ValidationResultsPageRenderer().render(validation_result)
         html = DefaultJinjaPageView().render(document_model)
         visualization = {{
-            'job_id': '{params['job_id']}',
+            'job_id': str(get_job_id()),
             'task_id': '{params['task_id']}',
             'title': '{title}',
             'type': {{'id': 1}}, #HTML
@@ -137,7 +137,7 @@ class ValidationReportOperation(Operation):
             {config},
             {params['user']},
             {params['workflow_id']}, 
-            {params['job_id']}, 
+            get_job_id(), 
             '{params['task_id']}',
             visualization, emit_event)
         """
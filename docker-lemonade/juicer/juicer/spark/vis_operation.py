@@ -13,6 +13,7 @@ import datetime
 from juicer import auditing
 from juicer.operation import Operation
 from juicer.service import limonero_service
+from juicer.spark import vis_reduction
 from juicer.util import chunks
 from juicer.util import dataframe_util
 from juicer.util.dataframe_util import get_csv_schema
@@ -125,7 +126,7 @@ class PublishVisualizationOperation(Operation):
         for vis_model in visualizations:
             code_lines.append(dedent("""
             visualizations.append({{
-                'job_id': '{job_id}',
+                'job_id': str(get_job_id()),
                 'task_id': {vis_model}.task_id,
                 'title': {vis_model}.title ,
                 'type': {{
@@ -135,20 +136,19 @@ class PublishVisualizationOperation(Operation):
                     {vis_model}.get_data(), cls=enc, ignore_nan=True),
                 'model': {vis_model}
             }})
-            """).format(job_id=self.parameters['job_id'], vis_model=vis_model))
+            """).format(vis_model=vis_model))
 
         # Register this new dashboard with Caipirinha
         code_lines.append(get_caipirinha_config(self.config))
         code_lines.append(dedent("""
             caipirinha_service.new_dashboard(config, '{title}', {user},
                 {workflow_id}, u'{workflow_name}',
-                {job_id}, '{task_id}', visualizations, emit_event)
+                get_job_id(), '{task_id}', visualizations, emit_event)
             """.format(
             title=self.title or '',
             user=self.parameters['user'],
             workflow_id=self.parameters['workflow_id'],
             workflow_name=self.parameters['workflow_name'],
-            job_id=self.parameters['job_id'],
             task_id=self.parameters['task']['id']
         )))
 
@@ -189,14 +189,24 @@ class VisualizationMethodOperation(Operation):
 
     def get_model_parameters(self):
         result = {}
+        # Job related parameters are not included, so the generated code
+        # does not change from one job to another
         invalid = {'configuration', 'export_notebook',
                 'hash', 'transpiler', 'parents',
                 'parents_by_port', 'my_ports', 'audit_events',
-                'task', 'workflow', 'transpiler_utils'}
+                'task', 'workflow', 'transpiler_utils',
+                'job_id', 'execution_date'}
 
         for k, v in list(self.parameters.items()):
             if k not in invalid and not isinstance(v, (set,)):
                 result[k] = v
+
+        # Limit of rows collected by the model (see vis_reduction)
+        vis_config = (self.config or {}).get('juicer', {}).get(
+            'visualization') or {}
+        if vis_reduction.MAX_ROWS_PARAM in vis_config:
+            result.setdefault(vis_reduction.MAX_ROWS_PARAM,
+                              vis_config[vis_reduction.MAX_ROWS_PARAM])
         return result
 
     def get_output_names(self, sep=','):
@@ -238,7 +248,7 @@ class VisualizationMethodOperation(Operation):
             code_lines.append(get_caipirinha_config(self.config))
             code_lines.append(dedent("""
             visualization = {{
-                'job_id': '{job_id}',
+                'job_id': str(get_job_id()),
                 'task_id': {out}.task_id,
                 'title': {out}.title ,
                 'type': {{
@@ -246,19 +256,17 @@ class VisualizationMethodOperation(Operation):
                 }},
                 'model': {out},
                 'data': json.dumps({out}.get_data(), cls=enc, ignore_nan=True),
-            }}""").format(job_id=self.parameters['job_id'],
-                          out=self.output))
+            }}""").format(out=self.output))
 
             code_lines.append(dedent("""
             caipirinha_service.new_visualization(
                 config,
                 {user},
-                {workflow_id}, {job_id}, '{task_id}',
+                {workflow_id}, get_job_id(), '{task_id}',
                 visualization, emit_event)
             """.format(
                 user=self.parameters['user'],
                 workflow_id=self.parameters['workflow_id'],
-                job_id=self.parameters['job_id'],
                 task_id=self.parameters['task']['id']
             )))
         return '\n'.join(code_lines)
@@ -576,7 +584,10 @@ class BarChartModel(ChartVisualization):
 
         colors_palette = self.params.get('color_palette') or []
 
-        rows = self.data.collect()
+        rows = vis_reduction.collect(
+            self.data, vis_reduction.get_max_rows(self.params),
+            vis_reduction.aggregate_categories, x_attr.name,
+            [attr.name for attr in y_attrs])
 
         colors = {}
         color_counter = 0
@@ -676,6 +687,7 @@ class PieChartModel(ChartVisualization):
     """
     In PieChartModel, x_attr contains the label and y_attrs[0] contains values 
     """
+    MAX_VALUES = 100
 
     def __init__(self, data, task_id, type_id, type_name, title, column_names,
                  orientation, id_attribute, value_attribute, params):
@@ -718,7 +730,12 @@ class PieChartModel(ChartVisualization):
         # @FIXME Spark 2.2.0 is raising an exception if self.data.collect()
         # is called directly when the output port is used multiple times.
         self.data.count()
-        rows = self.data.collect()
+        max_rows = vis_reduction.get_max_rows(self.params)
+        if max_rows:
+            max_rows = min(max_rows, self.MAX_VALUES)
+        rows = vis_reduction.collect(
+            self.data, max_rows, vis_reduction.top_with_others,
+            label_attr.name, value_attr.name)
         result = self._get_title_legend_tooltip()
         result['legend']['isVisible'] = self.params.get('legend') in TRUE_VALS
 
@@ -750,7 +767,7 @@ class PieChartModel(ChartVisualization):
                 'color': COLORS_PALETTE[(i % 6) * 5 + ((i // 6) % 5)],
             }
             result['data'].append(data)
-            if i >= 100:
+            if i >= self.MAX_VALUES:
                 raise ValueError(
                     _('The maximum number of values for this chart is 100.'))
         return result
@@ -769,7 +786,10 @@ class LineChartModel(ChartVisualization):
     def get_data(self):
         x_attr, x_type, y_attrs = self._get_axis_info()
 
-        rows = self.data.collect()
+        rows = vis_reduction.collect(
+            self.data, vis_reduction.get_max_rows(self.params),
+            vis_reduction.downsample_series, x_attr.name,
+            [attr.name for attr in y_attrs])
 
         data = []
         for i, attr in enumerate(y_attrs):
@@ -832,7 +852,6 @@ class MapModel(ChartVisualization):
     def get_data(self):
         result = {}
         result.update(self._get_title_legend_tooltip())
-        rows = self.data.collect()
 
         if self.params.get('value'):
             value_attr = next((c for c in self.data.schema if
@@ -862,9 +881,25 @@ class MapModel(ChartVisualization):
         lng = self.params.get('longitude', [None])[0]
         label = self.params.get('label', [None])[0]
 
+        # Large data: heatmaps are binned in a grid (weighted by the number
+        # of points if there is no value), points are sampled
+        max_rows = vis_reduction.get_max_rows(self.params)
+        if param_map_type == 'heatmap' and lat and lng:
+            rows = vis_reduction.collect(
+                self.data, max_rows, vis_reduction.grid_aggregate, lat, lng,
+                (self.params.get('value') or [None])[0], label)
+        elif param_map_type == 'points':
+            rows = vis_reduction.collect(self.data, max_rows,
+                                         vis_reduction.sample)
+        else:
+            rows = vis_reduction.collect(self.data, max_rows,
+                                         lambda df, limit: df)
+
         for i, row in enumerate(rows):
             if self.params.get('value'):
                 value = row[self.params.get('value')[0]]
+            elif vis_reduction.COUNT_COLUMN in row.__fields__:
+                value = row[vis_reduction.COUNT_COLUMN]
             else:
                 value = 0
             if param_map_type == 'polygon':
@@ -958,7 +993,9 @@ class ScatterPlotModel(ChartVisualization):
                 "values": []
             }
 
-        rows = self.data.collect()
+        rows = vis_reduction.collect(
+            self.data, vis_reduction.get_max_rows(self.params),
+            vis_reduction.sample, series_attr.name if series_attr else None)
         current_color = 0
         for row in rows:
             if series_attr:
@@ -1449,7 +1486,8 @@ class IndicatorModel(ChartVisualization):
 
     def get_data(self):
 
-        data = self.to_pandas()
+        # Only the first row is used
+        data = self.data.limit(1).toPandas()
 
         displays =[]
         number = True
@@ -1526,8 +1564,6 @@ class BubbleChartModel(ChartVisualization):
     COLOR_PALETTE_PARAM = 'color_palette'
 
     def get_data(self):
-        data = self.to_pandas()
-
         x_name = self.params.get(self.X_AXIS_ATTRIBUTE_PARAM)
         if x_name is None or len(x_name) == 0:
             raise ValueError(
@@ -1569,7 +1605,10 @@ class BubbleChartModel(ChartVisualization):
         palette = self.params.get(self.COLOR_PALETTE_PARAM, COLORS_PALETTE)
         color_map = {}
 
-        for index, row in data.iterrows():
+        rows = vis_reduction.collect(
+            self.data, vis_reduction.get_max_rows(self.params),
+            vis_reduction.sample, color_name)
+        for row in rows:
             x.append(row[x_name])
             y.append(row[y_name])
             s.append(row[size_name])
@@ -1618,6 +1657,9 @@ class HeatmapModel(ChartVisualization):
             df = self.data.groupBy(*group).agg(
                     f(functions.lit(attr)).alias('tmp_value'))
 
+        max_rows = vis_reduction.get_max_rows(self.params)
+        if max_rows:
+            df = df.limit(max_rows)
         return df.toPandas()
 
     def get_data(self):
@@ -1712,12 +1754,15 @@ class TreemapModel(ChartVisualization):
             value_name = value_name[0]
 
 
-        data = self.data.toPandas()
+        rows = vis_reduction.collect(
+            self.data, vis_reduction.get_max_rows(self.params),
+            vis_reduction.top_with_others_by_parent, label, parent,
+            value_name)
         labels, parents, values, colors = [], [], [], []
         
         palette = self.params.get(self.COLOR_PALETTE_PARAM)
 
-        for index, row in data.iterrows():
+        for index, row in enumerate(rows):
             labels.append(row[label])
             parents.append(row[parent])
             values.append(row[value_name])
@@ -0,0 +1,240 @@
+# coding=utf-8
+"""
+Data reduction for visualizations. Data used by charts is grouped, binned or
+sampled in Spark before being collected by the driver, so at most max_rows
+rows (parameter max_rows of the visualization or juicer.visualization.max_rows
+in configuration, 0 disables the limit) are collected. Data smaller than the
+limit is collected unchanged.
+"""
+import math
+
+MAX_ROWS_PARAM = 'max_rows'
+DEFAULT_MAX_ROWS = 5000
+
+# Number of points aggregated in a cell of a map (grid_aggregate)
+COUNT_COLUMN = 'vis_count'
+
+NUMERIC_TYPES = ('byte', 'short', 'integer', 'long', 'float', 'double',
+                 'decimal')
+TIME_TYPES = ('date', 'timestamp')
+
+
+def get_max_rows(params):
+    value = (params or {}).get(MAX_ROWS_PARAM)
+    if value is None or value == '':
+        return DEFAULT_MAX_ROWS
+    return int(value)
+
+
+def collect(df, max_rows, reduce_function, *args):
+    """
+    Collects data if it has at most max_rows rows. Otherwise, data is reduced
+    by reduce_function(df, max_rows, *args) (executed in Spark) and at most
+    max_rows of the result are collected.
+    """
+    if not max_rows:
+        return df.collect()
+    rows = df.limit(max_rows + 1).collect()
+    if len(rows) <= max_rows:
+        return rows
+    return reduce_function(df, max_rows, *args).limit(max_rows).collect()
+
+
+def _get_type_name(df, attr):
+    return next(f.dataType.typeName() for f in df.schema.fields
+                if f.name == attr)
+
+
+def aggregate_categories(df, max_rows, x, y_names):
+    """
+    Groups rows by x (bar charts), summing numeric attributes. The groups
+    with the largest values of the first attribute are kept.
+    """
+    from pyspark.sql import functions
+    aggregations = []
+    for y in y_names:
+        if _get_type_name(df, y) in NUMERIC_TYPES:
+            aggregations.append(functions.sum(y).alias(y))
+        else:
+            aggregations.append(functions.first(y).alias(y))
+    return df.groupBy(x).agg(*aggregations).orderBy(
+        functions.desc(y_names[0])).limit(max_rows)
+
+
+def top_with_others(df, max_rows, label, value):
+    """
+    Sums values by label (pie charts), keeping the max_rows - 1 largest
+    ones. The remaining labels are summed up as a single one (Others).
+    """
+    from pyspark.sql import functions
+    grouped = df.groupBy(functions.col(label).cast('string').alias(
+        label)).agg(functions.sum(value).alias(value))
+    # Ties are ordered by label, so top is the same when joined (others)
+    top = grouped.orderBy(functions.desc(value), label).limit(
+        max(1, max_rows - 1))
+    others = grouped.join(top.select(label), label, 'left_anti').agg(
+        functions.sum(value).alias(value)).where(
+        functions.col(value).isNotNull()).select(
+        functions.lit(_('Others')).alias(label), value)
+    return top.union(others)
+
+
+def top_with_others_by_parent(df, max_rows, label, parent, value):
+    """
+    Reduces a hierarchy (treemaps): nodes that are parents are kept, as well
+    as the largest leaves. Other leaves are summed up as a single one (Others)
+    for each parent, so totals of parents do not change.
+    """
+    from pyspark.sql import functions
+    label_col = functions.col(label).cast('string').alias(label)
+    parent_col = functions.col(parent).cast('string').alias(parent)
+    grouped = df.groupBy(parent_col, label_col).agg(
+        functions.sum(value).alias(value))
+    parents = grouped.select(functions.col(parent).alias(label)).distinct()
+
+    internal = grouped.join(parents, label, 'left_semi')
+    leaves = grouped.join(parents, label, 'left_anti')
+    top = leaves.orderBy(functions.desc(value), parent, label).limit(
+        max_rows // 2 or 1)
+    others = leaves.join(top.select(parent, label), [parent, label],
+                         'left_anti').groupBy(parent).agg(
+        functions.sum(value).alias(value)).select(
+        parent, functions.concat(
+            functions.lit(_('Others') + ' ('), functions.col(parent),
+            functions.lit(')')).alias(label), value)
+
+    columns = [parent, label, value]
+    return internal.select(columns).union(top.select(columns)).union(
+        others.select(columns))
+
+
+def downsample_series(df, max_rows, x, y_names):
+    """
+    Downsamples series (line and area charts) using M4: the range of x is
+    split in buckets and, for each one, the first and last rows and the rows
+    with min and max values of each series are kept. The shape of the
+    series (peaks, gaps) is preserved. Data is ordered by x.
+    """
+    from pyspark.sql import functions, Window
+
+    type_name = _get_type_name(df, x)
+    if type_name in TIME_TYPES:
+        x_value = functions.col(x).cast('timestamp').cast('long')
+    elif type_name in NUMERIC_TYPES:
+        x_value = functions.col(x).cast('double')
+    else:
+        return sample(df, max_rows)
+
+    lower, upper = df.agg(functions.min(x_value),
+                          functions.max(x_value)).first()
+    if lower is None:
+        return df
+    lower, upper = float(lower), float(upper)
+    buckets = max(1, max_rows // (2 + 2 * len(y_names)))
+    width = (upper - lower) / buckets or 1.0
+
+    bucket = '_vis_bucket'
+    ranked = df.withColumn(bucket, functions.least(
+        functions.floor((x_value - lower) / width),
+        functions.lit(buckets - 1)))
+    orders = [functions.col(x).asc_nulls_last(),
+              functions.col(x).desc_nulls_last()]
+    for y in y_names:
+        orders.extend([functions.col(y).asc_nulls_last(),
+                       functions.col(y).desc_nulls_last()])
+    ranks = []
+    for i, order in enumerate(orders):
+        rank = '_vis_rank_{}'.format(i)
+        ranked = ranked.withColumn(rank, functions.row_number().over(
+            Window.partitionBy(bucket).orderBy(order)))
+        ranks.append(functions.col(rank) == 1)
+
+    condition = ranks[0]
+    for rank in ranks[1:]:
+        condition = condition | rank
+    return ranked.where(condition).orderBy(x).select(df.columns)
+
+
+def sample(df, max_rows, strata=None, seed=0):
+    """
+    Random sample of about max_rows rows (scatter plots). If strata is
+    informed, half of the sample is shared equally by its values (series),
+    so small series are kept.
+    """
+    from pyspark.sql import functions
+    if strata is None:
+        total = df.count()
+        return df.sample(False, min(1.0, float(max_rows) / (total or 1)),
+                         seed)
+
+    counts = df.groupBy(strata).count().limit(max_rows + 1).collect()
+    if len(counts) > max_rows:
+        return sample(df, max_rows, seed=seed)
+    total = sum(row['count'] for row in counts)
+    fraction = 0.5 * max_rows / total
+    per_stratum = 0.5 * max_rows / len(counts)
+
+    fractions = {}
+    null_fraction = fraction
+    for value, count in counts:
+        stratum_fraction = min(1.0, max(fraction, per_stratum / count))
+        if value is None:
+            null_fraction = stratum_fraction
+        else:
+            fractions[value] = stratum_fraction
+
+    row_fraction = functions.lit(fraction)
+    if fractions:
+        lookup = functions.create_map(*[
+            functions.lit(v) for pair in fractions.items() for v in pair])
+        row_fraction = functions.coalesce(lookup[functions.col(strata)],
+                                          row_fraction)
+    row_fraction = functions.when(
+        functions.col(strata).isNull(), null_fraction).otherwise(
+        row_fraction)
+    return df.where(functions.rand(seed) < row_fraction)
+
+
+def grid_aggregate(df, max_rows, lat, lon, value=None, label=None):
+    """
+    Bins points (maps) in a regular grid with at most max_rows cells. Each
+    cell is represented by its center, the sum of values and the number of
+    points (COUNT_COLUMN).
+    """
+    from pyspark.sql import functions
+
+    bounds = df.agg(functions.min(lat), functions.max(lat),
+                    functions.min(lon), functions.max(lon)).first()
+    if bounds[0] is None or bounds[2] is None:
+        # No coordinates: same (empty) result, without running other jobs
+        df = df.limit(0)
+        bounds = [0.0] * 4
+    bounds = [float(b) for b in bounds]
+    cells = max(1, int(math.sqrt(max_rows)))
+    lat_size = (bounds[1] - bounds[0]) / cells or 1.0
+    lon_size = (bounds[3] - bounds[2]) / cells or 1.0
+
+    lat_cell = functions.least(
+        functions.floor((functions.col(lat) - bounds[0]) / lat_size),
+        functions.lit(cells - 1))
+    lon_cell = functions.least(
+        functions.floor((functions.col(lon) - bounds[2]) / lon_size),
+        functions.lit(cells - 1))
+
+    aggregations = [functions.count('*').alias(COUNT_COLUMN)]
+    if value:
+        aggregations.append(functions.sum(value).alias(value))
+    grouped = df.where(functions.col(lat).isNotNull() & functions.col(
+        lon).isNotNull()).groupBy(lat_cell.alias('_vis_lat'),
+                                  lon_cell.alias('_vis_lon')).agg(
+        *aggregations)
+
+    columns = [
+        ((functions.col('_vis_lat') + 0.5) * lat_size + bounds[0]).alias(lat),
+        ((functions.col('_vis_lon') + 0.5) * lon_size + bounds[2]).alias(lon),
+        COUNT_COLUMN]
+    if value:
+        columns.append(value)
+    if label and label not in (lat, lon, value):
+        columns.append(functions.lit(None).cast('string').alias(label))
+    return grouped.select(columns)
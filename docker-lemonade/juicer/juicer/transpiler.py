@@ -3,12 +3,14 @@
 
 import autopep8
 import datetime
+import functools
 import hashlib
 import inspect
 import jinja2
 import json
 import logging
 import networkx as nx
+import os
 import redis
 import sys
 import uuid
@@ -27,6 +29,40 @@ AUDITING_JOB_NAME = 'seed.jobs.auditing'
 
 log = logging.getLogger(__name__)
 
+# Jinja2 environments are shared by all transpilers in the process, keeping
+# the compiled templates between jobs (see get_template_environment()).
+_template_environments = {}
+
+
+def get_template_environment(template_dir, bytecode_cache_dir=None):
+    """
+    Returns the Jinja2 environment used to render the templates in
+    template_dir. It is created once per process. If bytecode_cache_dir is
+    informed, compiled templates are also stored in disk and new processes
+    (e.g. minions) do not need to compile them again.
+    """
+    key = (template_dir, bytecode_cache_dir)
+    template_env = _template_environments.get(key)
+    if template_env is None:
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
+        template_env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(searchpath=template_dir),
+            extensions=[AutoPep8Extension, HandleExceptionExtension,
+                        'jinja2.ext.do'],
+            bytecode_cache=bytecode_cache)
+        template_env.globals.update(zip=zip)
+        _template_environments[key] = template_env
+    return template_env
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_template(template):
+    """ Compiles a template used by operations only once per process """
+    return jinja2.Template(template)
+
 
 class DependencyController(object):
     """ Evaluates if a dependency is met when generating code. """
@@ -50,6 +86,10 @@ class Transpiler(object):
     """
     VISITORS = []
     DATA_SOURCE_OPS = ['data-reader']
+    # Form categories whose values change the result of a task
+    HASHED_FORM_CATEGORIES = ('execution', 'paramgrid', 'param grid',
+                              'execution logging', 'logging', 'save',
+                              'transformation')
     __slots__ = (
         'configuration', 'current_task_id', 'operations', 'port_id_to_port',
         'slug_to_op_id', 'template_dir', 'sample_size', 'verbosity'
@@ -95,10 +135,16 @@ class Transpiler(object):
     def get_meta_template(self):
         return "templates/meta.tmpl"
 
+    def get_template_env(self):
+        transpiler_config = self.configuration.get('juicer', {}).get(
+            'transpiler') or {}
+        return get_template_environment(
+            self.template_dir, transpiler_config.get('bytecode_cache_dir'))
+
     def get_audit_info(self, graph, workflow, task, parameters):
         result = []
         task['ancestors'] = list(nx.ancestors(graph, task['id']))
-        ancestors = [graph.node[task_id] for task_id in task['ancestors']]
+        ancestors = [graph.nodes[task_id] for task_id in task['ancestors']]
         ancestors_data_source = [int(p['forms']['data_source'].get('value', 0))
                                  for p in ancestors if p['is_data_source']]
 
@@ -136,9 +182,9 @@ class Transpiler(object):
         return result
 
     def generate_code(self, graph, job_id, out, params, ports,
-                      sorted_tasks_id, state, task_hash, using_stdout,
+                      sorted_tasks_id, state, using_stdout,
                       workflow, deploy=False, export_notebook=False,
-                      plain=False, persist=True):
+                      plain=False, persist=True, format_code=None):
         if deploy:
             # To be able to convert, workflow must obey all these rules:
             # - 1 and exactly 1 data source;
@@ -162,13 +208,15 @@ class Transpiler(object):
 
         instances = OrderedDict()
         transpiler_utils = TranspilerUtils(self)
+        # Computed before the loop, because it changes the task forms
+        task_hashes = self._get_task_hashes(graph)
 
         audit_events = []
         for i, task_id in enumerate(tasks_ids):
-            if task_id not in graph.node:
+            if task_id not in graph.nodes:
                 continue
-            task = graph.node[task_id]['attr_dict']
-            task['parents'] = graph.node[task_id]['parents']
+            task = graph.nodes[task_id]['attr_dict']
+            task['parents'] = graph.nodes[task_id]['parents']
             self.current_task_id = task_id
 
             class_name = self.operations[task['operation']['slug']]
@@ -186,13 +234,9 @@ class Transpiler(object):
                 cat = 'paramgrid' if cat == 'param grid' else cat
                 cat = 'logging' if cat == 'execution logging' else cat
 
-                if all([cat in ["execution", 'paramgrid', 'param grid',
-                                'execution logging', 'logging', 'save',
-                                'transformation'],
+                if all([cat in self.HASHED_FORM_CATEGORIES,
                         definition['value'] is not None]):
 
-                    task_hash.update(str(definition['value']).encode(
-                        'utf8', errors='ignore'))
                     if cat in ['paramgrid', 'logging']:
                         if cat not in parameters:
                             parameters[cat] = {}
@@ -225,9 +269,9 @@ class Transpiler(object):
                     'value') in true_values,
                 'display_schema': task['forms'].get('display_schema', {}).get(
                     'value') in true_values,
-                # Hash is used in order to avoid re-run task.
                 'export_notebook': export_notebook,
-                'hash': task_hash.hexdigest(),
+                # Hash is used in order to avoid re-run task.
+                'hash': task_hashes[task_id],
                 'job_id': job_id,
                 'operation_id': task['operation']['id'],
                 'operation_slug': task['operation']['slug'],
@@ -256,7 +300,7 @@ class Transpiler(object):
             instance = class_name(parameters, port.get('named_inputs', {}),
                                   port.get('named_outputs', {}))
 
-            graph.node[task['id']]['is_data_source'] = instance.is_data_source
+            graph.nodes[task['id']]['is_data_source'] = instance.is_data_source
             parameters['audit_events'] = instance.get_audit_events()
 
             if self.configuration['juicer'].get('auditing', False):
@@ -266,6 +310,13 @@ class Transpiler(object):
             instance.out_degree = graph.out_degree(task_id)
             instances[task['id']] = instance
 
+            # Key used by the durable result cache: it changes if the task
+            # or any data source in its lineage changes.
+            parameters['cache_key'] = self._get_cache_key(
+                graph, task_id, instances, parameters['hash'])
+
+        self.optimize(graph, instances)
+
         if audit_events:
 
             redis_url = self.configuration['juicer']['servers']['redis_url']
@@ -308,13 +359,16 @@ class Transpiler(object):
         }
         env_setup.update(self.get_context())
 
-        template_loader = jinja2.FileSystemLoader(
-            searchpath=self.template_dir)
-        template_env = jinja2.Environment(loader=template_loader,
-                                          extensions=[AutoPep8Extension,
-                                                      HandleExceptionExtension,
-                                                      'jinja2.ext.do'])
-        template_env.globals.update(zip=zip)
+        if format_code is None:
+            # Code that is only executed (it is not saved in Stand, exported
+            # or deployed) does not need to be formatted by autopep8.
+            transpiler_config = self.configuration.get('juicer', {}).get(
+                'transpiler') or {}
+            format_code = (deploy or export_notebook or plain or (
+                persist and transpiler_config.get('format_code', True)))
+        env_setup['format_code'] = format_code
+
+        template_env = self.get_template_env()
 
         if deploy:
             env_setup['slug_to_op_id'] = self.slug_to_op_id
@@ -351,10 +405,65 @@ class Transpiler(object):
                 except Exception as ex:
                     log.exception(str(ex))
 
+    # noinspection PyMethodMayBeStatic,PyUnusedLocal
+    def optimize(self, graph, instances):
+        """
+        Optimizations using the whole workflow (e.g. pushing projections down
+        to data sources), applied after all operations are created and before
+        code is generated. Platform specific.
+        """
+        pass
+
+    @staticmethod
+    def _get_task_hashes(graph):
+        """
+        Computes a Merkle-like hash for each task, using its operation,
+        its parameters and the hashes of its parents (and the ports
+        connecting them). Thus, changing a task only changes its hash and
+        the hashes of its descendants, i.e. only the affected sub-graph is
+        executed again when results are cached.
+        """
+        hashes = {}
+        for task_id in nx.topological_sort(graph):
+            task = graph.nodes[task_id]['attr_dict']
+            task_hash = hashlib.sha1(
+                task['operation']['slug'].encode('utf8'))
+            for name, definition in sorted(task['forms'].items()):
+                cat = (definition.get('category') or 'execution').lower()
+                if cat in Transpiler.HASHED_FORM_CATEGORIES and \
+                        definition.get('value') is not None:
+                    task_hash.update('{}={}'.format(
+                        name, definition['value']).encode(
+                        'utf8', errors='ignore'))
+            parents = sorted(
+                (flow['attr_dict'].get('target_port_name', ''),
+                 hashes[source_id],
+                 flow['attr_dict'].get('source_port_name', ''))
+                for source_id, _, flow in graph.in_edges(task_id, data=True))
+            for parent in parents:
+                task_hash.update(':'.join(parent).encode('utf8'))
+            hashes[task_id] = task_hash.hexdigest()
+        return hashes
+
+    # noinspection PyMethodMayBeStatic
+    def _get_cache_key(self, graph, task_id, instances, task_hash):
+        versions = sorted(
+            str(instances[ancestor_id].get_data_source_version())
+            for ancestor_id in nx.ancestors(graph, task_id)
+            if ancestor_id in instances)
+        cache_key = hashlib.sha1(task_hash.encode('utf8'))
+        for version in versions:
+            cache_key.update(version.encode('utf8', errors='ignore'))
+        return cache_key.hexdigest()
+
     def transpile(self, workflow, graph, params, out=None, job_id=None,
                   state=None, deploy=False, export_notebook=False, plain=False, 
-                  persist=True):
-        """ Transpile the tasks from Lemonade's workflow into code """
+                  persist=True, format_code=None):
+        """
+        Transpile the tasks from Lemonade's workflow into code.
+        If format_code is None, generated code is formatted (autopep8) only if
+        it is persisted, exported or deployed.
+        """
 
         using_stdout = out is None
         if using_stdout:
@@ -368,8 +477,8 @@ class Transpiler(object):
 
         for edge_key in list(graph.edges.keys()):
             source_id, target_id, index = edge_key
-            source_name = graph.node[source_id]['name']
-            source_slug = graph.node[source_id]['operation']['slug']
+            source_name = graph.nodes[source_id]['name']
+            source_slug = graph.nodes[source_id]['operation']['slug']
             flow = graph.edges[edge_key]['attr_dict']
             flow_id = '[{}:{}]'.format(source_id, flow['source_port'], )
 
@@ -431,10 +540,9 @@ class Transpiler(object):
 
         self.generate_code(graph, job_id, out, params,
                            ports, sorted_tasks_ids, state,
-                           hashlib.sha1(),
                            using_stdout, workflow, deploy, export_notebook,
                            plain=plain,
-                           persist=persist)
+                           persist=persist, format_code=format_code)
 
     def get_data_sources(self, workflow):
         return len(
@@ -613,5 +721,5 @@ class TranspilerUtils(object):
         """
         Render a Jinja2 template using the information provided by context.
         """
-        tm = jinja2.Template(template)
+        tm = _compile_template(template)
         return tm.render(**context)
@@ -7,7 +7,11 @@ import json
 import datetime
 
 import re
+import logging
 import simplejson
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from six import text_type
 from collections.abc import Sequence
 import collections
@@ -206,15 +210,174 @@ def old_emit_schema_sklearn(task_id, df, emit_event, name, notebook=False):
                type='HTML', title=_('Schema for {}').format(name),
                task={'id': task_id})
 
+ARROW_CONFIGS = ['spark.sql.execution.arrow.enabled',  # Spark 2.x
+                 'spark.sql.execution.arrow.pyspark.enabled']
+# Spark integral types (DataType.typeName())
+INTEGRAL_TYPES = ['byte', 'short', 'integer', 'long']
+
+log = logging.getLogger(__name__)
+
+
+@contextmanager
+def _arrow_enabled(df):
+    """
+    Enables Arrow in toPandas while the block runs, unless it was disabled in
+    configuration. Session configuration is restored afterwards.
+    """
+    conf = df.sql_ctx.sparkSession.conf
+    unset = [key for key in ARROW_CONFIGS if conf.get(key, None) is None]
+    for key in unset:
+        conf.set(key, 'true')
+    try:
+        yield
+    finally:
+        for key in unset:
+            conf.unset(key)
+
+
+def _fetch_rows(df, size):
+    """
+    First rows of a Spark data frame, transferred as Arrow batches (toPandas)
+    instead of being serialized row by row. Types not supported by Arrow
+    fall back to collect().
+    """
+    try:
+        with _arrow_enabled(df):
+            pdf = df.limit(size).toPandas()
+    except Exception:
+        return [tuple(r) for r in df.limit(size).collect()]
+
+    # Same values returned by collect(): None for nulls and lists for arrays
+    pdf = pdf.astype(object).where(pdf.notnull(), None)
+    # Integral columns with nulls are converted to float by Arrow
+    integral = [i for i, field in enumerate(df.schema.fields)
+                if field.dataType.typeName() in INTEGRAL_TYPES]
+    rows = []
+    for row in pdf.itertuples(index=False, name=None):
+        values = [v.tolist() if hasattr(v, 'tolist') else v for v in row]
+        for i in integral:
+            if values[i] is not None:
+                values[i] = int(values[i])
+        rows.append(tuple(values))
+    return rows
+
+
+class SampleCache(object):
+    """
+    Samples (first rows) of data frames produced by Spark tasks, by task and
+    port. Rows are kept in memory, so pages requested later (e.g. more data
+    messages) are served without running Spark jobs again. If a page is not
+    fetched yet, the sample grows (at least doubles) up to max_rows.
+    Fetches can run in a background thread (submit), out of the critical
+    path of tasks. Pages requested later run in another thread
+    (submit_page), so they do not wait for samples being fetched.
+    """
+    SAMPLES = 'samples'
+    PAGES = 'pages'
+
+    def __init__(self, max_rows=1000, max_entries=200):
+        self.max_rows = max_rows
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+        self._executors = {}
+
+    def _get_entry(self, task_id, port, df):
+        key = (task_id, port)
+        entry = self._entries.pop(key, None)
+        if entry is None or (df is not None and entry['df'] is not df):
+            if df is None:
+                raise KeyError(key)
+            # New (or recomputed) output, previous rows are not valid
+            entry = {'df': df, 'rows': [], 'complete': False,
+                     'lock': threading.Lock()}
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def get_page(self, task_id, port, df=None, offset=0, size=50):
+        """
+        Rows in [offset, offset + size) of the output of the task in port.
+        df is required the first time a task output is sampled.
+        Returns the rows and whether there are more rows in the sample.
+        """
+        with self._lock:
+            entry = self._get_entry(task_id, port, df)
+        # Only requests for the same output wait for its rows being fetched
+        with entry['lock']:
+            end = min(offset + size, self.max_rows)
+            if len(entry['rows']) < end and not entry['complete']:
+                count = min(max(end, 2 * len(entry['rows'])), self.max_rows)
+                entry['rows'] = _fetch_rows(entry['df'], count)
+                entry['complete'] = len(entry['rows']) < count
+            rows = entry['rows'][offset:end]
+            more = len(entry['rows']) > end or (
+                not entry['complete'] and end < self.max_rows)
+            return rows, more
+
+    def submit(self, fn, *args, **kwargs):
+        """ Runs fn (e.g. emit_sample) in the background thread """
+        return self._submit(self.SAMPLES, fn, args, kwargs)
+
+    def submit_page(self, fn, *args, **kwargs):
+        """ Runs fn (e.g. a more data request) in the pages thread """
+        return self._submit(self.PAGES, fn, args, kwargs)
+
+    def _submit(self, name, fn, args, kwargs):
+        with self._lock:
+            if name not in self._executors:
+                self._executors[name] = ThreadPoolExecutor(max_workers=1)
+            future = self._executors[name].submit(fn, *args, **kwargs)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            log.error(_('Unable to process data sample'),
+                      exc_info=future.exception())
+
+    def shutdown(self):
+        """
+        Waits for background fetches (they use the Spark session, so it must
+        be called before stopping it) and removes all samples.
+        """
+        with self._lock:
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=True)
+        self.clear()
+
+    def clear(self, task_id=None):
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if task_id is None or key[0] == task_id:
+                    del self._entries[key]
+
+
+sample_cache = SampleCache()
+
+
 def emit_sample(task_id, df, emit_event, name, size=50, notebook=False,
-                title=None):
+                title=None, asynchronous=False):
+    """
+    Emits the first rows of a data frame. Rows are kept in sample_cache (by
+    task and name), so they are reused by more data requests. If
+    asynchronous, rows are fetched and emitted in background.
+    """
+    if asynchronous:
+        return sample_cache.submit(emit_sample, task_id, df, emit_event,
+                                   name, size, notebook, title)
+
     from juicer.spark.reports import SimpleTableReport
     headers = [f.name for f in df.schema.fields]
 
     number_types = (int, float, decimal.Decimal)
 
     rows = []
-    for row in df.take(size):
+    sample, _more = sample_cache.get_page(task_id, name, df, size=size)
+    for row in sample:
         new_row = []
         rows.append(new_row)
         for col in row:
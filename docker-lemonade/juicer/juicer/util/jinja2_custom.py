@@ -18,11 +18,14 @@ class AutoPep8Extension(Extension):
         lineno = next(parser.stream).lineno
 
         body = parser.parse_statements(['name:endautopep8'], drop_needle=True)
-        args = []
+        # Formatting can be disabled when rendering (see format_code)
+        args = [nodes.ContextReference()]
         result = nodes.CallBlock(self.call_method('_format_support', args),
                                  [], [], body).set_lineno(lineno)
         return result
 
     @staticmethod
-    def _format_support(caller):
-        return autopep8.fix_code(caller(), options={'aggressive': 1})
\ No newline at end of file
+    def _format_support(context, caller):
+        if not context.get('format_code', True):
+            return caller()
+        return autopep8.fix_code(caller(), options={'aggressive': 1})
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Durable (persistent) cache for task results.
+
+Results of a task (its output DataFrames) are materialized as Parquet files
+and indexed in Redis by a content-addressed key, computed by the transpiler
+from the task hash and the version of the data sources in its lineage (see
+Transpiler.generate_code). Thus, they survive minion termination and are
+shared by all minions using the same storage.
+
+Configuration (juicer.result_cache):
+
+    result_cache:
+        enabled: true
+        storage_url: file:///srv/lemonade/cache   # hdfs:// for Spark only
+        max_size: 10737418240                      # bytes, LRU eviction
+        min_task_time: 1.0                         # do not store fast tasks
+        deletion_grace_period: 3600                # seconds (Spark)
+
+Spark data frames are lazy: the time of a task only includes building its
+plan, so the time to materialize (write) results is also considered. Files of
+evicted Spark results may still be read by data frames returned to other jobs
+(or minions), so they are deleted only after a grace period.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import redis
+from juicer.runner import configuration
+
+log = logging.getLogger(__name__)
+
+META_KEYS = ('execution_date', 'task_name', 'time')
+
+_caches = {}
+# Job being executed by the minion, for each platform. Generated code does
+# not include the job id, so it can be reused by other jobs.
+_current_jobs = {}
+
+
+class PandasResultStorage:
+    """ Stores Pandas (or compatible API, like Modin) data frames. """
+    # Data is read into memory, files are not used after read()
+    lazy = False
+
+    def __init__(self, pandas_module):
+        self.pd = pandas_module
+
+    def is_data_frame(self, obj):
+        return isinstance(obj, self.pd.DataFrame)
+
+    @staticmethod
+    def _path(url):
+        return urlparse(url).path
+
+    def supports(self, url):
+        return urlparse(url).scheme in ('', 'file')
+
+    def write(self, df, url):
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path)
+
+    def read(self, url):
+        return self.pd.read_parquet(self._path(url))
+
+    def delete(self, url):
+        path = self._path(url)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def size(self, url):
+        return os.path.getsize(self._path(url))
+
+
+class SparkResultStorage:
+    """ Stores Spark data frames in any file system supported by Hadoop. """
+    # Data frames are computed (and files read) only when used
+    lazy = True
+
+    def __init__(self, spark_session):
+        self.spark_session = spark_session
+
+    def is_data_frame(self, obj):
+        from pyspark.sql import DataFrame
+        return isinstance(obj, DataFrame)
+
+    # noinspection PyMethodMayBeStatic
+    def supports(self, url):
+        return True
+
+    def write(self, df, url):
+        df.write.mode('overwrite').parquet(url)
+
+    def read(self, url):
+        return self.spark_session.read.parquet(url)
+
+    # noinspection PyProtectedMember
+    def _get_fs_and_path(self, url):
+        jvm = self.spark_session._jvm
+        path = jvm.org.apache.hadoop.fs.Path(url)
+        conf = self.spark_session._jsc.hadoopConfiguration()
+        return path.getFileSystem(conf), path
+
+    def delete(self, url):
+        fs, path = self._get_fs_and_path(url)
+        fs.delete(path, True)
+
+    def size(self, url):
+        fs, path = self._get_fs_and_path(url)
+        return fs.getContentSummary(path).getLength()
+
+
+class ResultCache:
+    """
+    Index of persistent results, shared by minions through Redis.
+    For each platform, an entry (a JSON with the url of each output port) is
+    stored in a hash and a sorted set keeps the last access time, used to
+    evict the least recently used entries when the cache is full.
+    """
+    ENTRIES_KEY = 'result_cache_{}_entries'
+    LRU_KEY = 'result_cache_{}_lru'
+    SIZE_KEY = 'result_cache_{}_size'
+    # Urls of removed results (lazy storages), scored by deletion time
+    TRASH_KEY = 'result_cache_{}_trash'
+
+    def __init__(self, platform, redis_conn, storage, storage_url,
+                 max_size=10 * 1024 ** 3, min_task_time=1.0,
+                 deletion_grace_period=3600):
+        self.platform = platform
+        self.redis_conn = redis_conn
+        self.storage = storage
+        self.storage_url = storage_url.rstrip('/')
+        self.max_size = max_size
+        self.min_task_time = min_task_time
+        self.deletion_grace_period = deletion_grace_period
+        self.entries_key = self.ENTRIES_KEY.format(platform)
+        self.lru_key = self.LRU_KEY.format(platform)
+        self.size_key = self.SIZE_KEY.format(platform)
+        self.trash_key = self.TRASH_KEY.format(platform)
+        self._statistics = defaultdict(
+            lambda: {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0})
+
+    def _get_job_id(self, job_id):
+        return job_id if job_id is not None else _current_jobs.get(
+            self.platform)
+
+    def get(self, cache_key, job_id=None):
+        """
+        Returns the cached results (port name -> data frame) or None.
+        """
+        entry = self.redis_conn.hget(self.entries_key, cache_key)
+        stats = self._statistics[str(self._get_job_id(job_id))]
+        if entry is None:
+            stats['misses'] += 1
+            return None
+        entry = json.loads(entry)
+        try:
+            results = dict((port, self.storage.read(url))
+                           for port, url in entry['ports'].items())
+        except Exception:
+            log.exception(_('Unable to read cached result %s'), cache_key)
+            self._remove(cache_key, entry)
+            stats['misses'] += 1
+            return None
+
+        self.redis_conn.zadd(self.lru_key, {cache_key: time.time()})
+        results['task_name'] = entry.get('task_name')
+        stats['hits'] += 1
+        return results
+
+    def put(self, cache_key, results, elapsed, job_id=None):
+        """
+        Materializes the results of a task, if all of its outputs are data
+        frames. Returns the results, replacing data frames by their
+        materialized version (avoids re-computing them in the minion).
+        """
+        job_id = self._get_job_id(job_id)
+        if not self.storage.supports(self.storage_url):
+            return results
+        # Time of lazy data frames is checked after writing them
+        if not self.storage.lazy and elapsed < self.min_task_time:
+            return results
+        ports = dict((k, v) for k, v in results.items() if k not in META_KEYS)
+        if not ports or not all(self.storage.is_data_frame(df)
+                                for df in ports.values()):
+            return results
+        if self.redis_conn.hexists(self.entries_key, cache_key):
+            return results
+
+        # Unique location avoids conflicts with concurrent writers
+        base_url = '{}/{}/{}'.format(self.storage_url, cache_key,
+                                     uuid.uuid4().hex)
+        entry = {'url': base_url, 'ports': {}, 'size': 0,
+                 'created': time.time(),
+                 'task_name': results.get('task_name')}
+        start = time.time()
+        try:
+            for i, (port, df) in enumerate(ports.items()):
+                url = '{}/port_{}.parquet'.format(base_url, i)
+                self.storage.write(df, url)
+                entry['ports'][port] = url
+                entry['size'] += self.storage.size(url)
+        except Exception:
+            log.exception(_('Unable to store result %s in cache'), cache_key)
+            self.storage.delete(base_url)
+            return results
+
+        if self.storage.lazy and \
+                elapsed + time.time() - start < self.min_task_time:
+            # Fast task, computing it again is cheaper than reading it
+            self.storage.delete(base_url)
+            return results
+
+        if not self.redis_conn.hsetnx(self.entries_key, cache_key,
+                                      json.dumps(entry)):
+            # Other minion stored the same result
+            self.storage.delete(base_url)
+            return results
+
+        self.redis_conn.zadd(self.lru_key, {cache_key: time.time()})
+        self.redis_conn.incrby(self.size_key, entry['size'])
+        self._statistics[str(job_id)]['stored'] += 1
+
+        new_results = dict(results)
+        for port, url in entry['ports'].items():
+            new_results[port] = self.storage.read(url)
+        self._evict(job_id, keep=cache_key)
+        return new_results
+
+    def pop_statistics(self, job_id):
+        return self._statistics.pop(str(job_id), None)
+
+    def _delete(self, url):
+        try:
+            self.storage.delete(url)
+        except Exception:
+            log.exception(_('Unable to remove cached result %s'), url)
+
+    def _remove(self, cache_key, entry):
+        if self.storage.lazy:
+            # Files may still be read by data frames returned by get/put
+            self.redis_conn.zadd(self.trash_key, {
+                entry['url']: time.time() + self.deletion_grace_period})
+        else:
+            self._delete(entry['url'])
+        if self.redis_conn.hdel(self.entries_key, cache_key):
+            self.redis_conn.decrby(self.size_key, entry.get('size', 0))
+        self.redis_conn.zrem(self.lru_key, cache_key)
+
+    def _purge(self):
+        """ Deletes removed results whose grace period expired """
+        expired = self.redis_conn.zrangebyscore(self.trash_key, 0,
+                                                time.time())
+        for url in expired:
+            # Only one minion deletes each url
+            if self.redis_conn.zrem(self.trash_key, url):
+                self._delete(url)
+
+    def _evict(self, job_id, keep=None):
+        if self.storage.lazy:
+            self._purge()
+        while int(self.redis_conn.get(self.size_key) or 0) > self.max_size:
+            oldest = self.redis_conn.zrange(self.lru_key, 0, 0)
+            if not oldest or oldest[0] == keep:
+                break
+            cache_key = oldest[0]
+            entry = self.redis_conn.hget(self.entries_key, cache_key)
+            if entry is None:
+                self.redis_conn.zrem(self.lru_key, cache_key)
+                continue
+            log.info(_('Evicting result %s from cache'), cache_key)
+            self._remove(cache_key, json.loads(entry))
+            self._statistics[str(job_id)]['evicted'] += 1
+
+
+def get_result_cache(platform, session):
+    """
+    Returns the result cache for the platform or None, if it is disabled.
+    Session is the Spark session (Spark) or the Pandas module (Scikit-learn).
+    """
+    config = (configuration.get_config() or {}).get('juicer', {})
+    cache_config = config.get('result_cache') or {}
+    if not cache_config.get('enabled', False):
+        return None
+
+    if platform not in _caches:
+        if platform == 'spark':
+            storage = SparkResultStorage(session)
+        else:
+            storage = PandasResultStorage(session)
+        storage_url = cache_config.get('storage_url', 'file:///tmp/juicer_cache')
+        if not storage.supports(storage_url):
+            log.warn(_('Result cache storage %s is not supported by %s'),
+                     storage_url, platform)
+            return None
+        parsed = urlparse(config['servers']['redis_url'])
+        redis_conn = redis.StrictRedis(host=parsed.hostname,
+                                       port=parsed.port,
+                                       decode_responses=True)
+        _caches[platform] = ResultCache(
+            platform, redis_conn, storage, storage_url,
+            max_size=int(cache_config.get('max_size', 10 * 1024 ** 3)),
+            min_task_time=float(cache_config.get('min_task_time', 1.0)),
+            deletion_grace_period=float(cache_config.get(
+                'deletion_grace_period', 3600)))
+    elif platform == 'spark':
+        # Spark session may be recreated by the minion
+        _caches[platform].storage.spark_session = session
+    return _caches[platform]
+
+
+def set_current_job(platform, job_id):
+    """ Informs the job whose statistics are being collected """
+    _current_jobs[platform] = job_id
+
+
+def get_current_job(platform):
+    """ Job being executed by the minion (None if unknown) """
+    return _current_jobs.get(platform)
+
+
+def pop_statistics(platform, job_id):
+    """ Statistics (hits, misses, stored and evicted results) for a job """
+    cache = _caches.get(platform)
+    return cache.pop_statistics(job_id) if cache else None
@@ -60,6 +60,7 @@ class Workflow(object):
 
         # Construct graph
         self._build_initial_workflow_graph()
+        self._prefetch_data_sources()
 
         # Topological sorted tasks according to their dependencies
         self.sorted_tasks = []
@@ -89,10 +90,13 @@ class Workflow(object):
         data_sources = []
         if self.workflow['platform']['slug'] != 'spark':
             return
+        prefetched = self.workflow['data_source_cache']
         for t in self.workflow['tasks']:
             if t['operation'].get('slug') == 'data-reader':
                 if self.query_data_sources:
                     ds = next(self.query_data_sources())
+                elif self._get_data_source_id(t) in prefetched:
+                    ds = prefetched[self._get_data_source_id(t)]
                 else:
                     ds = limonero_service.get_data_source_info(
                         limonero_config['url'],
@@ -143,9 +147,40 @@ class Workflow(object):
             for attribute in attributes:
                 attribute.update(more_restrictive)
 
-        self.workflow['data_source_cache'] = data_source_cache
+        self.workflow['data_source_cache'].update(data_source_cache)
         self.workflow['privacy_restrictions'] = privacy_info
 
+    @staticmethod
+    def _get_data_source_id(task):
+        value = task.get('forms', {}).get('data_source', {}).get('value')
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _prefetch_data_sources(self):
+        """
+        Retrieves, concurrently, the data sources used by the workflow tasks,
+        before transpiling it. Operations read them from data_source_cache,
+        instead of querying Limonero one at a time.
+        """
+        services = self.config.get('juicer', {}).get('services', {})
+        if self.query_data_sources or 'limonero' not in services:
+            return
+        data_source_ids = [
+            self._get_data_source_id(self.graph.nodes[task_id]['attr_dict'])
+            for task_id in self.graph.nodes]
+        data_source_ids = [ds_id for ds_id in data_source_ids
+                           if ds_id is not None]
+        if data_source_ids:
+            limonero_config = services['limonero']
+            # Errors are reported later, by the operation using the data source
+            self.workflow['data_source_cache'].update(
+                limonero_service.get_data_sources_info(
+                    limonero_config['url'],
+                    str(limonero_config['auth_token']), data_source_ids,
+                    ignore_errors=True))
+
     def _build_initial_workflow_graph(self):
         """ Builds a graph with the tasks """
 
@@ -432,19 +467,11 @@ class Workflow(object):
     def _get_operations(self, workflow):
         """ Returns operations available in Tahiti """
         tahiti_conf = self.config['juicer']['services']['tahiti']
-        ids = '&'.join([f"ids[]={t['operation']['id']}" for t in workflow['tasks']])
-        params = {
-            'base_url': tahiti_conf['url'],
-            'item_path': 'operations',
-            'token': str(tahiti_conf['auth_token']),
-            'item_id': '',
-            'qs': 'lang={}&{}'.format(self.lang, ids)
-        }
-
         # Querying tahiti operations to get number of inputs and outputs
-        return tahiti_service.query_tahiti(
-            params['base_url'], params['item_path'], params['token'],
-            params['item_id'], qs=params['qs']).get('data')
+        # (operations are cached by minions)
+        return tahiti_service.get_operations(
+            tahiti_conf['url'], str(tahiti_conf['auth_token']),
+            [t['operation']['id'] for t in workflow['tasks']], self.lang)
 
     def get_ports_from_operation_tasks(self, id_operation):
         tahiti_conf = self.config['juicer']['services']['tahiti']
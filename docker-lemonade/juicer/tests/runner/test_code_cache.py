@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import sys
+import traceback
+
+import pytest
+from juicer.runner.code_cache import CodeCache
+
+SOURCE = """
+counter = []
+
+def main(value):
+    counter.append(value)
+    return len(counter)
+"""
+
+
+def test_code_cache_reuse_compiled_code_success():
+    cache = CodeCache(max_size=2)
+    module = cache.load('juicer_app_test_1', SOURCE)
+    assert module.main(10) == 1
+    assert sys.modules['juicer_app_test_1'] is module
+
+    # Same code, new module (state is not shared between jobs)
+    other = cache.load('juicer_app_test_1', SOURCE)
+    assert other is not module
+    assert other.main(20) == 1
+    assert sys.modules['juicer_app_test_1'] is other
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+
+    cache.load('juicer_app_test_1', SOURCE + '\n# 2')
+    cache.load('juicer_app_test_1', SOURCE + '\n# 3')
+    assert len(cache) == 2
+    cache.unload('juicer_app_test_1')
+    assert 'juicer_app_test_1' not in sys.modules
+
+
+def test_code_cache_traceback_shows_generated_code_failure():
+    cache = CodeCache()
+    module = cache.load('juicer_app_test_2',
+                        'def main():\n    raise ValueError("failed")\n')
+    with pytest.raises(ValueError) as exc_info:
+        module.main()
+    formatted = ''.join(traceback.format_tb(exc_info.tb))
+    assert 'raise ValueError("failed")' in formatted
+    cache.unload('juicer_app_test_2')
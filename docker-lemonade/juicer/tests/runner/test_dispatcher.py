@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import threading
+import time
+
+from juicer.runner.control import StateControlRedis
+from juicer.runner.dispatcher import AsyncDispatcher, MinionIndex
+from mockredis.client import mock_strict_redis_client
+
+
+def test_minion_index_events_success():
+    redis_conn = mock_strict_redis_client()
+    redis_conn.set('key_minion_app_10', json.dumps({'pid': 123}))
+    index = MinionIndex(redis_conn, update_active_minions=True)
+    channel = b'__keyspace@0__:key_minion_app_10'
+
+    assert index.handle_event(channel, b'set') == ('10', MinionIndex.JOINED)
+    assert index.get(10) == '123'
+    assert redis_conn.hget('active_minions', '10') in ('123', b'123')
+
+    # Status refreshed by the minion does not change the index
+    assert index.handle_event(channel, b'set') is None
+    assert index.handle_event(channel, b'expired') == (
+        '10', MinionIndex.FINISHED)
+    assert 10 not in index
+    assert not redis_conn.hexists('active_minions', '10')
+    assert index.handle_event(b'__keyspace@0__:other', b'set') is None
+
+
+def test_async_dispatcher_concurrent_apps_success():
+    redis_conn = mock_strict_redis_client()
+    state_control = StateControlRedis(redis_conn)
+    messages = [{'app_id': 1, 'seq': 1}, {'app_id': 2, 'seq': 2},
+                {'app_id': 1, 'seq': 3}, {'app_id': 3, 'seq': 4}]
+    for msg in messages:
+        state_control.push_start_queue(json.dumps(msg))
+
+    handled = []
+    active = {'current': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def handler(msg):
+        with lock:
+            active['current'] += 1
+            active['max'] = max(active['max'], active['current'])
+        time.sleep(0.05)
+        with lock:
+            active['current'] -= 1
+            handled.append(json.loads(msg))
+
+    config = {'juicer': {'dispatcher': {'concurrency': 4}}}
+    dispatcher = AsyncDispatcher(config, redis_conn, handler)
+    asyncio.run(dispatcher.run(max_messages=len(messages)))
+
+    assert len(handled) == 4
+    # Messages of the same app keep their order
+    assert [m['seq'] for m in handled if m['app_id'] == 1] == [1, 3]
+    assert active['max'] > 1
+    assert redis_conn.hget('dispatcher_metrics', 'dispatched') in ('4', b'4')
+    assert redis_conn.hget('dispatcher_metrics', 'queue_depth') in ('0', b'0')
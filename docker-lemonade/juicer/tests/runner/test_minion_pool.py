@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import threading
+
+import mock
+from juicer.runner.pool import MinionPool, wait_for_assignment
+from mockredis.client import mock_strict_redis_client
+
+
+def _get_pool(sizes, refill=MinionPool.EAGER):
+    config = {
+        'juicer': {
+            'minion': {
+                'pool': {'platforms': sizes, 'refill': refill}
+            }
+        }
+    }
+    redis_conn = mock_strict_redis_client()
+    pool = MinionPool(
+        config, redis_conn,
+        build_command=lambda platform: (['minion.py', '-t', platform], 36000),
+        build_env=lambda port: {'LIBPROCESS_PORT': str(port)})
+    return pool, redis_conn
+
+
+def _fake_process(*args, **kwargs):
+    proc = mock.MagicMock()
+    proc.poll.return_value = None
+    proc.stdin = io.BytesIO()
+    proc.stdin.close = mock.MagicMock()
+    return proc
+
+
+def test_minion_pool_fill_success():
+    pool, _ = _get_pool({'spark': 2, 'scikit-learn': 1, 'keras': 3})
+    with mock.patch('subprocess.Popen', side_effect=_fake_process) as popen:
+        with mock.patch('juicer.runner.pool.open', mock.mock_open(),
+                        create=True):
+            pool.fill()
+        assert popen.call_count == 3
+        assert popen.call_args_list[0][0][0] == [
+            'minion.py', '-t', 'spark', '--standby']
+        assert pool.idle_count('spark') == 2
+        assert pool.idle_count('scikit-learn') == 1
+        assert not pool.supports('keras')
+
+
+def test_minion_pool_acquire_success():
+    pool, redis_conn = _get_pool({'spark': 1})
+    with mock.patch('subprocess.Popen', side_effect=_fake_process) as popen:
+        with mock.patch('juicer.runner.pool.open', mock.mock_open(),
+                        create=True):
+            pool.fill()
+            warm_minion = pool.acquire('spark', 10, 20, 30)
+
+        assignment = json.loads(
+            warm_minion.proc.stdin.getvalue().decode('utf8'))
+        assert assignment['workflow_id'] == '10'
+        assert assignment['app_id'] == '20'
+        assert assignment['job_id'] == 30
+
+        # Pool is refilled after assignment
+        assert popen.call_count == 2
+        assert pool.idle_count('spark') == 1
+        assert redis_conn.hget('pool_metrics', 'spark_hit') in ('1', b'1')
+
+
+def test_minion_pool_acquire_dead_minion_miss():
+    pool, redis_conn = _get_pool({'spark': 1}, refill=MinionPool.LAZY)
+    with mock.patch('subprocess.Popen', side_effect=_fake_process):
+        with mock.patch('juicer.runner.pool.open', mock.mock_open(),
+                        create=True):
+            pool.fill()
+            pool.idle['spark'][0].proc.poll.return_value = 1
+            assert pool.acquire('spark', 10, 20, 30) is None
+            assert pool.acquire('meta', 10, 20, 30) is None
+
+    assert redis_conn.hget('pool_metrics', 'spark_miss') in ('1', b'1')
+    assert pool.idle_count('spark') == 1
+
+
+def test_minion_pool_evict_success():
+    released = []
+    pool, _ = _get_pool({'spark': 2, 'meta': 1})
+    pool.release_port = released.append
+    with mock.patch('subprocess.Popen', side_effect=_fake_process):
+        with mock.patch('juicer.runner.pool.open', mock.mock_open(),
+                        create=True):
+            pool.fill()
+    # Platform with more idle minions first
+    assert pool.evict()
+    assert pool.idle_count('spark') == 1
+    assert pool.evict() and pool.evict()
+    assert not pool.evict()
+    assert released == [36000, 36000, 36000]
+
+
+def test_wait_for_assignment_success():
+    stream = io.StringIO('{"workflow_id": "1", "app_id": "2"}\n')
+    assert wait_for_assignment(stream) == {'workflow_id': '1', 'app_id': '2'}
+    assert wait_for_assignment(io.StringIO('')) is None
+
+
+def test_wait_for_assignment_renew_lease_success():
+    renewed = threading.Event()
+
+    class Stream(object):
+        # noinspection PyMethodMayBeStatic
+        def readline(self):
+            # Blocks until the lease is renewed at least once
+            assert renewed.wait(5)
+            return '{"workflow_id": "1", "app_id": "2"}\n'
+
+    assert wait_for_assignment(Stream(), renew_lease=renewed.set,
+                               interval=0.01)['app_id'] == '2'
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from juicer.runner.ports import PortAllocator
+from mockredis.client import mock_strict_redis_client
+
+
+def _get_allocator(capacity=None):
+    minion_config = {'libprocess_port_range': [36000, 36003],
+                     'host': 'node1', 'port_lease_ttl': 20}
+    if capacity is not None:
+        minion_config['max_minions_per_host'] = capacity
+    redis_conn = mock_strict_redis_client(decode_responses=True)
+    return (PortAllocator({'juicer': {'minion': minion_config}}, redis_conn),
+            redis_conn)
+
+
+def test_port_allocator_acquire_distinct_ports_success():
+    allocator, redis_conn = _get_allocator()
+    assert allocator.acquire(1) == 36000
+    assert allocator.acquire(2) == 36001
+    assert allocator.acquire(allocator.standby_owner) == 36002
+    assert allocator.is_full()
+    assert allocator.acquire(3) is None
+
+    assert 0 < redis_conn.ttl(allocator.lease_key(36000)) <= 20
+    # Warm minion: lease expires if it is not renewed (minion died)
+    assert 0 < redis_conn.ttl(allocator.lease_key(36002)) <= 20
+    assert allocator.release_owner(allocator.standby_owner) == [36002]
+    assert allocator.acquire(allocator.standby_owner) == 36002
+
+    # Warm minion assigned to an app: lease starts to expire
+    allocator.assign(36002, 4)
+    assert 0 < redis_conn.ttl(allocator.lease_key(36002)) <= 20
+
+
+def test_port_allocator_capacity_and_release_success():
+    allocator, _ = _get_allocator(capacity=1)
+    assert allocator.acquire(1) == 36000
+    assert allocator.acquire(2) is None
+
+    assert not allocator.release(36000, owner=2)
+    assert allocator.release_owner(1) == [36000]
+    assert allocator.used() == 0
+    assert allocator.acquire(2) == 36000
+
+
+def test_port_allocator_standby_owner_by_server_success():
+    minion_config = {'libprocess_port_range': [36000, 36003],
+                     'host': 'node1', 'server_id': 'server1'}
+    redis_conn = mock_strict_redis_client(decode_responses=True)
+    allocator = PortAllocator({'juicer': {'minion': minion_config}},
+                              redis_conn)
+    other = PortAllocator({'juicer': {'minion': dict(
+        minion_config, server_id='server2')}}, redis_conn)
+    assert allocator.standby_owner == 'standby:server1'
+
+    assert allocator.acquire(allocator.standby_owner) == 36000
+    assert other.acquire(other.standby_owner) == 36001
+    # A (restarted) server releases only leases of its own warm minions
+    assert allocator.release_owner(allocator.standby_owner) == [36000]
+    assert other.used() == 1
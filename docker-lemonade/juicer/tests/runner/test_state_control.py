@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+import fnmatch
+import itertools
+import json
+import time
+
+from juicer.runner.control import (StateControlRedis,
+                                   StateControlRedisStreams,
+                                   create_state_control)
+from mockredis.client import mock_strict_redis_client
+
+
+class FakeStreamRedis(object):
+    """ Minimal in memory implementation of the Redis Streams commands """
+
+    def __init__(self):
+        self.streams = {}
+        self.pending = {}
+        self.delivered = {}
+        self.deliveries = {}
+        self.ttl = {}
+        self.ids = itertools.count(1)
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+    def keys(self, pattern):
+        return [k for k in self.streams if fnmatch.fnmatch(k, pattern)]
+
+    def xgroup_create(self, name, group, id='$', mkstream=False):
+        self.streams.setdefault(name, [])
+        self.pending.setdefault(name, {})
+        self.delivered.setdefault(name, 0)
+
+    def expire(self, name, ttl):
+        self.ttl[name] = ttl
+
+    def xadd(self, name, fields, maxlen=None, approximate=True):
+        msg_id = '{}-0'.format(next(self.ids))
+        self.streams.setdefault(name, []).append((msg_id, dict(fields)))
+        return msg_id
+
+    def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        name = list(streams.keys())[0]
+        entries = self.streams[name][self.delivered[name]:][:count]
+        self.delivered[name] += len(entries)
+        for msg_id, _ in entries:
+            self._deliver(name, msg_id, consumer)
+        return [[name, entries]] if entries else []
+
+    def _deliver(self, name, msg_id, consumer):
+        self.pending[name][msg_id] = (consumer, time.time())
+        self.deliveries[msg_id] = self.deliveries.get(msg_id, 0) + 1
+
+    def xpending_range(self, name, group, start, end, count):
+        now = time.time()
+        return [{'message_id': k, 'consumer': v[0],
+                 'time_since_delivered': int((now - v[1]) * 1000),
+                 'times_delivered': self.deliveries[k]}
+                for k, v in self.pending[name].items()][:count]
+
+    def xclaim(self, name, group, consumer, min_idle_time, message_ids):
+        for msg_id in message_ids:
+            self._deliver(name, msg_id, consumer)
+        return [e for e in self.streams[name] if e[0] in message_ids]
+
+    def xack(self, name, group, msg_id):
+        self.pending[name].pop(msg_id, None)
+
+    def xdel(self, name, msg_id):
+        self.streams[name] = [e for e in self.streams[name]
+                              if e[0] != msg_id]
+        self.delivered[name] -= 1
+
+    def xlen(self, name):
+        return len(self.streams.get(name, []))
+
+    def xrange(self, name, count=None):
+        return self.streams[name][:count]
+
+    def delete(self, key):
+        pass
+
+
+def test_create_state_control_success():
+    redis_conn = mock_strict_redis_client()
+    config = {'juicer': {'state_control': {'backend': 'streams'}}}
+    assert isinstance(create_state_control(redis_conn, config),
+                      StateControlRedisStreams)
+    assert type(create_state_control(redis_conn, {})) == StateControlRedis
+
+
+def test_state_control_streams_recover_pending_success():
+    redis_conn = FakeStreamRedis()
+    server = StateControlRedisStreams(redis_conn, consumer='server')
+    for i in range(3):
+        server.push_app_queue(1, json.dumps({'seq': i}))
+
+    minion = StateControlRedisStreams(redis_conn, consumer='minion_1')
+    assert json.loads(minion.pop_app_queue(1)) == {'seq': 0}
+    # Previous message is acknowledged when the next one is read
+    assert json.loads(minion.pop_app_queue(1)) == {'seq': 1}
+    assert minion.get_app_queue_size(1) == 2
+
+    # Minion died while processing message 1. It is delivered again.
+    assert server.get_pending_app_messages() == [('1', '{"seq": 1}')]
+    new_minion = StateControlRedisStreams(redis_conn, consumer='minion_2',
+                                          claim_min_idle=0)
+    assert json.loads(new_minion.pop_app_queue(1)) == {'seq': 1}
+    assert json.loads(new_minion.pop_app_queue(1)) == {'seq': 2}
+    assert new_minion.pop_app_queue(1, block=False) is None
+    assert new_minion.get_app_queue_size(1) == 0
+
+
+def test_state_control_streams_claim_min_idle_success():
+    redis_conn = FakeStreamRedis()
+    server = StateControlRedisStreams(redis_conn, consumer='server')
+    server.push_app_queue(1, 'msg')
+    assert redis_conn.ttl['stream_app_1'] == 3600
+
+    minion = StateControlRedisStreams(redis_conn, consumer='minion_1')
+    assert minion.pop_app_queue(1) == 'msg'
+    # Message being processed is not claimed by other consumer
+    other = StateControlRedisStreams(redis_conn, consumer='minion_2')
+    assert other.pop_app_queue(1, block=False) is None
+    assert minion.get_app_queue_size(1) == 1
+
+
+def test_state_control_streams_dead_letter_success():
+    redis_conn = FakeStreamRedis()
+    server = StateControlRedisStreams(redis_conn, consumer='server')
+    server.push_app_queue(1, 'poison')
+    server.push_app_queue(1, 'next')
+
+    # Each minion dies while processing the message
+    for i in range(3):
+        minion = StateControlRedisStreams(
+            redis_conn, consumer='minion_{}'.format(i), claim_min_idle=0)
+        assert minion.pop_app_queue(1) == 'poison'
+
+    minion = StateControlRedisStreams(redis_conn, consumer='minion_3',
+                                      claim_min_idle=0)
+    assert minion.pop_app_queue(1) == 'next'
+    assert [e[1] for e in redis_conn.streams['dead_letter_app_1']] == [
+        {'data': 'poison', 'deliveries': 3}]
+
+
+def test_state_control_batch_success():
+    state_control = StateControlRedis(mock_strict_redis_client())
+    with state_control.batch() as batch:
+        batch.push_app_queue(1, 'msg')
+        batch.push_app_output_queue(1, 'output')
+        # Commands were not sent yet
+        assert state_control.get_app_queue_size(1) == 0
+    assert state_control.pop_app_queue(1, block=False) == 'msg'
+    assert state_control.pop_app_output_queue(1, block=False) in (
+        'output', b'output')
+
+
+def test_state_control_streams_output_queue_success():
+    redis_conn = FakeStreamRedis()
+    minion = StateControlRedisStreams(redis_conn, consumer='minion')
+    for i in range(2):
+        minion.push_app_output_queue(1, json.dumps({'seq': i}))
+    assert redis_conn.ttl['stream_output_app_1'] == 3600
+    assert minion.get_app_output_queue_size(1) == 2
+
+    # Output messages are acknowledged (removed) when read
+    reader = StateControlRedisStreams(redis_conn, consumer='reader')
+    assert json.loads(reader.pop_app_output_queue(1)) == {'seq': 0}
+    assert reader.get_app_output_queue_size(1) == 1
+    assert json.loads(reader.pop_app_output_queue(1, False)) == {'seq': 1}
+    assert reader.pop_app_output_queue(1, False) is None
+    assert redis_conn.pending['stream_output_app_1'] == {}
+    # Output streams are not app queues
+    assert reader.get_pending_app_messages() == []
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from juicer.runner import telemetry
+from juicer.runner.telemetry import TelemetryAggregator
+from mockredis.client import mock_strict_redis_client
+
+
+def _publish(redis_conn, app_id, **values):
+    values.setdefault('timestamp', time.time())
+    redis_conn.hset(telemetry.TELEMETRY_KEY, app_id, json.dumps(values))
+
+
+def test_telemetry_state_size_success():
+    df = pd.DataFrame({'a': np.arange(1000, dtype='int64')})
+    state = {
+        'status': 'OK', 'message': 'Done',
+        'task_1': [{'output': {'output': df, 'sample': None}}, 'hash'],
+        'task_2': [{'output': {'output': np.zeros(100)}}, 'hash'],
+    }
+    result = telemetry.get_state_telemetry(state)
+    assert result['cached_states'] == 2
+    assert result['cached_state_bytes'] >= 8000 + 800
+
+    assert telemetry.get_rss() > 0
+
+
+def test_telemetry_aggregator_success():
+    redis_conn = mock_strict_redis_client(decode_responses=True)
+    aggregator = TelemetryAggregator(
+        {'juicer': {'telemetry': {'stale_after': 30}}}, redis_conn)
+    _publish(redis_conn, '1', platform='spark', pid=10, rss_bytes=100,
+             cached_state_bytes=10, spark_cached_memory_bytes=500)
+    _publish(redis_conn, '2', platform='scikit-learn', pid=11,
+             rss_bytes=200, cached_state_bytes=50)
+    _publish(redis_conn, '3', timestamp=time.time() - 60, rss_bytes=300)
+
+    minions = aggregator.read()
+    assert sorted(minions.keys()) == ['1', '2']
+    # Stale entries (minions that died) are removed
+    assert not redis_conn.hexists(telemetry.TELEMETRY_KEY, '3')
+
+    summary = aggregator.summarize(minions)
+    assert summary['minions'] == 2
+    assert summary['rss_bytes'] == 300
+    assert summary['largest_app_id'] == '1'
+
+    metrics = aggregator.to_prometheus(minions)
+    assert 'juicer_minion_rss_bytes{app_id="1",platform="spark",' \
+           'pid="10"} 100' in metrics
+    assert 'juicer_minion_spark_cached_memory_bytes{app_id="2"' \
+           not in metrics
+
+    aggregator.remove(1)
+    assert list(aggregator.read().keys()) == ['2']
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from juicer.scikit_learn import streaming
+from juicer.scikit_learn.data_operation import DataReaderOperation
+from juicer.scikit_learn.etl_operation import FilterOperation
+from tests.scikit_learn import util
+
+
+def _get_reader(path, data_format, attributes, streaming_enabled=True):
+    metadata = {
+        'url': 'file://{}'.format(path), 'format': data_format,
+        'storage': {}, 'attributes': attributes,
+        'is_first_line_header': True, 'updated': '2021-01-01T00:00:00',
+    }
+    configuration = {'juicer': {
+        'services': {'limonero': {'url': 'http://limonero', 'auth_token': 1}},
+        'scikit_learn': {'streaming': {'enabled': streaming_enabled,
+                                       'chunk_size': 7}}}}
+    parameters = {'data_source': 1, 'configuration': configuration,
+                  'workflow': {'data_source_cache': {1: metadata}}}
+    return DataReaderOperation(parameters, {}, {'output data': 'df'})
+
+
+def _execute(instance, arguments=None):
+    return util.execute(instance.generate_code(),
+                        dict(arguments or {}, streaming=streaming, pa=pa))
+
+
+def test_streaming_csv_reader_with_fused_filter_success(tmp_path):
+    df = util.iris(size=40)
+    path = tmp_path / 'iris.csv'
+    df.to_csv(path, index=False)
+    attributes = [{'name': name, 'type': 'DOUBLE'}
+                  for name in df.columns[:-1]]
+    attributes.append({'name': 'class', 'type': 'CHARACTER'})
+
+    reader = _get_reader(path, 'CSV', attributes)
+    code = reader.generate_code()
+    assert 'streaming.read_csv(open_data_source, 7,' in code
+    assert 'f.close()' not in code
+
+    chunked = _execute(reader)['df']
+    assert isinstance(chunked, streaming.ChunkedDataFrame)
+    assert len(list(chunked.chunks())) == 6
+
+    expected = _execute(_get_reader(path, 'CSV', attributes, False))['df']
+    # Row labels are the same used when reading the whole file
+    assert streaming.materialize(chunked).equals(expected)
+    assert streaming.preview(chunked, 10).equals(expected.head(10))
+
+    # Row-local operations are applied to each chunk (fused)
+    filter_op = FilterOperation(
+        {'filter': [{'attribute': 'sepallength', 'f': '>', 'value': '5'}],
+         'configuration': {}}, {'input data': 'df'}, {'output data': 'out'})
+    filter_code = filter_op.generate_code()
+
+    def process_chunk(chunk):
+        return util.execute(filter_code, {'df': chunk})['out']
+
+    filtered = chunked.map_chunks(process_chunk)
+    # Nothing is read until data is consumed
+    assert filtered.reader is chunked.reader
+    assert streaming.materialize(filtered).equals(
+        expected[expected['sepallength'] > 5])
+
+
+def test_streaming_parquet_reader_success(tmp_path):
+    df = util.iris(size=25)
+    path = str(tmp_path / 'iris.parquet')
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path,
+                   row_group_size=10)
+
+    chunked = _execute(_get_reader(path, 'PARQUET', []))['df']
+    assert [len(c) for c in chunked.chunks()] == [10, 10, 5]
+    assert streaming.materialize(chunked).equals(df)
+    # Reads only the first row group
+    assert chunked.head(3).equals(df.head(3))
+
+
+def test_parquet_row_groups_skipped_by_filters_success(tmp_path):
+    df = util.iris(size=50).sort_values('sepallength').reset_index(drop=True)
+    path = str(tmp_path / 'iris.parquet')
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path,
+                   row_group_size=10)
+    filters = [('sepallength', '>=', 5.2), ('class', '==', 'Iris-setosa')]
+
+    parquet_file = pq.ParquetFile(path)
+    row_groups = list(streaming.get_row_groups(parquet_file, filters))
+    assert 0 < len(row_groups) < 5
+
+    columns = ['sepallength', 'class']
+    result = streaming.read_row_groups(path, columns, filters)
+    expected = df[columns].iloc[[row for _, start in row_groups
+                                 for row in range(start, start + 10)]]
+    # Rows keep their position in the file as labels
+    assert result.equals(expected)
+    selected = result[result['sepallength'] >= 5.2]
+    assert selected.equals(df.loc[df['sepallength'] >= 5.2, columns])
+
+    chunked = streaming.read_parquet(lambda: open(path, 'rb'), columns,
+                                     filters)
+    assert streaming.materialize(chunked).equals(expected)
+
+    # No row group has the rows
+    result = streaming.read_row_groups(path, columns, [('class', '==', 'X')])
+    assert result.empty and result.columns.tolist() == columns
@@ -59,6 +59,98 @@ out = df
 out = out[out.apply(lambda row: 'sepallength', axis=1)]"""
 
 
+def test_filter_vectorized_expression_success():
+    df = util.iris(['sepallength', 'sepalwidth', 'class'], size=10)
+    # sepallength > 5 && class == 'Iris-setosa'
+    tree = {'type': 'LogicalExpression', 'operator': '&&',
+            'left': {'type': 'BinaryExpression', 'operator': '>',
+                     'left': {'type': 'Identifier', 'name': 'sepallength'},
+                     'right': {'type': 'Literal', 'value': 5}},
+            'right': {'type': 'BinaryExpression', 'operator': '==',
+                      'left': {'type': 'CallExpression',
+                               'callee': {'type': 'Identifier',
+                                          'name': 'lower'},
+                               'arguments': [{'type': 'Identifier',
+                                              'name': 'class'}]},
+                      'right': {'type': 'Literal',
+                                'value': 'iris-setosa'}}}
+    arguments = {
+        'parameters': {'expression': [{'tree': tree}]},
+        'named_inputs': {
+            'input data': 'df',
+        },
+        'named_outputs': {
+            'output data': 'out'
+        }
+    }
+    instance = FilterOperation(**arguments)
+    assert instance.generate_code() == """
+out = df
+mask = out.eval('(`sepallength` > 5)')
+mask &= out.pipe(lambda df: (df['class'].str.lower() == 'iris-setosa'))
+out = out[mask]"""
+    assert instance.not_compiled == [(None, 'function lower()')]
+    # Reported to the user in the task log
+    assert instance.get_warnings() == [
+        'Filter condition was not compiled to a query '
+        '(unsupported function lower()).']
+    result = util.execute(util.get_complete_code(instance), {'df': df})
+    assert result['out'].equals(df[(df['sepallength'] > 5) &
+                                   (df['class'] == 'Iris-setosa')])
+
+    # Disabled in configuration
+    arguments['parameters']['configuration'] = {
+        'juicer': {'transpiler': {'vectorize_expressions': False}}}
+    instance = FilterOperation(**arguments)
+    assert 'out.apply(lambda row:' in instance.generate_code()
+
+
+def test_filter_compiled_to_single_query_success():
+    df = util.iris(['sepallength', 'sepalwidth', 'petalwidth'], size=50)
+    # sqrt(sepallength) > 2.2 || !(petalwidth <= 0.2)
+    condition = {
+        'type': 'LogicalExpression', 'operator': '||',
+        'left': {'type': 'BinaryExpression', 'operator': '>',
+                 'left': {'type': 'CallExpression',
+                          'callee': {'type': 'Identifier', 'name': 'sqrt'},
+                          'arguments': [{'type': 'Identifier',
+                                         'name': 'sepallength'}]},
+                 'right': {'type': 'Literal', 'value': 2.2}},
+        'right': {'type': 'UnaryExpression', 'operator': '!',
+                  'prefix': True,
+                  'argument': {'type': 'BinaryExpression', 'operator': '<=',
+                               'left': {'type': 'Identifier',
+                                        'name': 'petalwidth'},
+                               'right': {'type': 'Literal', 'value': 0.2}}}}
+    arguments = {
+        'parameters': {
+            'filter': [{'attribute': 'sepalwidth', 'f': '<', 'value': '3.5'}],
+            'expression': [
+                {'tree': condition},
+                {'tree': {'type': 'BinaryExpression', 'operator': '!=',
+                          'left': {'type': 'Identifier',
+                                   'name': 'sepalwidth'},
+                          'right': {'type': 'Literal', 'value': 3}}}]},
+        'named_inputs': {
+            'input data': 'df',
+        },
+        'named_outputs': {
+            'output data': 'out'
+        }
+    }
+    instance = FilterOperation(**arguments)
+    assert instance.generate_code() == """
+out = df
+out = out.query('sepalwidth < 3.5 and ((sqrt(`sepallength`) > 2.2) | """ \
+        """(~(`petalwidth` <= 0.2))) and (`sepalwidth` != 3)')"""
+    assert instance.not_compiled == []
+    assert instance.get_warnings() == []
+    result = util.execute(util.get_complete_code(instance), {'df': df})
+    assert result['out'].equals(df[
+        (df['sepalwidth'] < 3.5) & (df['sepalwidth'] != 3) &
+        ((df['sepallength'] ** .5 > 2.2) | ~(df['petalwidth'] <= 0.2))])
+
+
 def test_filter_no_output_implies_no_code_success():
     arguments = {
         'parameters': {'filter': [{'attribute': 'sepallength',
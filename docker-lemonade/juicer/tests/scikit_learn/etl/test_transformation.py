@@ -29,6 +29,94 @@ from juicer.scikit_learn.etl_operation import TransformationOperation
 #     assert result['out'].equals(util.iris(size=slice_size))
 
 
+def _get_transformation(expressions, vectorize=True):
+    arguments = {
+        'parameters': {
+            'expression': [{'alias': alias, 'tree': tree}
+                           for alias, tree in expressions],
+            'configuration': {'juicer': {'transpiler': {
+                'vectorize_expressions': vectorize}}},
+        },
+        'named_inputs': {
+            'input data': 'df',
+        },
+        'named_outputs': {
+            'output data': 'out'
+        }
+    }
+    return TransformationOperation(**arguments)
+
+
+def _call(name, *args):
+    return {'type': 'CallExpression',
+            'callee': {'type': 'Identifier', 'name': name},
+            'arguments': [
+                a if isinstance(a, dict) else
+                {'type': 'Literal', 'value': a, 'raw': repr(a)}
+                for a in args]}
+
+
+def test_transformation_vectorized_same_result_success():
+    """ Vectorized and row-wise expressions must return the same values """
+    df = util.iris(['sepalwidth', 'petalwidth', 'class'], 20)
+    df['date'] = pd.date_range('2021-03-14 15:09:26', periods=20, freq='37h')
+    sepalwidth = {'type': 'Identifier', 'name': 'sepalwidth'}
+    name = {'type': 'Identifier', 'name': 'class'}
+    date = {'type': 'Identifier', 'name': 'date'}
+    expressions = [
+        ('math', {'type': 'BinaryExpression', 'operator': '+',
+                  'left': _call('sqrt', sepalwidth),
+                  'right': _call('pow', {'type': 'Identifier',
+                                         'name': 'petalwidth'}, 2)}),
+        ('round', _call('round', sepalwidth)),
+        ('upper', _call('upper', name)),
+        ('trim', _call('trim', _call('substring', name, 2, 8))),
+        ('concat', _call('concat_ws', '|', name, sepalwidth)),
+        ('replace', _call('regexp_replace', name, r'[^\w]', '##')),
+        ('month', _call('month', date)),
+        ('formatted', _call('date_format', date, 'yyyy-MM-dd HH:mm')),
+        ('truncated', _call('date_trunc', date, 'month')),
+        ('when', {'type': 'ConditionalExpression',
+                  'test': {'type': 'BinaryExpression', 'operator': '>',
+                           'left': sepalwidth,
+                           'right': {'type': 'Literal', 'value': 3.2}},
+                  'consequent': {'type': 'Literal', 'value': 'wide'},
+                  'alternate': {'type': 'Literal', 'value': 'narrow'}}),
+    ]
+    vectorized = _get_transformation(expressions)
+    code = vectorized.generate_code()
+    assert "lambda row:" not in code
+    assert "['upper', lambda df: df['class'].str.upper(), True]" in code
+
+    row_wise = _get_transformation(expressions, vectorize=False)
+    assert "lambda df:" not in row_wise.generate_code()
+
+    result = util.execute(code, {'df': df})['out']
+    expected = util.execute(row_wise.generate_code(), {'df': df})['out']
+    for alias, _ in expressions:
+        assert result[alias].tolist() == expected[alias].tolist(), alias
+
+
+def test_transformation_vectorized_fallback_success():
+    """ Functions without vectorized version are applied to each row """
+    df = util.iris(['sepalwidth', 'class'], 10)
+    expressions = [
+        ('hash', _call('md5', {'type': 'Identifier', 'name': 'class'})),
+        ('double', {'type': 'BinaryExpression', 'operator': '*',
+                    'left': {'type': 'Identifier', 'name': 'sepalwidth'},
+                    'right': {'type': 'Literal', 'value': 2}}),
+    ]
+    instance = _get_transformation(expressions)
+    code = instance.generate_code()
+    assert "['hash', lambda row: hashlib.md5(" in code
+    assert "['double', lambda df: (df['sepalwidth'] * 2), True]" in code
+
+    result = util.execute(code, {'df': df})['out']
+    assert result['hash'].tolist() == [
+        hashlib.md5(v.encode()).hexdigest() for v in df['class']]
+    assert result['double'].tolist() == (df['sepalwidth'] * 2).tolist()
+
+
 def test_function_implementation():
     """ Test if all functions supported in Lemonade are mapped in scikit-learn
     transpiler.
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from juicer.scikit_learn.geo_operation import GeoWithinOperation
+from juicer.scikit_learn.library import geo_within
+from matplotlib.path import Path
+from tests.scikit_learn import util
+
+
+def _get_data(polygons=40, size=2000):
+    rng = np.random.RandomState(7)
+    shapes = []
+    for _ in range(polygons):
+        lat, lon = rng.uniform(-20, -18), rng.uniform(-45, -43)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, 6))
+        radius = rng.uniform(0.1, 0.4, 6)
+        shapes.append([[lat + np.sin(a) * r, lon + np.cos(a) * r]
+                       for a, r in zip(angles, radius)])
+    shp = pd.DataFrame({'name': ['s{}'.format(i) for i in range(polygons)],
+                        'code': range(polygons), 'points': shapes})
+    df = pd.DataFrame({'lat': rng.uniform(-20.5, -17.5, size),
+                       'lon': rng.uniform(-45.5, -42.5, size),
+                       'id': range(size)})
+    return df, shp
+
+
+def _expected(df, shp):
+    """ Points tested against each polygon """
+    rows = []
+    for _, point in df.iterrows():
+        for _, sector in shp.iterrows():
+            if Path(sector['points']).contains_point(
+                    [point['lat'], point['lon']]):
+                rows.append(point.tolist() + [sector['name']])
+    return pd.DataFrame(rows, columns=['lat', 'lon', 'id', 'name_shp'])
+
+
+def test_geo_within_index_success(monkeypatch):
+    df, shp = _get_data()
+    expected = _expected(df, shp)
+    assert len(expected) > 0
+
+    result = geo_within.GeoWithinOperation(
+        df, shp, True, ['name'], '_shp', 'points', 'lat', 'lon')
+    assert result.astype({'id': float}).equals(expected)
+
+    # Index is reused for the same shapefile
+    index = geo_within.get_polygon_index(shp, 'points', True)
+    assert geo_within.get_polygon_index(shp, 'points', True) is index
+
+    # Unless its polygons change
+    original = shp.copy()
+    shp.at[0, 'points'] = [[0.0, 0.0], [0.0, 1.0], [1.0, 1.0]]
+    new_index = geo_within.get_polygon_index(shp, 'points', True)
+    assert new_index is not index
+    assert new_index.paths[0].vertices.tolist() == shp.at[0, 'points']
+    shp.drop(index=0, inplace=True)
+    assert len(geo_within.get_polygon_index(shp, 'points', True).paths) == \
+        len(original) - 1
+    shp = original
+
+    # Chunks processed in parallel
+    monkeypatch.setattr(geo_within, 'MIN_POINTS_PER_WORKER', 500)
+    parallel = geo_within.GeoWithinOperation(
+        df, shp, True, ['name'], '_shp', 'points', 'lat', 'lon', workers=3)
+    assert parallel.equals(result)
+
+
+def test_geo_within_operation_success():
+    df, shp = _get_data(size=200)
+    instance = GeoWithinOperation(
+        {'latitude': ['lat'], 'longitude': ['lon'], 'polygon': ['points'],
+         'polygon_attributes': ['name', 'code'],
+         'configuration': {'juicer': {'scikit_learn': {
+             'processes': {'workers': 2}}}}},
+        {'input data': 'df', 'geo data': 'shp'}, {'output data': 'out'})
+    code = instance.generate_code()
+    assert 'workers=2' in code
+    result = util.execute(code, {'df': df, 'shp': shp})
+    assert result['out'].columns.tolist() == [
+        'lat', 'lon', 'id', 'name_shp', 'code_shp']
+    assert result['out']['name_shp'].tolist() == \
+        _expected(df, shp)['name_shp'].tolist()
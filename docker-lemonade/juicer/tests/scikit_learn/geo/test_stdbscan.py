@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+import numpy as np
+import pandas as pd
+from juicer.scikit_learn.geo_operation import STDBSCANOperation
+from juicer.scikit_learn.library.stdbscan import STDBSCAN
+from tests.scikit_learn import util
+
+
+def _reference_labels(df, spatial, temporal, min_neighbors):
+    """ Labels of the previous (quadratic) implementation """
+    matrix = df[['lon', 'lat', 'date']].copy()
+    matrix['cluster'] = 777777
+    matrix['index'] = range(matrix.shape[0])
+    matrix = matrix.values
+
+    def neighbors(center):
+        point = matrix[center, :]
+        delta = datetime.timedelta(seconds=temporal)
+        window = matrix[(matrix[:, 2] >= point[2] - delta) &
+                        (matrix[:, 2] <= point[2] + delta), :]
+        dist = (window[:, 0] - point[0]) ** 2 + (window[:, 1] - point[1]) ** 2
+        result = window[dist <= spatial * spatial, 4].tolist()
+        result.remove(center)
+        return result
+
+    label, stack = 0, []
+    for index in range(matrix.shape[0]):
+        if matrix[index, 3] == 777777:
+            neighborhood = neighbors(index)
+            if len(neighborhood) < min_neighbors:
+                matrix[index, 3] = -1
+            else:
+                label += 1
+                matrix[index, 3] = label
+                for n in neighborhood:
+                    matrix[n, 3] = label
+                    stack.append(n)
+                while stack:
+                    new_neighborhood = neighbors(stack.pop())
+                    if len(new_neighborhood) >= min_neighbors:
+                        for n in new_neighborhood:
+                            if matrix[n, 3] in (-1, 777777):
+                                matrix[n, 3] = label
+                                stack.append(n)
+    return matrix[:, 3].astype(int).tolist()
+
+
+def _get_points(size=600):
+    rng = np.random.RandomState(42)
+    start = datetime.datetime(2021, 3, 1, 8)
+    centers = rng.uniform(0, 5000, size=(4, 2))
+    group = rng.randint(0, 4, size)
+    return pd.DataFrame({
+        'lat': centers[group, 0] + rng.normal(0, 150, size),
+        'lon': centers[group, 1] + rng.normal(0, 150, size),
+        'date': [start + datetime.timedelta(seconds=int(s))
+                 for s in rng.uniform(0, 1800, size)],
+    })
+
+
+def test_stdbscan_same_labels_as_reference_success():
+    df = _get_points()
+    expected = _reference_labels(df, 200, 120, 5)
+    assert len(set(expected)) > 2
+
+    # Small chunks, queried in parallel
+    result = STDBSCAN(200, 120, 5, n_jobs=2, chunk_size=50).fit_transform(
+        df, 'lat', 'lon', 'date')
+    assert result['cluster'].tolist() == expected
+    assert result.columns.tolist() == ['lon', 'lat', 'date', 'cluster']
+
+    # Epoch timestamps (seconds)
+    df['date'] = df['date'].astype('int64') // 10 ** 9
+    result = STDBSCAN(200, 120, 5).fit_transform(
+        df, 'lat', 'lon', 'date', 'c')
+    assert result['c'].tolist() == expected
+
+
+def test_stdbscan_operation_success():
+    df = _get_points(100)
+    instance = STDBSCANOperation(
+        {'LAT': ['lat'], 'LON': ['lon'], 'DATETIME': ['date'],
+         'spatial_threshold': 300, 'thresold_temporal': 600,
+         'min_sample': 3, 'multiplicity': {'input data': 1},
+         'configuration': {'juicer': {'scikit_learn': {
+             'processes': {'workers': 2}}}}},
+        {'input data': 'df'}, {'output data': 'out'})
+    code = instance.generate_code()
+    assert 'n_jobs=2' in code
+    result = util.execute(code, {'df': df, 'STDBSCAN': STDBSCAN})
+    assert result['out']['cluster'].tolist() == _reference_labels(
+        df, 300, 600, 3)
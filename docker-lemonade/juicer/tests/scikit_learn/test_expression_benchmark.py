@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of code generated for expressions (Transformation and
+Filter operations), comparing row-wise (DataFrame.apply) and vectorized
+evaluation. By default, only a small data set is used, checking that both
+return the same results. The benchmark (1M rows) runs only if the
+JUICER_BENCHMARK environment variable is set. Run it with -s to see the
+timings.
+"""
+import os
+from timeit import default_timer as timer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from juicer.scikit_learn.etl_operation import FilterOperation, \
+    TransformationOperation
+from tests.scikit_learn import util
+
+TOTAL_ROWS = 5000
+BENCHMARK_ROWS = 1000000
+
+
+def _get_data(total_rows):
+    rnd = np.random.RandomState(42)
+    return pd.DataFrame({
+        'value': rnd.rand(total_rows),
+        'quantity': rnd.randint(0, 100, total_rows),
+        'name': rnd.choice(['Iris-setosa', 'Iris-virginica'], total_rows),
+    })
+
+
+def _get_configuration(vectorize):
+    return {'juicer': {'transpiler': {'vectorize_expressions': vectorize}}}
+
+
+def _execute(instance, df):
+    code = instance.generate_code()
+    start = timer()
+    result = util.execute(code, {'df': df})['out']
+    return result, timer() - start
+
+
+def _compare(total_rows):
+    """ Results and timings, row-wise (False) and vectorized (True) """
+    df = _get_data(total_rows)
+    # value * 2 + sqrt(quantity), upper(name)
+    expressions = [
+        {'alias': 'total', 'tree': {
+            'type': 'BinaryExpression', 'operator': '+',
+            'left': {'type': 'BinaryExpression', 'operator': '*',
+                     'left': {'type': 'Identifier', 'name': 'value'},
+                     'right': {'type': 'Literal', 'value': 2}},
+            'right': {'type': 'CallExpression',
+                      'callee': {'type': 'Identifier', 'name': 'sqrt'},
+                      'arguments': [{'type': 'Identifier',
+                                     'name': 'quantity'}]}}},
+        {'alias': 'upper_name', 'tree': {
+            'type': 'CallExpression',
+            'callee': {'type': 'Identifier', 'name': 'upper'},
+            'arguments': [{'type': 'Identifier', 'name': 'name'}]}},
+    ]
+    # quantity > 50
+    condition = [{'tree': {
+        'type': 'BinaryExpression', 'operator': '>',
+        'left': {'type': 'Identifier', 'name': 'quantity'},
+        'right': {'type': 'Literal', 'value': 50}}}]
+
+    results = {}
+    timings = {}
+    for vectorize in [False, True]:
+        configuration = _get_configuration(vectorize)
+        transformation = TransformationOperation(
+            {'expression': expressions, 'configuration': configuration},
+            {'input data': 'df'}, {'output data': 'out'})
+        filter_op = FilterOperation(
+            {'expression': condition, 'configuration': configuration},
+            {'input data': 'df'}, {'output data': 'out'})
+        transformed, transformation_time = _execute(transformation, df)
+        filtered, filter_time = _execute(filter_op, df)
+        results[vectorize] = (transformed, filtered)
+        timings[vectorize] = (transformation_time, filter_time)
+    return results, timings
+
+
+def _assert_same_results(results):
+    row_wise, vectorized = results[False], results[True]
+    assert np.allclose(row_wise[0]['total'], vectorized[0]['total'])
+    assert row_wise[0]['upper_name'].equals(vectorized[0]['upper_name'])
+    assert row_wise[1].equals(vectorized[1])
+
+
+def test_expression_vectorized_same_results_success():
+    results, _ = _compare(TOTAL_ROWS)
+    assert len(results[True][1]) > 0
+    _assert_same_results(results)
+
+
+@pytest.mark.skipif(not os.environ.get('JUICER_BENCHMARK'),
+                    reason='Benchmark, set JUICER_BENCHMARK to run it')
+def test_expression_benchmark_1m_rows_success():
+    results, timings = _compare(BENCHMARK_ROWS)
+
+    print()
+    print('Rows: {}'.format(BENCHMARK_ROWS))
+    for vectorize, (transformation_time, filter_time) in timings.items():
+        print('{:>10}: transformation {:.3f}s, filter {:.3f}s'.format(
+            'vectorized' if vectorize else 'row-wise', transformation_time,
+            filter_time))
+    print('Speedup: {:.1f}x'.format(sum(timings[False]) / sum(timings[True])))
+    _assert_same_results(results)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import networkx as nx
+import numpy as np
+from juicer.scikit_learn.etl_operation import CleanMissingOperation, \
+    SortOperation, TransformationOperation
+from juicer.scikit_learn.liveness import get_consumers, get_dead_inputs, \
+    release_dead_data, state_cache_enabled
+from tests.scikit_learn import util
+
+
+def _get_transformation(input_name, output_name):
+    return TransformationOperation(
+        {'expression': [{'alias': 'sepallength', 'tree': {
+            'type': 'BinaryExpression', 'operator': '*',
+            'left': {'type': 'Identifier', 'name': 'sepallength'},
+            'right': {'type': 'Literal', 'value': 2}}}]},
+        {'input data': input_name}, {'output data': output_name})
+
+
+def _get_clean_missing(input_name, output_name, parameters=None):
+    return CleanMissingOperation(
+        dict(parameters or {}, attributes=['sepalwidth'],
+             cleaning_mode='VALUE', value='0'),
+        {'input data': input_name}, {'output result': output_name})
+
+
+def _get_workflow():
+    # sort -> transformation_1 -> clean
+    #                          +-> transformation_2 -> transformation_3
+    instances = {
+        'sort': SortOperation(
+            {'attributes': [{'attribute': 'sepalwidth', 'f': 'asc'}]},
+            {'input data': 'df'}, {'output data': 'df_1'}),
+        'transformation_1': _get_transformation('df_1', 'df_2'),
+        'clean': _get_clean_missing('df_2', 'df_3'),
+        'transformation_2': _get_transformation('df_2', 'df_4'),
+        'transformation_3': _get_transformation('df_4', 'df_5'),
+    }
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(instances.keys())
+    for source_id, target_id, port in [
+            ('sort', 'transformation_1', 'sort-out'),
+            ('transformation_1', 'clean', 't1-out'),
+            ('transformation_1', 'transformation_2', 't1-out'),
+            ('transformation_2', 'transformation_3', 't2-out')]:
+        graph.add_edge(source_id, target_id, attr_dict={
+            'source_port': port, 'target_port_name': 'input data'})
+    return graph, instances
+
+
+def test_state_cache_enabled_success():
+    assert state_cache_enabled({})
+    assert not state_cache_enabled(
+        {'juicer': {'scikit_learn': {'state_cache': {'enabled': False}}}})
+
+
+def test_liveness_dead_inputs_success():
+    graph, instances = _get_workflow()
+    dead_inputs = get_dead_inputs(graph, instances)
+    assert dead_inputs['sort'] == set()
+    assert dead_inputs['transformation_1'] == {'input data'}
+    # Output of transformation_1 is used by many tasks
+    assert dead_inputs['clean'] == set()
+    assert dead_inputs['transformation_2'] == set()
+    # Output of transformation_2 may share data with its input
+    assert dead_inputs['transformation_3'] == set()
+
+    assert get_consumers(graph, instances) == {
+        'sort': 1, 'transformation_1': 2, 'clean': 0,
+        'transformation_2': 1, 'transformation_3': 0}
+
+
+def test_liveness_changes_dead_inputs_in_place_success():
+    graph, instances = _get_workflow()
+    assert '.copy()' in instances['transformation_1'].generate_code()
+
+    release_dead_data(graph, instances)
+    assert instances['transformation_1'].parameters['consumers'] == 2
+
+    df = util.iris(['sepallength', 'sepalwidth'], size=10)
+    df.loc[0, 'sepalwidth'] = np.NaN
+    code = instances['transformation_1'].generate_code()
+    assert '.copy()' not in code
+    data = df.copy()
+    result = util.execute(code, {'df_1': data})
+    assert result['df_2'] is data
+    assert data['sepallength'].equals(df['sepallength'] * 2)
+
+    # Inputs used by other tasks are still copied
+    data = df.copy()
+    result = util.execute(instances['clean'].generate_code(), {'df_2': data})
+    assert result['df_3'].loc[0, 'sepalwidth'] == 0
+    assert data.equals(df)
+
+    clean = _get_clean_missing('df_2', 'df_3',
+                               {'dead_inputs': {'input data'}})
+    result = util.execute(clean.generate_code(), {'df_2': data})
+    assert result['df_3'] is data
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from juicer.scikit_learn import memory
+from juicer.scikit_learn.data_operation import DataReaderOperation
+from tests.scikit_learn import util
+
+
+def _get_data(total_rows=1000):
+    rnd = np.random.RandomState(42)
+    return pd.DataFrame({
+        'id': np.arange(total_rows, dtype='int64'),
+        'big': np.arange(total_rows, dtype='int64') * 2 ** 40,
+        'quantity': rnd.randint(0, 100, total_rows).astype('float64'),
+        'value': rnd.rand(total_rows),
+        'class': rnd.choice(['Iris-setosa', 'Iris-virginica'], total_rows),
+        'name': ['name {}'.format(i) for i in range(total_rows)],
+        'missing': rnd.choice(['a', None], total_rows),
+    })
+
+
+def test_optimize_dtypes_success():
+    df = _get_data()
+    original = df.copy()
+    result, report = memory.optimize_dtypes(
+        df, string_dtype='string[pyarrow]', downcast_integers=True)
+    dtypes = result.dtypes.astype(str).to_dict()
+    assert dtypes == {
+        'id': 'int32',
+        'big': 'int64',  # Does not fit in 32 bits
+        'quantity': 'float32',  # Lossless
+        'value': 'float64',
+        'class': 'category',
+        'name': 'string',  # string[pyarrow]
+        'missing': 'object',  # Missing values, not converted to category
+    }
+    # No value changed
+    for name in original.columns:
+        assert (result[name].astype(object) == original[name]).sum() == \
+               original[name].notnull().sum()
+
+    assert [r[0] for r in report] == ['id', 'quantity', 'class', 'name']
+    assert all(after < before for _, _, _, before, after in report)
+    assert len(memory.format_report(report)) == len(report) + 1
+
+
+def test_optimize_dtypes_limonero_stats_success():
+    df = _get_data()
+    # Statistics from Limonero are used instead of sampling data
+    attributes = [{'name': 'class', 'distinct_values': 900}]
+    result, report = memory.optimize_dtypes(df, attributes)
+    assert result['class'].dtype.name == 'object'
+    assert 'class' not in [r[0] for r in report]
+
+
+def test_optimize_dtypes_keep_integers_success():
+    df = _get_data()
+    # Arithmetic between int32 columns overflows, unless enabled
+    result, report = memory.optimize_dtypes(df)
+    assert result['id'].dtype.name == 'int64'
+    assert 'id' not in [r[0] for r in report]
+
+
+def test_data_reader_memory_optimization_success(tmp_path):
+    # Used by generated code to report the memory saved
+    from juicer.spark.reports import SimpleTableReport
+
+    df = _get_data(100)
+    path = tmp_path / 'data.csv'
+    df.to_csv(path, index=False)
+    metadata = {
+        'url': 'file://{}'.format(path), 'format': 'CSV', 'storage': {},
+        'attributes': [], 'is_first_line_header': True,
+        'updated': '2021-01-01T00:00:00',
+    }
+    configuration = {'juicer': {
+        'services': {'limonero': {'url': 'http://limonero', 'auth_token': 1}},
+        'scikit_learn': {'memory_optimization': {'enabled': True}}}}
+    instance = DataReaderOperation(
+        {'data_source': 1, 'configuration': configuration,
+         'infer_schema': 'FROM_VALUES',
+         'workflow': {'data_source_cache': {1: metadata}}},
+        {}, {'output data': 'out'})
+
+    events = []
+    result = util.execute(instance.generate_code(), {
+        'memory': memory, 'task_id': '1',
+        'SimpleTableReport': SimpleTableReport,
+        'emit_event': lambda **kwargs: events.append(kwargs)})
+    assert result['out']['class'].dtype.name == 'category'
+    assert result['out']['id'].dtype.name == 'int64'
+    assert len(events) == 1 and events[0]['type'] == 'HTML'
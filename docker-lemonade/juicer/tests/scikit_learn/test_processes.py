@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pandas as pd
+from juicer.runner.code_cache import CodeCache
+from juicer.scikit_learn import processes
+from tests.scikit_learn import util
+
+
+def _train(emit_event, df, factor):
+    emit_event('update task', status='COMPLETED', message=os.getpid())
+    out = df.copy()
+    out['prediction'] = out['sepallength'] * factor
+    return out, {'model': factor}
+
+
+def _get_data():
+    df = util.iris(size=20)
+    df.index = df.index * 2
+    df['class'] = df['class'].astype('category')
+    df['sepalwidth'] = df['sepalwidth'].astype('float32')
+    return df
+
+
+def test_shared_frame_success(tmp_path):
+    df = _get_data()
+    shared = processes.share(df, str(tmp_path))
+    assert isinstance(shared, processes.SharedFrame)
+    # Types and row labels are kept
+    assert shared.load().equals(df)
+    shared.release()
+    assert os.listdir(str(tmp_path)) == []
+
+    # Not supported by Arrow, pickled
+    mixed = pd.DataFrame({'value': [1, 'a', 2.0]})
+    assert processes.share(mixed, str(tmp_path)) is mixed
+    assert processes.share('model', str(tmp_path)) == 'model'
+
+
+def test_process_pool_success(tmp_path):
+    df = _get_data()
+    events = []
+    pool = processes.create_pool(2, str(tmp_path))
+    try:
+        out, model = processes.run(
+            pool, _train, lambda *args, **kwargs: events.append(
+                (args, kwargs)), df, 2)
+    finally:
+        pool.shutdown()
+    assert out['prediction'].equals(df['sepallength'] * 2)
+    assert out.drop(columns=['prediction']).equals(df)
+    assert model == {'model': 2}
+    # Events are emitted by the parent process
+    assert len(events) == 1 and events[0][0] == ('update task',)
+    assert events[0][1]['message'] != os.getpid()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_process_pool_fallback_to_thread_success():
+    df = _get_data()
+    events = []
+
+    def emit_event(*args, **kwargs):
+        events.append(kwargs)
+
+    assert processes.create_pool(0) is None
+    out, _ = processes.run(None, _train, emit_event, df, 3)
+    assert out['prediction'].equals(df['sepallength'] * 3)
+    assert events[0]['message'] == os.getpid()
+
+    # Functions that cannot be sent to workers (e.g. not defined in a
+    # module) run in the current thread
+    def local_train(emit, data):
+        return _train(emit, data, 4)
+
+    pool = processes.create_pool(1)
+    try:
+        out, _ = processes.run(pool, local_train, emit_event, df)
+    finally:
+        pool.shutdown()
+    assert events[1]['message'] == os.getpid()
+
+
+def test_process_pool_generated_code_success():
+    # Generated code is loaded from memory, workers receive its source
+    source = ('import os\n'
+              'def task_code(emit_event, value):\n'
+              '    return value * 2, os.getpid()\n')
+    module = CodeCache().load('juicer_app_test_processes', source)
+    pool = processes.create_pool(2)
+    try:
+        value, pid = processes.run(pool, module.task_code, None, 21)
+        # Workers are shared by jobs (and map functions)
+        assert processes.create_pool(1).executor is pool.executor
+    finally:
+        pool.shutdown()
+    assert value == 42 and pid != os.getpid()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import networkx as nx
+from juicer.scikit_learn.data_operation import DataReaderOperation
+from juicer.scikit_learn.etl_operation import FilterOperation, \
+    SelectOperation, SortOperation, TransformationOperation
+from juicer.scikit_learn.pushdown import get_filters, \
+    get_required_columns, push_down
+
+COLUMNS = ['c{}'.format(i) for i in range(200)]
+
+
+def _get_reader(data_format='PARQUET'):
+    metadata = {
+        'url': 'file:///tmp/wide.parquet', 'format': data_format,
+        'storage': {}, 'is_first_line_header': True,
+        'attributes': [{'name': name, 'type': 'DOUBLE'} for name in COLUMNS],
+        'updated': '2021-01-01T00:00:00',
+    }
+    configuration = {'juicer': {'services': {
+        'limonero': {'url': 'http://limonero', 'auth_token': 1}}}}
+    parameters = {'data_source': 1, 'configuration': configuration,
+                  'workflow': {'data_source_cache': {1: metadata}},
+                  'hash': 'reader'}
+    return DataReaderOperation(parameters, {}, {'output data': 'df'})
+
+
+def _get_workflow(select_mode='include'):
+    # c1 > 0.5 && 2 >= c2 && upper(c3) == 'A'
+    condition = {
+        'type': 'LogicalExpression', 'operator': '&&',
+        'left': {
+            'type': 'LogicalExpression', 'operator': '&&',
+            'left': {'type': 'BinaryExpression', 'operator': '>',
+                     'left': {'type': 'Identifier', 'name': 'c1'},
+                     'right': {'type': 'Literal', 'value': 0.5}},
+            'right': {'type': 'BinaryExpression', 'operator': '>=',
+                      'left': {'type': 'Literal', 'value': 2},
+                      'right': {'type': 'Identifier', 'name': 'c2'}}},
+        'right': {
+            'type': 'BinaryExpression', 'operator': '==',
+            'left': {'type': 'CallExpression',
+                     'callee': {'type': 'Identifier', 'name': 'upper'},
+                     'arguments': [{'type': 'Identifier', 'name': 'c3'}]},
+            'right': {'type': 'Literal', 'value': 'A'}}}
+    instances = {
+        'reader': _get_reader(),
+        'filter': FilterOperation(
+            {'expression': [{'tree': condition}], 'hash': 'filter'},
+            {'input data': 'df'}, {'output data': 'df_1'}),
+        'transformation': TransformationOperation(
+            {'expression': [{'alias': 'c4', 'tree': {
+                'type': 'BinaryExpression', 'operator': '*',
+                'left': {'type': 'Identifier', 'name': 'c5'},
+                'right': {'type': 'Literal', 'value': 2}}}],
+                'hash': 'transformation'},
+            {'input data': 'df_1'}, {'output data': 'df_2'}),
+        'sort': SortOperation(
+            {'attributes': [{'attribute': 'c6', 'f': 'asc'}],
+             'hash': 'sort'},
+            {'input data': 'df_2'}, {'output data': 'df_3'}),
+        'select': SelectOperation(
+            {'attributes': [{'attribute': 'c4'}, {'attribute': 'c7'}],
+             'mode': select_mode, 'hash': 'select'},
+            {'input data': 'df_3'}, {'output projected data': 'df_4'}),
+    }
+    graph = nx.MultiDiGraph()
+    task_ids = list(instances.keys())
+    graph.add_nodes_from(task_ids)
+    for source_id, target_id in zip(task_ids, task_ids[1:]):
+        graph.add_edge(source_id, target_id)
+    return graph, instances
+
+
+def test_pushdown_required_columns_success():
+    graph, instances = _get_workflow()
+    required = get_required_columns(graph, instances)
+    assert required['select'] is None
+    assert required['sort'] == {'c4', 'c7'}
+    # c4 is created by the transformation
+    assert required['transformation'] == {'c4', 'c6', 'c7'}
+    assert required['filter'] == {'c5', 'c6', 'c7'}
+    assert required['reader'] == {'c1', 'c2', 'c3', 'c5', 'c6', 'c7'}
+
+    # Conditions not comparing an attribute and a literal are not used
+    assert get_filters(graph, instances, 'reader') == [
+        ('c1', '>', 0.5), ('c2', '<=', 2)]
+    assert get_filters(graph, instances, 'filter') == []
+
+
+def test_pushdown_success():
+    graph, instances = _get_workflow()
+    changed = push_down(graph, instances)
+    reader = instances['reader']
+    assert reader.pushdown_columns == ['c1', 'c2', 'c3', 'c5', 'c6', 'c7']
+    assert reader.pushdown_filters == [('c1', '>', 0.5), ('c2', '<=', 2)]
+
+    code = reader.generate_code()
+    assert "columns=['c1', 'c2', 'c3', 'c5', 'c6', 'c7']" in code
+    assert "filters=[('c1', '>', 0.5), ('c2', '<=', 2)]" in code
+
+    # Outputs with fewer columns must not reuse cached results
+    assert sorted(changed) == ['filter', 'reader', 'sort', 'transformation']
+    assert instances['filter'].parameters['hash'] != 'filter'
+    assert instances['select'].parameters['hash'] == 'select'
+
+
+def test_pushdown_all_columns_required_success():
+    # All columns are used, only the filters are pushed down
+    graph, instances = _get_workflow(select_mode='exclude')
+    assert get_required_columns(graph, instances)['reader'] is None
+    push_down(graph, instances)
+    assert instances['reader'].pushdown_columns is None
+    assert instances['reader'].pushdown_filters == [
+        ('c1', '>', 0.5), ('c2', '<=', 2)]
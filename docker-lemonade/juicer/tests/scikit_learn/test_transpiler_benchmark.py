@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of code generation (transpiling is on the critical path of
+every execution requested by the user). Run with -s to see the timings.
+"""
+from io import StringIO
+from timeit import default_timer as timer
+
+import networkx as nx
+
+from juicer.scikit_learn.transpiler import ScikitLearnTranspiler
+from juicer.transpiler import get_template_environment
+
+TOTAL_TASKS = 100
+
+
+def _get_workflow(total_tasks=TOTAL_TASKS):
+    """ Builds a workflow (and its graph) with a chain of tasks """
+    tasks = []
+    flows = []
+    graph = nx.MultiDiGraph()
+    for i in range(total_tasks):
+        task_id = 'task-{}'.format(i)
+        if i == 0:
+            slug = 'execute-python'
+            forms = {'code': {'value': 'out1 = in1',
+                              'category': 'execution'}}
+        else:
+            slug = 'sort'
+            forms = {'attributes': {
+                'value': [{'attribute': 'sepalwidth', 'f': 'asc'}],
+                'category': 'execution'}}
+        task = {'id': task_id, 'name': 'Task {}'.format(i), 'enabled': True,
+                'display_order': i, 'forms': forms,
+                'operation': {'id': i, 'slug': slug}}
+        tasks.append(task)
+        graph.add_node(task_id, name=task['name'],
+                       operation=task['operation'], parents=[],
+                       attr_dict=task)
+        if i > 0:
+            flow = {'source_id': 'task-{}'.format(i - 1),
+                    'target_id': task_id,
+                    'source_port': 2 * i, 'target_port': 2 * i + 1,
+                    'source_port_name': 'output data',
+                    'target_port_name': 'input data'}
+            flows.append(flow)
+            graph.add_edge(flow['source_id'], task_id, attr_dict=flow)
+            graph.nodes[task_id]['parents'].append(flow['source_id'])
+
+    workflow = {'id': 1, 'name': 'Benchmark', 'type': 'WORKFLOW',
+                'tasks': tasks, 'flows': flows, 'disabled_tasks': {},
+                'user': {'id': 1, 'login': 'lemonade', 'name': 'Lemonade'}}
+    return workflow, graph
+
+
+def _transpile(format_code):
+    workflow, graph = _get_workflow()
+    transpiler = ScikitLearnTranspiler({'juicer': {}})
+    out = StringIO()
+    start = timer()
+    transpiler.transpile(workflow, graph, {}, out, job_id=1, persist=False,
+                         format_code=format_code)
+    return timer() - start, out.getvalue()
+
+
+def test_transpiler_benchmark_100_tasks_success():
+    timings = {}
+    for format_code in [True, False]:
+        for run in ['cold', 'warm']:
+            elapsed, code = _transpile(format_code)
+            timings[(format_code, run)] = elapsed
+            # Generated code must be valid, formatted or not
+            compile(code, '<benchmark>', 'exec')
+            # Last task has no output, so it does not generate code
+            assert code.count('def sort_') == TOTAL_TASKS - 2
+
+    for (format_code, run), elapsed in timings.items():
+        print('Transpiling {} tasks (autopep8: {}, {}): {:.3f}s'.format(
+            TOTAL_TASKS, format_code, run, elapsed))
+
+    # Templates are compiled once per process
+    template_dir = ScikitLearnTranspiler({'juicer': {}}).template_dir
+    assert get_template_environment(template_dir) is \
+        get_template_environment(template_dir)
+
+
+def test_transpiler_skip_format_for_execution_only_code_success():
+    workflow, graph = _get_workflow(total_tasks=2)
+    transpiler = ScikitLearnTranspiler({'juicer': {}})
+
+    persisted = StringIO()
+    transpiler.transpile(workflow, graph, {}, persisted, job_id=1)
+    workflow, graph = _get_workflow(total_tasks=2)
+    executed = StringIO()
+    transpiler.transpile(workflow, graph, {}, executed, job_id=1,
+                         persist=False)
+
+    # autopep8 removes extra blank lines generated by the template
+    assert '\n\n\n\n' not in persisted.getvalue()
+    assert '\n\n\n\n' in executed.getvalue()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+from juicer.scikit_learn import text_processing
+from juicer.scikit_learn.text_operation import TokenizerOperation
+from nltk.tokenize import regexp_tokenize
+from tests.scikit_learn import util
+
+
+def test_tokenizer_reused_and_picklable_success():
+    tokenizer = text_processing.get_tokenizer('regex', r'\w+', 2)
+    assert text_processing.get_tokenizer('regex', r'\w+', 2) is tokenizer
+    assert tokenizer('A long, long text') == ['long', 'long', 'text']
+
+    copy = pickle.loads(pickle.dumps(tokenizer))
+    assert copy('A long, long text') == ['long', 'long', 'text']
+
+    stop_words = text_processing.StopWordsFilter(['The', 'a'])
+    assert stop_words(['the', 'A', 'book']) == ['book']
+    stop_words = text_processing.StopWordsFilter(['The', 'a'], True)
+    assert stop_words(['the', 'A', 'book']) == ['the', 'A', 'book']
+    assert text_processing.NGrams(2)(['a', 'b', 'c']) == ['a b', 'b c']
+
+
+def test_map_rows_in_parallel_success(monkeypatch):
+    df = util.iris(['class'], size=150)
+    tokenizer = text_processing.get_tokenizer('regex', r'\w+', None)
+    expected = [tokenizer(text) for text in df['class']]
+    monkeypatch.setattr(text_processing, 'MIN_ROWS_PER_WORKER', 40)
+    # Chunks are processed by 3 workers
+    assert text_processing.map_rows(
+        tokenizer, df['class'].to_numpy(), workers=4) == expected
+    assert text_processing.map_rows(
+        tokenizer, df['class'].to_numpy()[:50], workers=4) == expected[:50]
+
+
+def test_tokenizer_operation_uses_workers_success(monkeypatch):
+    df = util.iris(['class'], size=100)
+    monkeypatch.setattr(text_processing, 'MIN_ROWS_PER_WORKER', 20)
+    instance = TokenizerOperation(
+        {'attributes': ['class'], 'type': 'regex', 'expression': '[A-Z]\\w+',
+         'multiplicity': {'input data': 1},
+         'configuration': {'juicer': {'scikit_learn': {
+             'processes': {'workers': 2}}}}},
+        {'input data': 'df'}, {'output data': 'out'})
+    code = instance.generate_code()
+    assert 'workers=2' in code
+    result = util.execute(code, {'df': df.copy()})
+    assert result['out']['class_tok'].tolist() == [
+        [word for word in regexp_tokenize(row, pattern='[A-Z]\\w+')
+         if len(word) >= 3] for row in df['class']]
@@ -4,8 +4,7 @@ from __future__ import absolute_import
 import json
 
 import pytest
-import requests
-from juicer.service import caipirinha_service
+from juicer.service import caipirinha_service, http_client
 from mock import patch, call
 from . import fake_req
 
@@ -16,7 +15,7 @@ def test_update_caipirinha_success():
         'id': 1,
         'name': 'Visualization'
     }
-    with patch.object(requests, 'post',
+    with patch.object(http_client, 'post',
                       new_callable=fake_req(200, json.dumps(text))):
         resp = caipirinha_service._update_caipirinha(
             "http://caipirinha", "/visualizations", "OK", 1,
@@ -27,7 +26,7 @@ def test_update_caipirinha_success():
     text = {
         'name': 'Visualization'
     }
-    with patch.object(requests, 'post',
+    with patch.object(http_client, 'post',
                       new_callable=fake_req(200, json.dumps(text))):
         resp = caipirinha_service._update_caipirinha(
             "http://caipirinha", "/visualizations", "OK", '',
@@ -39,7 +38,7 @@ def test_update_caipirinha_success():
 # noinspection PyProtectedMember, PyUnresolvedReferences
 def test_update_caipirinha_fail():
     text = "Not found"
-    with patch.object(requests, 'post',
+    with patch.object(http_client, 'post',
                       new_callable=fake_req(404, json.dumps(text))):
         with pytest.raises(RuntimeError):
             resp = caipirinha_service._update_caipirinha(
@@ -62,7 +61,7 @@ class VisualizationModel(object):
 
 # noinspection PyProtectedMember, PyUnresolvedReferences
 @patch('tests.service.test_caipirinha_service.emit')
-@patch('requests.post')
+@patch('juicer.service.http_client.post')
 def test_new_dashboard(mocked_post, mocked_emit):
     text = {
         'id': 1,
@@ -145,7 +144,7 @@ def test_new_dashboard(mocked_post, mocked_emit):
 
 # noinspection PyProtectedMember, PyUnresolvedReferences
 @patch('tests.service.test_caipirinha_service.emit')
-@patch('requests.post')
+@patch('juicer.service.http_client.post')
 def test_new_visualization(mocked_post, mocked_emit):
     text = {
         'id': 1,
@@ -8,7 +8,7 @@ from mock import patch
 from . import fake_req
 
 
-@patch('requests.get')
+@patch('juicer.service.http_client.get')
 def test_get_storage_info_success(mocked_get):
     storage_id = 700
     text = {
@@ -29,7 +29,7 @@ def test_get_storage_info_success(mocked_get):
         headers={'X-Auth-Token': '00000'})
 
 
-@patch('requests.get')
+@patch('juicer.service.http_client.get')
 def test_get_storage_info_failure(mocked_get):
     storage_id = 700
     text = {
@@ -49,7 +49,7 @@ def test_get_storage_info_failure(mocked_get):
             assert v == text[k]
 
 
-@patch('requests.get')
+@patch('juicer.service.http_client.get')
 def test_get_data_source_info_success(mocked_get):
     data_source_id = 700
     text = {
@@ -70,7 +70,7 @@ def test_get_data_source_info_success(mocked_get):
         headers={'X-Auth-Token': '00000'})
 
 
-@patch('requests.get')
+@patch('juicer.service.http_client.get')
 def test_get_all_data_sources_success(mocked_get):
     data_source_id = 700
     text = {
@@ -91,7 +91,7 @@ def test_get_all_data_sources_success(mocked_get):
         headers={'X-Auth-Token': '00000'})
 
 
-@patch('requests.get')
+@patch('juicer.service.http_client.get')
 def test_get_data_source_info_failure(mocked_get):
     data_source_id = 700
     text = {
@@ -0,0 +1,147 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+
+import pytest
+from juicer.service import http_client, limonero_service, metadata_cache, \
+    tahiti_service
+from mock import patch
+from . import FakeResponse
+
+
+@pytest.fixture
+def cache():
+    yield metadata_cache.configure(
+        {'juicer': {'metadata_cache': {'ttl': 300}}})
+    metadata_cache.configure({'juicer': {'metadata_cache': {
+        'enabled': False}}})
+
+
+def _fake_limonero(data_sources, requested):
+    def f(url, **kwargs):
+        requested.append(url)
+        if url.endswith('/datasources'):
+            ids = kwargs['params']['ids[]']
+            data = [{'id': ds['id'], 'updated': ds['updated']}
+                    for ds in data_sources.values() if ds['id'] in ids]
+            return FakeResponse(200, json.dumps({'data': data}), [url],
+                                kwargs)
+        ds = data_sources[int(url.split('/')[-1])]
+        return FakeResponse(200, json.dumps(ds), [url], kwargs)
+
+    return f
+
+
+def test_metadata_cache_configure_success():
+    # Enabled by default (minions), unless disabled in configuration
+    try:
+        assert metadata_cache.configure({}) is metadata_cache.get_cache()
+        assert metadata_cache.get_cache().ttl == 300
+        metadata_cache.configure(
+            {'juicer': {'metadata_cache': {'enabled': False}}})
+        assert metadata_cache.get_cache() is None
+    finally:
+        metadata_cache.configure(
+            {'juicer': {'metadata_cache': {'enabled': False}}})
+
+
+def test_metadata_cache_expiration_success():
+    cache = metadata_cache.MetadataCache(ttl=300, max_size=2)
+    cache.put('a', {'id': 1}, '2021-01-01')
+    value = cache.get('a')
+    assert value == {'id': 1}
+    # Values are copied
+    value['id'] = 2
+    assert cache.get('a') == {'id': 1}
+
+    cache.ttl = -1
+    cache.put('b', {'id': 2}, '2021-01-01')
+    assert cache.get('b') is None
+    assert cache.get_expired(['a', 'b']) == {'b': '2021-01-01'}
+    cache.ttl = 300
+    assert cache.revalidate('b', '2021-01-01')
+    assert cache.get('b') == {'id': 2}
+    assert not cache.revalidate('b', '2021-02-01')
+    assert cache.get_expired(['a', 'b']) == {}
+
+    cache.put('c', {'id': 3})
+    cache.put('d', {'id': 4})
+    assert len(cache) == 2
+
+
+# noinspection PyProtectedMember
+def test_get_data_sources_info_bulk_success(cache):
+    data_sources = {
+        1: {'id': 1, 'name': 'ds1', 'updated': '2021-01-01T00:00:00'},
+        2: {'id': 2, 'name': 'ds2', 'updated': '2021-01-01T00:00:00'},
+    }
+    requested = []
+    with patch.object(http_client, 'get',
+                      side_effect=_fake_limonero(data_sources, requested)):
+        result = limonero_service.get_data_sources_info(
+            'http://limonero', '00000', [1, 2, 1])
+        assert result == data_sources
+        assert sorted(requested) == ['http://limonero/datasources/1',
+                                     'http://limonero/datasources/2']
+
+        # Cached
+        del requested[:]
+        limonero_service.get_data_sources_info('http://limonero', '00000',
+                                               [1, 2])
+        assert requested == []
+
+        # Expired entries are revalidated, only ds2 was updated
+        for key, entry in list(cache._entries.items()):
+            cache._entries[key] = (0,) + entry[1:]
+        data_sources[2]['updated'] = '2021-02-01T00:00:00'
+        del requested[:]
+        result = limonero_service.get_data_sources_info(
+            'http://limonero', '00000', [1, 2])
+        assert requested == ['http://limonero/datasources',
+                             'http://limonero/datasources/2']
+        assert result[2]['updated'] == '2021-02-01T00:00:00'
+
+
+def test_get_data_sources_info_ignore_errors_success():
+    def fake_get(url, **kwargs):
+        if url.endswith('/2'):
+            return FakeResponse(404, 'Not found', [url], kwargs)
+        return FakeResponse(200, json.dumps({'id': 1}), [url], kwargs)
+
+    with patch.object(http_client, 'get', side_effect=fake_get):
+        with pytest.raises(ValueError):
+            limonero_service.get_data_sources_info(
+                'http://limonero', '00000', [1, 2])
+        result = limonero_service.get_data_sources_info(
+            'http://limonero', '00000', [1, 2], ignore_errors=True)
+        assert result == {1: {'id': 1}}
+
+
+def test_get_operations_cache_success(cache):
+    requested = []
+
+    def fake_get(url, **kwargs):
+        requested.append(url)
+        ids = [int(p.split('=')[1]) for p in url.split('?')[1].split('&')
+               if p.startswith('ids')]
+        data = [{'id': op_id, 'slug': 'op-{}'.format(op_id)} for op_id in ids]
+        return FakeResponse(200, json.dumps({'data': data}), [url], kwargs)
+
+    with patch.object(http_client, 'get', side_effect=fake_get):
+        operations = tahiti_service.get_operations(
+            'http://tahiti', '00000', [1, 2, 1])
+        assert [op['id'] for op in operations] == [1, 2]
+        operations = tahiti_service.get_operations(
+            'http://tahiti', '00000', [2, 3])
+        assert sorted(op['id'] for op in operations) == [2, 3]
+    assert requested == [
+        'http://tahiti/operations?lang=en&ids[]=1&ids[]=2',
+        'http://tahiti/operations?lang=en&ids[]=3']
+
+
+def test_http_client_session_reused_success():
+    session = http_client.get_session()
+    assert session is http_client.get_session()
+    assert session.get_adapter('http://limonero').max_retries.total == \
+        http_client.MAX_RETRIES
@@ -105,7 +105,6 @@ def test_data_reader_minimal_parameters_success():
                             quote=None, encoding='UTF-8',
                             header=False, sep=',',
                             inferSchema=False, mode='FAILFAST')
-        {output}.cache()
         """.format(url=url, output='output_1'))
     expected_tree = ast.parse(expected_code)
     result, msg = compare_ast(generated_tree, expected_tree)
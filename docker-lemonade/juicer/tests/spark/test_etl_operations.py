@@ -242,6 +242,40 @@ def test_clean_missing_minimal_params_type_value_success():
     assert result, msg + format_code_comparison(code, expected_code)
 
 
+@pytest.mark.parametrize('mode', [CleanMissingOperation.MEAN,
+                                  CleanMissingOperation.MEDIAN,
+                                  CleanMissingOperation.MODE])
+def test_clean_missing_statistics_success(mode):
+    params = {
+        CleanMissingOperation.ATTRIBUTES_PARAM: ['name', 'age'],
+        CleanMissingOperation.MIN_MISSING_RATIO_PARAM: "0.0",
+        CleanMissingOperation.MAX_MISSING_RATIO_PARAM: "0.5",
+        CleanMissingOperation.CLEANING_MODE_PARAM: mode
+    }
+    n_in = {'input data': 'input_1'}
+    n_out = {'output result': 'output_1'}
+    instance = CleanMissingOperation(params, named_inputs=n_in,
+                                     named_outputs=n_out)
+    code = instance.generate_code()
+    # Ratios and statistics of all attributes are computed by a single call
+    assert code.count('get_missing_statistics') == 1
+    assert dedent("""
+    ratio_input_1, values_input_1 = juicer_ext.get_missing_statistics(
+        input_1, ["name", "age"], ratio=True, statistic='{}')""".format(
+        mode)) in code
+    assert 'if 0.0 <= ratio_input_1[c] <= 0.5]' in code
+    assert 'output_1 = input_1.na.fill(value=dict(' in code
+    assert 'collect()' not in code
+
+    del params[CleanMissingOperation.MIN_MISSING_RATIO_PARAM]
+    del params[CleanMissingOperation.MAX_MISSING_RATIO_PARAM]
+    instance = CleanMissingOperation(params, named_inputs=n_in,
+                                     named_outputs=n_out)
+    code = instance.generate_code()
+    assert code.count('get_missing_statistics') == 1
+    assert 'for ' not in code.split('na.fill')[0]
+
+
 def test_clean_missing_missing_attribute_param_failure():
     params = {}
     with pytest.raises(ValueError):
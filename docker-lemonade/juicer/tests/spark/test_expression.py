@@ -306,3 +306,32 @@ def test_get_windows_function_success():
         expected_code))
     assert result, msg + format_code_comparison(expr.parsed_expression,
                                                 expected_code)
+
+
+@pytest.mark.parametrize('name, expected_code', [
+    ('strip_accents', "juicer_ext.strip_accents(functions.col('text'))"),
+    ('strip_punctuation',
+     "juicer_ext.remove_punctuation(functions.col('text'))"),
+    ('set_of_strings',
+     "juicer_ext.distinct_values(functions.col('text'), 'StringType')"),
+])
+def test_text_functions_without_udf_success(name, expected_code):
+    json_code = {
+        "type": "CallExpression",
+        "arguments": [{"type": "Identifier", "name": "text"}],
+        "callee": {"type": "Identifier", "name": name}
+    }
+    expr = Expression(json_code, {})
+    assert expr.parsed_expression == expected_code
+
+
+def test_set_function_with_input_success():
+    json_code = {
+        "type": "CallExpression",
+        "arguments": [{"type": "Identifier", "name": "features"}],
+        "callee": {"type": "Identifier", "name": "set_of_floats"}
+    }
+    expr = Expression(json_code, {'input': 'df'})
+    # Input data frame is used to identify vector columns
+    assert expr.parsed_expression == (
+        "juicer_ext.distinct_values(df['features'], 'FloatType', df)")
@@ -0,0 +1,106 @@
+# coding=utf-8
+"""
+Micro-benchmark of functions used in Spark expressions, comparing the
+implementation selected for the running Spark version (native functions or
+Arrow based UDFs) and the Python UDFs (row by row) previously used. Requires
+pyspark. Run with -s to see the timings.
+"""
+from timeit import default_timer as timer
+
+import pytest
+
+pyspark = pytest.importorskip('pyspark')
+
+import juicer.spark.ext as juicer_ext
+from pyspark.ml.feature import VectorAssembler
+from pyspark.sql import SparkSession, functions, types
+
+TOTAL_ROWS = 200000
+TEXTS = ['Ação, reação!', 'Não há cão; só pão.', 'Olá (mundo)...',
+         'Fiação e pêssego?', 'texto sem acentos']
+
+
+@pytest.fixture(scope='module')
+def spark_session():
+    session = SparkSession.builder.master('local[2]').appName(
+        'juicer-ext-benchmark').getOrCreate()
+    yield session
+    session.stop()
+
+
+@pytest.fixture(scope='module')
+def df(spark_session):
+    row_id = functions.col('id') + 1
+    data = spark_session.range(TOTAL_ROWS).select(
+        functions.array(*[functions.lit(t) for t in TEXTS])[
+            functions.col('id') % len(TEXTS)].alias('text'),
+        functions.array(*[(row_id % m).cast('int') for m in (5, 3, 5)]
+                        ).alias('values'),
+        row_id.cast('double').alias('first'),
+        (row_id / 2.0).alias('second'))
+    data = VectorAssembler(inputCols=['first', 'second'],
+                           outputCol='features').transform(data)
+    return data.cache()
+
+
+def _execute(df, column):
+    start = timer()
+    # Hash of all results, so they are computed (and compared) in Spark
+    result = df.select(column.alias('value')).agg(
+        functions.sum(functions.hash('value'))).first()[0]
+    return result, timer() - start
+
+
+def _compare(name, df, column, udf_column):
+    # First execution caches data
+    _execute(df, functions.col('text'))
+    result, elapsed = _execute(df, column)
+    udf_result, udf_elapsed = _execute(df, udf_column)
+    print('\n{}: {:.3f}s (Python UDF: {:.3f}s)'.format(
+        name, elapsed, udf_elapsed))
+    assert result == udf_result
+
+
+def test_strip_accents_benchmark_success(df):
+    text = functions.col('text')
+    _compare('strip_accents', df, juicer_ext.strip_accents(text),
+             juicer_ext.strip_accents_udf(text))
+
+
+def test_remove_punctuation_benchmark_success(df):
+    text = functions.col('text')
+    _compare('remove_punctuation', df, juicer_ext.remove_punctuation(text),
+             juicer_ext.remove_punctuation_udf(text))
+
+
+def test_ith_function_benchmark_success(df):
+    features = functions.col('features')
+    _compare('ith', df, juicer_ext.ith_function(features, functions.lit(1)),
+             juicer_ext.ith_function_udf(features, functions.lit(1)))
+
+
+def test_translate_function_benchmark_success(df):
+    text = functions.col('text')
+    pairs = [[TEXTS[0], 'first'], [TEXTS[1], 'second']]
+    lookup = dict(pairs)
+    udf = functions.udf(lambda v: lookup.get(v, v), types.StringType())
+    _compare('translate', df,
+             juicer_ext.translate_function(text, 'keep', 'string', pairs),
+             udf(text))
+
+
+def test_distinct_values_benchmark_success(df):
+    values = functions.col('values')
+    udf = functions.udf(lambda v: [x for x in set(v) if x != ''],
+                        types.ArrayType(types.IntegerType()))
+    _compare('distinct_values', df,
+             functions.array_sort(
+                 juicer_ext.distinct_values(values, 'IntegerType')),
+             functions.array_sort(udf(values)))
+
+
+def test_distinct_values_vector_success(df):
+    features = functions.col('features')
+    result = df.select(functions.array_sort(juicer_ext.distinct_values(
+        features, 'FloatType', df)).alias('value')).head(3)
+    assert [r.value for r in result] == [[0.5, 1.0], [1.0, 2.0], [1.5, 3.0]]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import networkx as nx
+from juicer.spark.data_operation import DataReaderOperation
+from juicer.spark.etl_operation import FilterOperation, SelectOperation
+from juicer.spark.ml_operation import ClusteringModelOperation
+from juicer.spark.storage import DISK_ONLY, MEMORY_AND_DISK, \
+    MEMORY_AND_DISK_SER, plan_storage
+
+
+def _reader(data_source_id, out, size=None):
+    metadata = {'format': 'CSV', 'url': 'hdfs://server/data.csv',
+                'storage': {}, 'attributes': [],
+                'estimated_size_in_mega_bytes': size}
+    parameters = {
+        'data_source': data_source_id,
+        'configuration': {'juicer': {'services': {'limonero': {
+            'url': 'http://limonero', 'auth_token': '123'}}}},
+        'workflow': {'data_source_cache': {data_source_id: metadata}},
+    }
+    return DataReaderOperation(parameters, {}, {'output data': out})
+
+
+def _get_workflow():
+    """
+    r1 -> s1 -> (f1, s2)   data is reused after a projection
+    r2 -> m2               data is read by an iterative algorithm
+    r3 -> f3               data is not reused
+    """
+    instances = {
+        'r1': _reader(1, 'df1'),
+        's1': SelectOperation({'attributes': ['a']}, {'input data': 'df1'},
+                              {'output data': 'df2'}),
+        'f1': FilterOperation({'expression': []}, {'input data': 'df2'},
+                              {'output data': 'df3'}),
+        's2': SelectOperation({'attributes': ['a']}, {'input data': 'df2'},
+                              {'output data': 'df4'}),
+        'r2': _reader(2, 'df5', size=5000),
+        'm2': ClusteringModelOperation(
+            {'features': ['a']},
+            {'train input data': 'df5', 'algorithm': 'alg'},
+            {'model': 'model'}),
+        'r3': _reader(3, 'df6'),
+        'f3': FilterOperation({'expression': []}, {'input data': 'df6'},
+                              {'output data': 'df7'}),
+    }
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(instances)
+    graph.add_edges_from([('r1', 's1'), ('s1', 'f1'), ('s1', 's2'),
+                          ('r2', 'm2'), ('r3', 'f3')])
+    return graph, instances
+
+
+def test_plan_storage_success():
+    graph, instances = _get_workflow()
+    plan_storage(graph, instances, {})
+
+    levels = {task_id: instance.parameters.get('storage_level')
+              for task_id, instance in instances.items()
+              if instance.parameters.get('storage_level')}
+    # Persisted after the projection, in disk if data is large
+    assert levels == {'s1': MEMORY_AND_DISK_SER, 'r2': DISK_ONLY}
+    assert instances['s1'].parameters['storage_dependents'] == 2
+    assert instances['f1'].parameters['release_storage'] == ['s1']
+    assert instances['s2'].parameters['release_storage'] == ['s1']
+    assert instances['m2'].parameters['release_storage'] == ['r2']
+    assert 'release_storage' not in instances['f3'].parameters
+    assert '.cache()' not in instances['r1'].generate_code()
+
+
+def test_plan_storage_disabled_success():
+    graph, instances = _get_workflow()
+    plan_storage(graph, instances, {
+        'juicer': {'transpiler': {'storage': {'planning': False}}}})
+    for task_id, instance in instances.items():
+        expected = MEMORY_AND_DISK if task_id.startswith('r') else None
+        assert instance.parameters.get('storage_level') == expected
+        assert 'release_storage' not in instance.parameters
@@ -209,7 +209,7 @@ def atest_area_chart_success(time_series_data):
             }}
         }}
         visualization = {{
-           'job_id': '{job_id}',
+           'job_id': str(get_job_id()),
            'task_id': vis_task_1.task_id,
            'title': vis_task_1.title ,
            'type': {{
@@ -220,7 +220,7 @@ def atest_area_chart_success(time_series_data):
            'data': json.dumps(vis_task_1.get_data(), cls=enc, ignore_nan=True)
         }}
         caipirinha_service.new_visualization(
-           config, {{}}, {workflow_id}, {job_id},
+           config, {{}}, {workflow_id}, get_job_id(),
            '{task_id}',
            visualization, emit_event)""").format(
         task_id=params['task']['id'], **params)
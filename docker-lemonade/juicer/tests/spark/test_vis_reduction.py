@@ -0,0 +1,125 @@
+# coding=utf-8
+import datetime
+
+import pytest
+from juicer.spark import vis_reduction
+
+
+class FakeDataframe(object):
+    def __init__(self, rows):
+        self.rows = rows
+
+    def limit(self, n):
+        return FakeDataframe(self.rows[:n])
+
+    def collect(self):
+        return self.rows
+
+
+def test_get_max_rows_success():
+    assert vis_reduction.get_max_rows({}) == vis_reduction.DEFAULT_MAX_ROWS
+    assert vis_reduction.get_max_rows({'max_rows': '10'}) == 10
+    assert vis_reduction.get_max_rows({'max_rows': 0}) == 0
+
+
+def test_collect_success():
+    df = FakeDataframe(list(range(10)))
+
+    def reduce_function(data, max_rows, step):
+        return FakeDataframe(data.rows[::step])
+
+    # Small data is not reduced
+    assert vis_reduction.collect(df, 10, reduce_function, 2) == df.rows
+    assert vis_reduction.collect(df, 0, reduce_function, 2) == df.rows
+    assert vis_reduction.collect(df, 4, reduce_function, 2) == [0, 2, 4, 6]
+
+
+@pytest.fixture(scope='module')
+def spark_session():
+    pytest.importorskip('pyspark')
+    from pyspark.sql import SparkSession
+    session = SparkSession.builder.master('local[2]').appName(
+        'juicer-vis-reduction').getOrCreate()
+    yield session
+    session.stop()
+
+
+def test_top_with_others_success(spark_session):
+    df = spark_session.createDataFrame(
+        [('a', 10), ('b', 5), ('a', 1), ('c', 2), ('d', 1)],
+        ['label', 'value'])
+    rows = vis_reduction.collect(df, 3, vis_reduction.top_with_others,
+                                 'label', 'value')
+    assert [tuple(r) for r in rows] == [('a', 11), ('b', 5), ('Others', 3)]
+
+
+def test_top_with_others_by_parent_success(spark_session):
+    df = spark_session.createDataFrame(
+        [('', 'root', 20), ('root', 'x', 12), ('root', 'y', 8),
+         ('x', 'x1', 10), ('x', 'x2', 1), ('x', 'x3', 1),
+         ('y', 'y1', 5), ('y', 'y2', 3)], ['parent', 'label', 'value'])
+    rows = vis_reduction.collect(
+        df, 7, vis_reduction.top_with_others_by_parent, 'label', 'parent',
+        'value')
+    # Parents are kept, so their totals are the same
+    result = dict((r['label'], (r['parent'], r['value'])) for r in rows)
+    assert result == {'root': ('', 20), 'x': ('root', 12), 'y': ('root', 8),
+                      'x1': ('x', 10), 'y1': ('y', 5), 'y2': ('y', 3),
+                      'Others (x)': ('x', 2)}
+
+
+def test_downsample_series_success(spark_session):
+    start = datetime.datetime(2020, 1, 1)
+    data = [(start + datetime.timedelta(minutes=i), float(i % 50))
+            for i in range(1000)]
+    data[500] = (data[500][0], 1000.0)  # peak
+    df = spark_session.createDataFrame(data, ['time', 'value'])
+
+    rows = vis_reduction.collect(df, 100, vis_reduction.downsample_series,
+                                 'time', ['value'])
+    assert len(rows) <= 100
+    assert rows[0]['time'] == data[0][0]
+    assert rows[-1]['time'] == data[-1][0]
+    assert max(r['value'] for r in rows) == 1000.0
+    assert [r['time'] for r in rows] == sorted(r['time'] for r in rows)
+
+
+def test_sample_stratified_success(spark_session):
+    data = [('large', float(i)) for i in range(20000)] + [
+        ('small', float(i)) for i in range(20)]
+    df = spark_session.createDataFrame(data, ['series', 'x'])
+
+    rows = vis_reduction.collect(df, 1000, vis_reduction.sample, 'series')
+    assert len(rows) <= 1000
+    # Small series is not lost
+    assert len([r for r in rows if r['series'] == 'small']) == 20
+
+
+def test_grid_aggregate_success(spark_session):
+    data = [(-19.0 + (i % 100) / 100.0, -44.0 + (i // 100) / 100.0)
+            for i in range(10000)]
+    df = spark_session.createDataFrame(data, ['lat', 'lon'])
+
+    rows = vis_reduction.collect(df, 400, vis_reduction.grid_aggregate,
+                                 'lat', 'lon', None, 'name')
+    assert len(rows) <= 400
+    assert sum(r[vis_reduction.COUNT_COLUMN] for r in rows) == 10000
+    assert all(r['name'] is None for r in rows)
+
+
+def test_grid_aggregate_null_coordinates_success(spark_session):
+    from pyspark.sql import types
+    schema = types.StructType([
+        types.StructField('lat', types.DoubleType()),
+        types.StructField('lon', types.DoubleType()),
+        types.StructField('value', types.DoubleType())])
+    df = spark_session.createDataFrame(
+        [(None, None, float(i)) for i in range(100)], schema)
+
+    rows = vis_reduction.collect(df, 10, vis_reduction.grid_aggregate,
+                                 'lat', 'lon', 'value', 'name')
+    assert rows == []
+    result = vis_reduction.grid_aggregate(df, 10, 'lat', 'lon', 'value',
+                                          'name')
+    assert result.columns == ['lat', 'lon', vis_reduction.COUNT_COLUMN,
+                              'value', 'name']
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from juicer.util.result_cache import ResultCache, PandasResultStorage
+
+
+class LazyResultStorage(PandasResultStorage):
+    """ Files may be read after get/put, as in Spark """
+    lazy = True
+
+
+class FakeRedis(object):
+    """ Minimal in memory implementation of the Redis commands used """
+
+    def __init__(self):
+        self.data = {}
+
+    def hget(self, name, key):
+        return self.data.get(name, {}).get(key)
+
+    def hexists(self, name, key):
+        return key in self.data.get(name, {})
+
+    def hsetnx(self, name, key, value):
+        values = self.data.setdefault(name, {})
+        if key in values:
+            return 0
+        values[key] = value
+        return 1
+
+    def hdel(self, name, key):
+        return 1 if self.data.get(name, {}).pop(key, None) else 0
+
+    def zadd(self, name, mapping):
+        self.data.setdefault(name, {}).update(mapping)
+
+    def zrange(self, name, start, end):
+        values = sorted(self.data.get(name, {}).items(), key=lambda x: x[1])
+        return [k for k, _ in values][start:end + 1]
+
+    def zrangebyscore(self, name, low, high):
+        values = sorted(self.data.get(name, {}).items(), key=lambda x: x[1])
+        return [k for k, v in values if low <= v <= high]
+
+    def zrem(self, name, key):
+        return 1 if self.data.get(name, {}).pop(key, None) is not None else 0
+
+    def incrby(self, name, amount):
+        self.data[name] = self.data.get(name, 0) + amount
+
+    def decrby(self, name, amount):
+        self.data[name] = self.data.get(name, 0) - amount
+
+    def get(self, name):
+        return self.data.get(name)
+
+
+def _get_cache(tmpdir, max_size=10 * 1024 ** 2):
+    return ResultCache('scikit-learn', FakeRedis(), PandasResultStorage(pd),
+                       'file://{}'.format(tmpdir), max_size=max_size,
+                       min_task_time=0)
+
+
+def test_result_cache_put_and_get_success(tmpdir):
+    cache = _get_cache(tmpdir)
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']})
+
+    assert cache.get('key1', 1) is None
+    results = cache.put('key1', {'output data': df, 'task_name': 'Filter'},
+                        2.0, 1)
+    assert results['output data'].equals(df)
+
+    # Other minion (other cache instance, same index and storage)
+    other = ResultCache('scikit-learn', cache.redis_conn,
+                        PandasResultStorage(pd), 'file://{}'.format(tmpdir))
+    cached = other.get('key1', 2)
+    assert cached['output data'].equals(df)
+    assert cached['task_name'] == 'Filter'
+
+    assert cache.pop_statistics(1) == {
+        'hits': 0, 'misses': 1, 'stored': 1, 'evicted': 0}
+    assert other.pop_statistics(2) == {
+        'hits': 1, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+
+def test_result_cache_ignore_not_data_frame_success(tmpdir):
+    cache = _get_cache(tmpdir)
+    results = {'model': object(), 'task_name': 'Model'}
+    assert cache.put('key1', results, 2.0, 1) is results
+    assert cache.get('key1', 1) is None
+
+
+def test_result_cache_lru_eviction_success(tmpdir):
+    cache = _get_cache(tmpdir, max_size=1)
+    df = pd.DataFrame({'a': list(range(100))})
+    cache.put('key1', {'output data': df}, 2.0, 1)
+    cache.put('key2', {'output data': df}, 2.0, 1)
+
+    assert cache.get('key1', 1) is None
+    assert cache.get('key2', 1) is not None
+    assert cache.pop_statistics(1)['evicted'] == 1
+    assert len(tmpdir.listdir()) == 2
+    assert tmpdir.join('key1').listdir() == []
+
+
+def test_result_cache_lazy_min_task_time_success(tmpdir):
+    cache = ResultCache('spark', FakeRedis(), LazyResultStorage(pd),
+                        'file://{}'.format(tmpdir), min_task_time=3600)
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    # Time to build the plan is not enough, writing time is also considered
+    results = {'output data': df}
+    assert cache.put('key1', results, 0.01, 1) is results
+    assert cache.get('key1', 1) is None
+    assert tmpdir.join('key1').listdir() == []
+
+    cache.min_task_time = 0
+    assert cache.put('key1', results, 0.01, 1) is not results
+    assert cache.get('key1', 1) is not None
+
+
+def test_result_cache_lazy_deletion_grace_period_success(tmpdir):
+    cache = ResultCache('spark', FakeRedis(), LazyResultStorage(pd),
+                        'file://{}'.format(tmpdir), max_size=1,
+                        min_task_time=0, deletion_grace_period=3600)
+    df = pd.DataFrame({'a': list(range(100))})
+    cache.put('key1', {'output data': df}, 2.0, 1)
+    cache.put('key2', {'output data': df}, 2.0, 1)
+
+    # Evicted, but files may still be read by data frames returned before
+    assert cache.get('key1', 1) is None
+    assert len(tmpdir.join('key1').listdir()) == 1
+
+    cache.deletion_grace_period = 0
+    cache.put('key3', {'output data': df}, 2.0, 1)
+    cache.put('key4', {'output data': df}, 2.0, 1)
+    # Expired ones are purged by later puts
+    assert len(tmpdir.join('key1').listdir()) == 1
+    assert tmpdir.join('key2').listdir() == []
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import datetime
+import sys
+import threading
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+from juicer.util import dataframe_util
+from juicer.util.dataframe_util import SampleCache
+
+
+class FakeConf(object):
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def unset(self, key):
+        del self.values[key]
+
+
+class FakeSession(object):
+    def __init__(self):
+        self.conf = FakeConf()
+
+
+class FakeSqlContext(object):
+    def __init__(self):
+        self.sparkSession = FakeSession()
+
+
+class FakeType(object):
+    def __init__(self, name):
+        self.name = name
+
+    def typeName(self):
+        return self.name
+
+
+class FakeField(object):
+    def __init__(self, name, type_name):
+        self.name = name
+        self.dataType = FakeType(type_name)
+
+
+class FakeSchema(object):
+    def __init__(self, types):
+        self.fields = [FakeField(name, type_name)
+                       for name, type_name in types.items()]
+
+
+class FakeDataframe(object):
+    """ Spark data frame backed by a Pandas one, counting jobs (toPandas) """
+
+    def __init__(self, pdf, sql_ctx=None, jobs=None, schema=None):
+        self.pdf = pdf
+        self.sql_ctx = sql_ctx or FakeSqlContext()
+        self.jobs = jobs if jobs is not None else []
+        self.schema = schema or FakeSchema(
+            {name: 'long' if dtype.kind == 'i' else 'string'
+             for name, dtype in pdf.dtypes.items()})
+
+    def limit(self, size):
+        return FakeDataframe(self.pdf.head(size), self.sql_ctx, self.jobs,
+                             self.schema)
+
+    def toPandas(self):
+        conf = self.sql_ctx.sparkSession.conf
+        assert all(conf.get(k) == 'true'
+                   for k in dataframe_util.ARROW_CONFIGS)
+        self.jobs.append(len(self.pdf))
+        return self.pdf.copy()
+
+
+def _get_df(size=250):
+    return FakeDataframe(pd.DataFrame({
+        'id': np.arange(size, dtype='int64'),
+        'value': [None if i % 10 == 0 else i / 2.0 for i in range(size)],
+        'date': [datetime.datetime(2020, 1, 1 + i % 28) for i in range(size)],
+        'tags': [np.array([i, i + 1]) for i in range(size)],
+    }))
+
+
+def test_sample_cache_paging_success():
+    df = _get_df()
+    cache = SampleCache(max_rows=200)
+
+    rows, more = cache.get_page('t1', 'output data', df, size=50)
+    assert len(rows) == 50 and more
+    assert rows[0] == (0, None, datetime.datetime(2020, 1, 1), [0, 1])
+    assert isinstance(rows[1][0], int)
+    # Arrow is enabled only while fetching rows
+    assert df.sql_ctx.sparkSession.conf.values == {}
+
+    # Pages already fetched are read from memory
+    assert cache.get_page('t1', 'output data', offset=10, size=20)[0] == \
+        rows[10:30]
+    assert df.jobs == [50]
+
+    # Sample grows (at least doubles), limited to max_rows
+    rows, more = cache.get_page('t1', 'output data', offset=50, size=60)
+    assert [r[0] for r in rows] == list(range(50, 110))
+    rows, more = cache.get_page('t1', 'output data', offset=190, size=50)
+    assert [r[0] for r in rows] == list(range(190, 200)) and not more
+    assert df.jobs == [50, 110, 200]
+
+
+def test_sample_cache_nullable_integer_success():
+    # Arrow returns floats for integral columns with nulls
+    df = FakeDataframe(
+        pd.DataFrame({'id': [1.0, None, 3.0], 'value': [0.5, None, 1.0]}),
+        schema=FakeSchema({'id': 'integer', 'value': 'double'}))
+
+    rows, _ = SampleCache().get_page('t1', 'out', df)
+    assert rows == [(1, 0.5), (None, None), (3, 1.0)]
+    assert all(isinstance(r[0], int) for r in rows if r[0] is not None)
+
+
+def test_sample_cache_invalidation_success():
+    df = _get_df(30)
+    cache = SampleCache()
+
+    rows, more = cache.get_page('t1', 'out', df, size=50)
+    assert len(rows) == 30 and not more
+    cache.get_page('t1', 'out', df, offset=20)
+    assert df.jobs == [30]
+
+    # A new output (e.g. task executed again) is sampled again
+    new_df = _get_df(5)
+    assert len(cache.get_page('t1', 'out', new_df)[0]) == 5
+
+    cache.clear('t1')
+    with pytest.raises(KeyError):
+        cache.get_page('t1', 'out')
+
+
+def test_emit_sample_asynchronous_success(monkeypatch):
+    class Report(object):
+        def __init__(self, css_class, headers, rows, title, numbered):
+            self.rows = rows
+
+        def generate(self):
+            return self.rows
+
+    monkeypatch.setitem(sys.modules, 'juicer.spark.reports',
+                        types.SimpleNamespace(SimpleTableReport=Report))
+    monkeypatch.setattr(dataframe_util, 'sample_cache', SampleCache())
+    df = _get_df(3)
+    events = []
+
+    future = dataframe_util.emit_sample(
+        't1', df, lambda *args, **kwargs: events.append(kwargs), 'out',
+        asynchronous=True)
+    future.result()
+    assert events[0]['message'][0] == [
+        '0', 'null', '2020-01-01T00:00:00', '[0, 1]']
+    # Rows are reused by more data requests
+    assert dataframe_util.sample_cache.get_page('t1', 'out')[0][2][0] == 2
+    assert df.jobs == [3]
+
+
+def test_sample_cache_submit_failure_logged(caplog):
+    cache = SampleCache()
+
+    def fail():
+        raise ValueError('Invalid sample')
+
+    future = cache.submit(fail)
+    # Background fetches are finished before stopping the session
+    cache.shutdown()
+    assert future.done() and isinstance(future.exception(), ValueError)
+    assert 'Invalid sample' in caplog.text
+
+
+def test_sample_cache_page_not_waiting_sample_success():
+    cache = SampleCache()
+    cache.get_page('t1', 'out', _get_df(10))
+
+    fetching = threading.Event()
+    release = threading.Event()
+    slow_df = _get_df(10)
+    to_pandas = slow_df.toPandas
+
+    def blocking_to_pandas():
+        fetching.set()
+        release.wait(5)
+        return to_pandas()
+
+    slow_df.limit = lambda size: slow_df
+    slow_df.toPandas = blocking_to_pandas
+    sample = cache.submit(cache.get_page, 't2', 'out', slow_df)
+    assert fetching.wait(5)
+
+    # Page already in memory is returned while a sample is being fetched
+    page = cache.submit_page(cache.get_page, 't1', 'out', offset=5)
+    assert [r[0] for r in page.result(timeout=5)[0]] == [5, 6, 7, 8, 9]
+    assert not sample.done()
+
+    release.set()
+    assert len(sample.result(timeout=5)[0]) == 10
+    cache.shutdown()
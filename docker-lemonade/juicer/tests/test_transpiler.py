@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import networkx as nx
+from juicer.transpiler import Transpiler
+
+
+def _get_graph(filter_value='a > 1'):
+    graph = nx.MultiDiGraph()
+    tasks = [
+        ('reader', 'data-reader', {'data_source': 1}),
+        ('filter', 'filter', {'expression': filter_value}),
+        ('sort', 'sort', {'attributes': 'a'}),
+        ('sample', 'sample', {'value': 10}),
+    ]
+    for task_id, slug, forms in tasks:
+        graph.add_node(task_id, attr_dict={
+            'id': task_id, 'operation': {'slug': slug},
+            'forms': dict((k, {'value': v, 'category': 'execution'})
+                          for k, v in forms.items())})
+    for source_id, target_id in [('reader', 'filter'), ('reader', 'sort'),
+                                 ('filter', 'sample')]:
+        graph.add_edge(source_id, target_id, attr_dict={
+            'source_port_name': 'output data',
+            'target_port_name': 'input data'})
+    return graph
+
+
+# noinspection PyProtectedMember
+def test_transpiler_task_hash_lineage_success():
+    hashes = Transpiler._get_task_hashes(_get_graph())
+    changed = Transpiler._get_task_hashes(_get_graph('a > 2'))
+
+    assert len(set(hashes.values())) == 4
+    # Only the changed task and its descendants have a new hash
+    assert hashes['reader'] == changed['reader']
+    assert hashes['sort'] == changed['sort']
+    assert hashes['filter'] != changed['filter']
+    assert hashes['sample'] != changed['sample']
+    assert Transpiler._get_task_hashes(_get_graph()) == hashes
+
+
+# noinspection PyProtectedMember
+def test_transpiler_task_hash_falsy_values_success():
+    # Values such as 0, False or '' are parameters too
+    hashes = set()
+    for value in [None, 0, False, '']:
+        graph = _get_graph()
+        graph.nodes['sample']['attr_dict']['forms']['value']['value'] = value
+        hashes.add(Transpiler._get_task_hashes(graph)['sample'])
+    assert len(hashes) == 4
@@ -135,6 +135,11 @@ class DataSourceListApi(Resource):
             if ds_id:
                 data_sources = data_sources.filter(
                         DataSource.id == int(request.args.get('id')))
+
+            ids = request.args.getlist('ids[]')
+            if ids:
+                data_sources = data_sources.filter(DataSource.id.in_(
+                    [int(x) for x in ids]))
  
             lookup = request.args.get('lookup')
             if lookup and lookup in ['1', 'true', True, 1]:
@@ -88,6 +88,17 @@ def test_data_source_get_fields_success(client):
     assert set(resp.keys()) == set(['id', 'name'])
 
 
+def test_data_source_list_by_ids_success(client):
+    rv = client.get('/datasources',
+                    query_string={'fields': 'id,updated', 'ids[]': [1]},
+                    headers={'X-Auth-Token': str(client.secret)})
+
+    assert 200 == rv.status_code, 'Incorrect status code: {}'.format(rv.data)
+    resp = json.loads(rv.data)['data']
+    assert [ds['id'] for ds in resp] == [1]
+    assert set(resp[0].keys()) == set(['id', 'updated'])
+
+
 def test_data_source_get_fields_invalid_sort_success(client):
     rv = client.get('/datasources',
                     query_string={'fields': 'name,id', 'sort': 'wrong',